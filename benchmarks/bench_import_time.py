@@ -0,0 +1,89 @@
+"""
+Benchmark for the time to "import moddy".
+
+Starts fresh interpreters that import moddy and reports the median import
+time, with the interpreter start-up time subtracted. The heavy parts of the
+package (exporters, vthreads, finite state machines) are imported on first
+use and shall not be imported by "import moddy".
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_import_time.py [runs [limit_ms]]
+
+Exits with 1 if *limit_ms* is given and the median import time exceeds it.
+
+@author: klauspopp@gmx.de
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+# modules that "import moddy" shall not import
+LAZY_MODULES = [
+    "moddy.vthread",
+    "moddy.vt_sched_rtos",
+    "moddy.fsm",
+    "moddy.fsm_part",
+    "moddy.interactive_sequence_diagram",
+    "moddy.trace_to_csv",
+    "moddy.dot_structure",
+    "moddy.dot_fsm",
+    "moddy.sim_model_desc",
+    "moddy.trace_sinks",
+    "moddy.trace_file",
+    "moddy.trace_printer",
+    "moddy.trace_fingerprint",
+    "moddy.trace_diff",
+    "moddy.trace_to_chrome",
+    "moddy.trace_to_vcd",
+    "csv",
+    "subprocess",
+    "threading",
+]
+
+
+def interpreter_time(code, runs):
+    """ return median wall time in seconds to run *code* in a new python """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def eagerly_imported_modules():
+    """ return the LAZY_MODULES that are imported by "import moddy" """
+    code = (
+        "import sys, moddy; "
+        "print(' '.join(m for m in %r if m in sys.modules))" % LAZY_MODULES
+    )
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout.split()
+
+
+def main(args):
+    runs = int(args[0]) if args else 20
+    limit_ms = float(args[1]) if len(args) > 1 else None
+
+    base = interpreter_time("pass", runs)
+    with_moddy = interpreter_time("import moddy", runs)
+    import_ms = (with_moddy - base) * 1e3
+    print("import moddy: %.1f ms (median of %d runs)" % (import_ms, runs))
+
+    eager = eagerly_imported_modules()
+    if eager:
+        print("modules imported eagerly: %s" % ", ".join(eager))
+
+    if eager or (limit_ms is not None and import_ms > limit_ms):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
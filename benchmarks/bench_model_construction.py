@@ -0,0 +1,151 @@
+"""
+Benchmark for model construction time.
+
+Creates models with many parts, each with ports and a timer, and binds them
+to a ring. Construction time should grow linearly with the number of parts.
+The parts are created once by their constructor and once by a
+:class:`~moddy.SimPartTemplate`. Like :mod:`timeit`, the garbage collector is
+disabled while measuring and the best of several runs is reported.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_model_construction.py [n ...]
+
+@author: klauspopp@gmx.de
+"""
+import gc
+import sys
+import time
+
+import moddy
+
+
+class Node(moddy.SimPart):
+    """ A part with an input, output and IO port and a timer """
+
+    def __init__(self, sim, obj_name, parent_obj=None):
+        super().__init__(
+            sim=sim,
+            obj_name=obj_name,
+            parent_obj=parent_obj,
+            elems={"in": "in_port", "out": "out_port", "tmr": "tmr"},
+        )
+
+    def in_port_recv(self, port, msg):
+        pass
+
+    def tmr_expired(self, timer):
+        pass
+
+
+class TemplateNode(moddy.SimPart):
+    """ Same as Node, but elements are created by a SimPartTemplate """
+
+    def in_port_recv(self, port, msg):
+        pass
+
+    def tmr_expired(self, timer):
+        pass
+
+
+NODE_TEMPLATE = moddy.SimPartTemplate(
+    TemplateNode, elems={"in": "in_port", "out": "out_port", "tmr": "tmr"}
+)
+
+
+def best_of(func, num_parts, repeat=3):
+    """
+    Run ``func(num_parts)`` *repeat* times with garbage collection disabled
+
+    :return: the smallest of the returned times
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            times.append(func(num_parts))
+        finally:
+            gc.enable()
+    return min(times)
+
+
+def bench_construction(num_parts):
+    """
+    Create *num_parts* top level parts by their constructor
+
+    :return: construction time in seconds
+    """
+    simu = moddy.Sim()
+    start = time.perf_counter()
+    for idx in range(num_parts):
+        Node(simu, "node[%d]" % idx)
+    return time.perf_counter() - start
+
+
+def bench_template_construction(num_parts):
+    """
+    Create *num_parts* top level parts from a template
+
+    :return: construction time in seconds
+    """
+    simu = moddy.Sim()
+    start = time.perf_counter()
+    NODE_TEMPLATE.instantiate_many(simu, "node", num_parts)
+    return time.perf_counter() - start
+
+
+def bench_binding(num_parts):
+    """
+    Build a model with *num_parts* top level parts and bind them to a ring
+
+    :return: binding time in seconds
+    """
+    simu = moddy.Sim()
+    for idx in range(num_parts):
+        Node(simu, "node%d" % idx)
+    start = time.perf_counter()
+    simu.smart_bind(
+        [
+            [
+                "node%d.out_port" % idx,
+                "node%d.in_port" % ((idx + 1) % num_parts),
+            ]
+            for idx in range(num_parts)
+        ]
+    )
+    return time.perf_counter() - start
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] if args else [10000, 100000]
+    print(
+        "%10s %12s %12s %12s %12s %14s"
+        % (
+            "parts",
+            "construct/s",
+            "us/part",
+            "template/s",
+            "us/part",
+            "bind us/part",
+        )
+    )
+    for num_parts in sizes:
+        t_construct = best_of(bench_construction, num_parts)
+        t_template = best_of(bench_template_construction, num_parts)
+        t_bind = best_of(bench_binding, num_parts)
+        print(
+            "%10d %12.3f %12.2f %12.3f %12.2f %14.2f"
+            % (
+                num_parts,
+                t_construct,
+                t_construct / num_parts * 1e6,
+                t_template,
+                t_template / num_parts * 1e6,
+                t_bind / num_parts * 1e6,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
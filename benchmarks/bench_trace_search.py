@@ -0,0 +1,79 @@
+"""
+Benchmark for TraceSearch queries on a large trace.
+
+Runs the ring model of bench_tracing.py, then runs the same queries with
+the indexed searches and with the linear search of find_event.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_trace_search.py [num_events \
+[num_queries]]
+
+@author: klauspopp@gmx.de
+"""
+
+import os
+import random
+import sys
+import time
+
+from moddy.lib.trace_search import TraceSearch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_tracing import NUM_NODES, build_model  # noqa: E402
+
+
+def run_queries(search, queries, linear):
+    """run queries, return run time and number of found events"""
+    found = 0
+    start = time.perf_counter()
+    for part, start_idx in queries:
+        if linear:
+            result = search.find_event(
+                part,
+                start_idx,
+                search.msg_match,
+                ("<MSG", "tok*"),
+                part_matcher=search.sub_part_parent_match,
+            )
+        else:
+            result = search.find_rcv_msg(part, "tok*", start_idx)
+        if result is not None:
+            found += 1
+    return time.perf_counter() - start, found
+
+
+def main(args):
+    num_events = int(args[0]) if args else 200000
+    num_queries = int(args[1]) if len(args) > 1 else 1000
+    simu = build_model()
+    simu.run(stop_time=1e9, max_events=num_events, enable_trace_printing=False)
+    num_traced = len(simu.tracing.traced_events())
+
+    rnd = random.Random(1)
+    queries = [
+        (
+            simu.parts_mgr.find_part_by_name(
+                "node%d" % rnd.randrange(NUM_NODES)
+            ),
+            rnd.randrange(num_traced),
+        )
+        for _ in range(num_queries)
+    ]
+
+    search = TraceSearch(simu)
+    start = time.perf_counter()
+    search.count("<MSG")
+    index_time = time.perf_counter() - start
+    indexed_time, indexed_found = run_queries(search, queries, False)
+    linear_time, linear_found = run_queries(search, queries, True)
+    assert indexed_found == linear_found
+
+    print("%d traced events, %d queries" % (num_traced, num_queries))
+    print("build index:      %8.3f s" % index_time)
+    print("indexed queries:  %8.3f s" % indexed_time)
+    print("linear queries:   %8.3f s" % linear_time)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
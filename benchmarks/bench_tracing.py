@@ -0,0 +1,155 @@
+"""
+Benchmark for the cost of tracing.
+
+Runs a ring of parts that pass messages around and restart a timer on each
+message, with trace recording enabled, with the columnar trace store,
+with a binary trace sink, a Chrome trace sink or a trace fingerprint
+instead of recording, and with tracing disabled.
+The "print" modes print the trace to a pseudo terminal (the null device
+on Windows), unbuffered and with the buffered trace printer.
+
+Usage::
+
+    PYTHONPATH=src python benchmarks/bench_tracing.py [num_events ...]
+
+@author: klauspopp@gmx.de
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import moddy
+from moddy.trace_sinks import BinaryTraceSink
+from moddy.trace_to_chrome import ChromeTraceSink
+
+NUM_NODES = 10
+
+
+class Node(moddy.SimPart):
+    """A part that forwards each message and restarts a timer"""
+
+    def __init__(self, sim, obj_name):
+        super().__init__(
+            sim=sim,
+            obj_name=obj_name,
+            elems={"in": "in_port", "out": "out_port", "tmr": "tmr"},
+        )
+
+    def start_sim(self):
+        if self.obj_name() == "node0":
+            self.out_port.send("token", 1)
+
+    def in_port_recv(self, port, msg):
+        self.tmr.restart(10)
+        self.out_port.send(msg, 1)
+
+    def tmr_expired(self, timer):
+        pass
+
+
+def build_model():
+    """build the ring, return simulator"""
+    simu = moddy.Sim()
+    for idx in range(NUM_NODES):
+        Node(simu, "node%d" % idx)
+    simu.smart_bind(
+        [
+            [
+                "node%d.out_port" % idx,
+                "node%d.in_port" % ((idx + 1) % NUM_NODES),
+            ]
+            for idx in range(NUM_NODES)
+        ]
+    )
+    return simu
+
+
+@contextlib.contextmanager
+def console():
+    """
+    context that redirects stdout to a line buffered pseudo terminal, whose
+    output is discarded
+    """
+    try:
+        import pty
+    except ImportError:
+        with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+            yield
+        return
+
+    master, slave = pty.openpty()
+
+    def drain():
+        try:
+            while os.read(master, 65536):
+                pass
+        except OSError:
+            pass
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    with open(slave, "w", buffering=1) as tty, contextlib.redirect_stdout(tty):
+        yield
+    os.close(master)
+    thread.join()
+
+
+def bench_tracing(num_events, mode):
+    """
+    run the model for *num_events* simulator events
+
+    :param mode: "recording", "columnar", "sink", "chrome", "fingerprint",
+        "print", "print-buffered" or "off"
+    :return: run time in seconds, including writing the trace sink
+    """
+    simu = build_model()
+    if mode == "columnar":
+        simu.tracing.set_trace_buffer(columnar=True)
+    simu.tracing.enable_trace_recording(mode in ("recording", "columnar"))
+    if mode == "fingerprint":
+        simu.tracing.enable_fingerprint()
+    if mode == "print-buffered":
+        simu.tracing.set_trace_printer()
+    with tempfile.TemporaryDirectory() as tmp_dir, console():
+        start = time.perf_counter()
+        if mode == "sink":
+            BinaryTraceSink(simu, os.path.join(tmp_dir, "trace.bin"))
+        if mode == "chrome":
+            ChromeTraceSink(simu, os.path.join(tmp_dir, "trace.json"))
+        simu.run(
+            stop_time=1e9,
+            max_events=num_events,
+            enable_trace_printing=mode.startswith("print"),
+        )
+        return time.perf_counter() - start
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] if args else [100000]
+    modes = (
+        "recording",
+        "columnar",
+        "sink",
+        "chrome",
+        "fingerprint",
+        "print",
+        "print-buffered",
+        "off",
+    )
+    print(("%10s" + " %14s" * len(modes)) % (("events",) + modes))
+    for num_events in sizes:
+        print(
+            ("%10d" + " %14.3f" * len(modes))
+            % (
+                (num_events,)
+                + tuple(bench_tracing(num_events, mode) for mode in modes)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -19,21 +19,62 @@ from .constants import *  # noqa: F403, F401
 # import moddy global api
 from .sim_core import Sim  # noqa: F401
 from .sim_part import SimPart  # noqa: F401
+from .sim_part_template import SimPartTemplate  # noqa: F401
 
-from .vthread import VThread  # noqa: F401
-from .vt_sched_rtos import VtSchedRtos, VSimpleProg  # noqa: F401
+# The following parts of the api are imported on first use, so that
+# "import moddy" stays fast for processes that never use them.
+# name -> module that defines it
+_LAZY_ATTRS = {
+    "BernoulliLossModel": "sim_loss_models",
+    "GilbertElliottLossModel": "sim_loss_models",
+    "PatternLossModel": "sim_loss_models",
+    "PeriodicLossModel": "sim_loss_models",
+    "compile_model": "sim_model_desc",
+    "compile_model_file": "sim_model_desc",
+    "load_model": "sim_model_desc",
+    "VThread": "vthread",
+    "VtSchedRtos": "vt_sched_rtos",
+    "VSimpleProg": "vt_sched_rtos",
+    "Fsm": "fsm",
+    "SimFsmPart": "fsm_part",
+    "gen_interactive_sequence_diagram": "interactive_sequence_diagram",
+    "gen_trace_table": "trace_to_csv",
+    "JsonLinesTraceSink": "trace_sinks",
+    "CsvTraceSink": "trace_sinks",
+    "BinaryTraceSink": "trace_sinks",
+    "BinaryTraceReader": "trace_file",
+    "TraceFingerprint": "trace_fingerprint",
+    "diff_traces": "trace_diff",
+    "gen_chrome_trace": "trace_to_chrome",
+    "ChromeTraceSink": "trace_to_chrome",
+    "gen_vcd": "trace_to_vcd",
+    "VcdTraceSink": "trace_to_vcd",
+    "gen_dot_structure_graph": "dot_structure",
+    "gen_fsm_graph": "dot_fsm",
+}
 
-from .fsm import Fsm  # noqa: F401
-from moddy.fsm_part import SimFsmPart  # noqa: F401
 
-from moddy.interactive_sequence_diagram import (  # noqa: F401
-    gen_interactive_sequence_diagram,  # noqa: F401
-)
-from moddy.trace_to_csv import gen_trace_table  # noqa: F401
-from moddy.dot_structure import gen_dot_structure_graph  # noqa: F401
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    import importlib
+
+    value = getattr(importlib.import_module("." + module_name, __name__), name)
+    globals()[name] = value  # subsequent accesses don't call __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
 
-from moddy.dot_fsm import gen_fsm_graph  # noqa: F401
 
 AUTHOR_NAME = "Klaus Popp"
 AUTHOR_EMAIL = "klauspopp@gmx.de"
 CYEAR = "2020"
+
+# "from moddy import *" shall also import the lazily imported api
+__all__ = sorted(
+    {name for name in globals() if not name.startswith("_")}
+    | set(_LAZY_ATTRS)
+)
@@ -5,17 +5,46 @@ Created on 15.09.2019
 """
 # import moddy
 import fnmatch
+import itertools
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+# actions whose events are searched by the part owning the event's port
+_MSG_ACTIONS = frozenset(("<MSG", ">MSG", ">MSG(Q)"))
 
 
 class TraceSearch(object):
     """
     Class to search moddy traced events
+
+    The searches use indexes of the traced events that are built on the
+    first search: the event numbers per action, per action and part, and
+    the event times. The indexes are extended when the trace has grown.
+    Text patterns are compiled once.
+
+    :param sim: simulator, or an object that provides the simulator's \
+        trace interface, e.g. :class:`~moddy.trace_file.BinaryTraceReader`
     """
 
     def __init__(self, sim):
         self.sim = sim
         self.traced_events = sim.tracing.traced_events()
         self.curIdx = 0
+        # number of events covered by the indexes
+        self._num_indexed = 0
+        self._num_dropped = None
+        # time of each event
+        self._times = array("d")
+        # action -> event numbers
+        self._action_index = {}
+        # (action, part) -> event numbers
+        self._part_index = {}
+        # the traced events, or a list of them if they can't be indexed fast
+        self._events = None
+        # compiled text patterns
+        self._patterns = {}
 
     def find_ann(self, part, text_pat, start_idx=None):
         """
@@ -24,9 +53,7 @@ class TraceSearch(object):
             If None, matches any text
         other parameters and return, see findEvent
         """
-        return self.find_event(
-            part, start_idx, self.tv_str_match, ("ANN", text_pat)
-        )
+        return self._find_next("ANN", part, text_pat, start_idx)
 
     def find_ass_fail(self, part, text_pat, start_idx=None):
         """
@@ -35,9 +62,7 @@ class TraceSearch(object):
             If None, matches any text
         other parameters and return, see findEvent
         """
-        return self.find_event(
-            part, start_idx, self.tv_str_match, ("ASSFAIL", text_pat)
-        )
+        return self._find_next("ASSFAIL", part, text_pat, start_idx)
 
     def find_sta(self, part, text_pat, start_idx=None):
         """
@@ -46,9 +71,7 @@ class TraceSearch(object):
             If None, matches any text
         other parameters and return, see findEvent
         """
-        return self.find_event(
-            part, start_idx, self.tv_str_match, ("STA", text_pat)
-        )
+        return self._find_next("STA", part, text_pat, start_idx)
 
     def find_rcv_msg(self, part, textPat, start_idx=None):
         """
@@ -59,13 +82,7 @@ class TraceSearch(object):
             If None, matches any
         other parameters and return, see findEvent
         """
-        return self.find_event(
-            part,
-            start_idx,
-            self.msg_match,
-            ("<MSG", textPat),
-            part_matcher=self.sub_part_parent_match,
-        )
+        return self._find_next("<MSG", part, textPat, start_idx)
 
     def find_snd_msg(self, part, text_pat, start_idx=None):
         """
@@ -74,13 +91,7 @@ class TraceSearch(object):
         :param string textPat: message text with wildcards.
         If None, matches any other parameters and return, see findEvent
         """
-        return self.find_event(
-            part,
-            start_idx,
-            self.msg_match,
-            (">MSG", text_pat),
-            part_matcher=self.sub_part_parent_match,
-        )
+        return self._find_next(">MSG", part, text_pat, start_idx)
 
     def find_vc(self, var_watcher, text_pat, start_idx=None):
         """
@@ -90,14 +101,68 @@ class TraceSearch(object):
         :param string textPat: message text with wildcards.
         If None, matches any other parameters and return, see findEvent
         """
-        return self.find_event(
-            var_watcher,
-            start_idx,
-            self.tv_str_match,
-            ("VC", text_pat),
-            part_matcher=self.sub_part_match,
+        return self._find_next("VC", var_watcher, text_pat, start_idx)
+
+    def find_all(
+        self, action, part=None, text_pat=None, t_from=None, t_to=None
+    ):
+        """
+        Iterate over all events that match.
+
+        Example:
+
+        .. code-block:: python
+
+            for idx, te in ts.find_all("<MSG", "Cpu", "Req*", t_from=2.0):
+                print(idx, te)
+
+        :param str action: action of the events, e.g. ``'<MSG'``, ``'ANN'``
+        :param part: part hierarchy name or instance. If None, match any \
+            part. For messages, the part owning the port (receiving part \
+            for ``'<MSG'``, sending part for ``'>MSG'``), for ``'VC'`` the \
+            variable watcher instance
+        :param string text_pat: text pattern with wildcards, matched against \
+            the message text or the transport value string. \
+            If None, matches any text
+        :param float t_from: ignore events before this time
+        :param float t_to: ignore events after this time
+        :return: iterator over (idx, te) tuples
+        :raises ValueError: if part name not found
+        """
+        # pylint: disable=too-many-arguments
+        candidates, start, end = self._candidates(action, part, t_from, t_to)
+        match = self._text_matcher(action, text_pat)
+        traced_events = self._events
+        for pos in range(start, end):
+            idx = candidates[pos]
+            te = traced_events[idx]
+            if match is None or match(te):
+                yield idx, te
+
+    def count(self, action, part=None, text_pat=None, t_from=None, t_to=None):
+        """
+        Count the events that match.
+        Parameters as for :meth:`find_all`.
+        Without *text_pat*, the events are counted using the indexes only.
+
+        :return: number of matching events
+        """
+        # pylint: disable=too-many-arguments
+        if text_pat is None:
+            _, start, end = self._candidates(action, part, t_from, t_to)
+            return end - start
+        return sum(
+            1 for _ in self.find_all(action, part, text_pat, t_from, t_to)
         )
 
+    def index_of_time(self, time):
+        """
+        return index of the first event at or after *time*.
+        The number of traced events if there is no such event
+        """
+        self._update_index()
+        return bisect_left(self._times, time)
+
     def tv_str_match(self, para, te):
         m_type, text_pat = para
         rv = False
@@ -120,6 +185,7 @@ class TraceSearch(object):
         """
         find next traced event
         :param part: part hierarchy name or instance. If None, match any part
+            (before, None matched only events without part).
             This is passed to partMatcher. So, depending on partMatcher,
             it can be a part, a part hierarchy name, or a subpart
         :param startIdx: index in tracedEvents to start with \
@@ -129,6 +195,11 @@ class TraceSearch(object):
             if None, use partMatch(te,p)
         :return: idx, te=the index and found event or None
         :raises ValueError: if part name not found
+
+        Text patterns of :meth:`tv_str_match`, :meth:`msg_match` and the
+        find_* methods are matched case-sensitively on all platforms, like
+        :func:`fnmatch.fnmatchcase` (before, :func:`fnmatch.fnmatch`
+        ignored the case on Windows).
         """
         if part_matcher is None:
             part_matcher = self.part_match
@@ -140,13 +211,31 @@ class TraceSearch(object):
             te = self.traced_events[idx]
             # print("COMPARING te %d: %s" % (idx, te))
             # if te.part == part or self.subPartMatch(part, te):
-            if part_matcher(te, part):
+            if part is None or part_matcher(te, part):
                 if match_func(match_func_para, te):
                     rv = (idx, te)
                     break
         self.curIdx = idx + 1
         return rv
 
+    def _find_next(self, action, part, text_pat, start_idx):
+        """
+        find next event with *action* from *start_idx* (curIdx if None),
+        like :meth:`find_event`, using the indexes
+        """
+        idx = start_idx if start_idx is not None else self.curIdx
+        candidates, start, end = self._candidates(action, part, None, None)
+        match = self._text_matcher(action, text_pat)
+        traced_events = self._events
+        for pos in range(bisect_left(candidates, idx, start, end), end):
+            te = traced_events[candidates[pos]]
+            if match is None or match(te):
+                self.curIdx = candidates[pos] + 1
+                return candidates[pos], te
+        # not found, set curIdx as the linear search did
+        self.curIdx = max(idx, len(self.traced_events) - 1) + 1
+        return None
+
     @staticmethod
     def part_match(te, p):
         return te.part == p
@@ -174,4 +263,114 @@ class TraceSearch(object):
         return part
 
     def wildcard_match(self, txt, pattern):
-        return pattern is None or fnmatch.fnmatch(txt, pattern)
+        return pattern is None or self._pattern(pattern)(txt) is not None
+
+    #
+    # Indexes
+    #
+    def _pattern(self, pattern):
+        """ return match function of compiled wildcard pattern """
+        match = self._patterns.get(pattern)
+        if match is None:
+            match = re.compile(fnmatch.translate(pattern)).match
+            self._patterns[pattern] = match
+        return match
+
+    def _text_matcher(self, action, text_pat):
+        """ return function that checks the text of an event, or None """
+        if text_pat is None:
+            return None
+        pattern = self._pattern(text_pat)
+        if action in _MSG_ACTIONS:
+            return lambda te: pattern(te.trans_val.msg_text()) is not None
+        return lambda te: pattern(te.trans_val.__str__()) is not None
+
+    @staticmethod
+    def _owner(te):
+        """ return the element an event is searched by """
+        action = te.action
+        if action in _MSG_ACTIONS:
+            sub_obj = te.sub_obj
+            return None if sub_obj is None else sub_obj.parent_obj
+        if action == "VC":
+            return te.sub_obj
+        return te.part
+
+    def _update_index(self):
+        """ add new traced events to the indexes """
+        traced_events = self.traced_events
+        num_dropped = getattr(traced_events, "num_dropped", None)
+        if num_dropped is not None:
+            num_dropped = num_dropped()
+        if (
+            len(traced_events) < self._num_indexed
+            or num_dropped != self._num_dropped
+        ):
+            # events have been removed, rebuild
+            self._num_indexed = 0
+            self._times = array("d")
+            self._action_index = {}
+            self._part_index = {}
+            self._events = None
+        self._num_dropped = num_dropped
+        idx = self._num_indexed
+        if len(traced_events) == idx:
+            return
+
+        if isinstance(traced_events, deque):
+            # deques are slow to index, keep a list of the events
+            if self._events is None:
+                self._events = []
+            events = self._events
+        else:
+            self._events = traced_events
+            events = None
+        times = self._times
+        action_index = self._action_index
+        part_index = self._part_index
+        owner = self._owner
+        if idx == 0:
+            new_events = iter(traced_events)
+        else:
+            new_events = itertools.islice(traced_events, idx, None)
+        for te in new_events:
+            times.append(te.trace_time)
+            action = te.action
+            try:
+                action_index[action].append(idx)
+            except KeyError:
+                action_index[action] = array("l", (idx,))
+            key = (action, owner(te))
+            try:
+                part_index[key].append(idx)
+            except KeyError:
+                part_index[key] = array("l", (idx,))
+            if events is not None:
+                events.append(te)
+            idx += 1
+        self._num_indexed = idx
+
+    def _candidates(self, action, part, t_from, t_to):
+        """
+        return (event numbers, start, end): the events with *action*
+        and *part* in the time range are event numbers[start:end]
+        """
+        self._update_index()
+        if part is None:
+            candidates = self._action_index.get(action, ())
+        else:
+            candidates = self._part_index.get(
+                (action, self.part_translate(part)), ()
+            )
+
+        start = 0
+        end = len(candidates)
+        if t_from is not None:
+            start = bisect_left(
+                candidates, bisect_left(self._times, t_from), 0, end
+            )
+        if t_to is not None:
+            end = bisect_left(
+                candidates, bisect_right(self._times, t_to), start, end
+            )
+        return candidates, start, end
@@ -8,6 +8,10 @@
 
 '''
 
+import fnmatch
+import re
+import sys
+
 from . import MS, US, NS
 
 
@@ -27,10 +31,90 @@ def time_unit_to_factor(unit):
     return factor
 
 
+class ElemList(list):
+    '''
+    List of simulator elements with a constant time membership test.
+
+    Used for the registries of parts, ports, timers, watchers and monitors,
+    which are filled via :func:`add_elem_to_list`. Elements must be hashable.
+
+    :param iterable: initial elements
+    '''
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+        # element -> number of occurrences. A plain dict, because creating
+        # a Counter is expensive and ElemLists are created for every part
+        self._members = {}
+        if self:
+            self._rebuild()
+
+    def __contains__(self, elem):
+        try:
+            return elem in self._members
+        except TypeError:
+            # unhashable element can't be in the list
+            return False
+
+    def append(self, elem):
+        super().append(elem)
+        members = self._members
+        members[elem] = members.get(elem, 0) + 1
+
+    def extend(self, iterable):
+        elems = list(iterable)
+        super().extend(elems)
+        members = self._members
+        for elem in elems:
+            members[elem] = members.get(elem, 0) + 1
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def clear(self):
+        super().clear()
+        self._members.clear()
+
+    def insert(self, index, elem):
+        super().insert(index, elem)
+        members = self._members
+        members[elem] = members.get(elem, 0) + 1
+
+    def _discard(self, elem):
+        self._members[elem] -= 1
+        if self._members[elem] == 0:
+            del self._members[elem]
+
+    def remove(self, elem):
+        super().remove(elem)
+        self._discard(elem)
+
+    def pop(self, index=-1):
+        elem = super().pop(index)
+        self._discard(elem)
+        return elem
+
+    def _rebuild(self):
+        members = {}
+        for elem in list.__iter__(self):
+            members[elem] = members.get(elem, 0) + 1
+        self._members = members
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+
 def add_elem_to_list(lst, elem, list_name):
     '''
     Add elem to lst
-    :lst list: list to add element to
+    :lst list: list to add element to. If it is an :class:`ElemList`, \
+        the membership test takes constant time
     :elem: element to add to list
     :list_name str: list name to add to exception
     :raise: RuntimeError if elem already in list
@@ -40,6 +124,41 @@ def add_elem_to_list(lst, elem, list_name):
     lst.append(elem)
 
 
+def name_matcher(pattern):
+    '''
+    return a function that matches a hierarchy name against *pattern*.
+    The function returns a match object if the whole name matches,
+    otherwise None
+
+    :param pattern: glob pattern (see :mod:`fnmatch`) or compiled \
+        regular expression
+    '''
+    if not hasattr(pattern, 'match'):
+        pattern = re.compile(fnmatch.translate(pattern))
+    return pattern.fullmatch
+
+
+class ModelGenerations:
+    '''
+    Counters that change whenever the model of a simulator changes.
+    Cached hierarchy names and walks through the model compare them to
+    decide whether they are still valid. Each simulator has its own
+    counters, so changing one model doesn't invalidate the caches of other
+    simulators.
+    '''
+    __slots__ = ('hierarchy', 'structure')
+
+    def __init__(self):
+        # incremented whenever the parent of an element changes
+        self.hierarchy = 0
+        # incremented whenever parts or ports are added or moved
+        self.structure = 0
+
+
+# counters of elements that don't belong to a simulator
+_NO_SIM_GENERATIONS = ModelGenerations()
+
+
 class SimBaseElement:
     '''
     Moddy simulator base class
@@ -53,25 +172,74 @@ class SimBaseElement:
 
     def __init__(self, sim, parent_obj, obj_name, type_str):
         self._sim = sim
-        self.parent_obj = parent_obj
+        self._parent_obj = parent_obj
         self._obj_name = obj_name
         self.type_str = type_str
+        if sim is not None:
+            self._generations = sim.parts_mgr.generations
+        elif parent_obj is not None:
+            self._generations = parent_obj._generations
+        else:
+            self._generations = _NO_SIM_GENERATIONS
+        # cached hierarchy names, valid if _hierarchy_name_gen is equal
+        # to the hierarchy generation of the simulator
+        self._hierarchy_name = None
+        self._hierarchy_name_with_type = None
+        self._hierarchy_name_gen = -1
+
+    @property
+    def parent_obj(self):
+        '''parent part. None if element has no parent'''
+        return self._parent_obj
+
+    @parent_obj.setter
+    def parent_obj(self, parent_obj):
+        self._parent_obj = parent_obj
+        self._generations.hierarchy += 1
+        self.structure_changed()
+
+    def structure_changed(self):
+        '''
+        Tell that parts or ports have been added or moved.
+        Invalidates cached walks through the model structure
+        '''
+        self._generations.structure += 1
+
+    def structure_generation(self):
+        '''
+        Return a number that changes whenever the structure of the
+        element's model changes
+        '''
+        return self._generations.structure
+
+    def _update_hierarchy_names(self):
+        if self._parent_obj is None:
+            name = self._obj_name
+        else:
+            name = self._parent_obj.hierarchy_name() + "." + self._obj_name
+        self._hierarchy_name = sys.intern(name)
+        self._hierarchy_name_with_type = sys.intern(
+            name + "(" + self.type_str + ")"
+        )
+        self._hierarchy_name_gen = self._generations.hierarchy
 
     def hierarchy_name(self):
         '''
         Return the element name within the hierarchy.
         E.g. Top.Lower.myName
         '''
-        if self.parent_obj is None:
-            return self._obj_name
-        return self.parent_obj.hierarchy_name() + "." + self._obj_name
+        if self._hierarchy_name_gen != self._generations.hierarchy:
+            self._update_hierarchy_names()
+        return self._hierarchy_name
 
     def hierarchy_name_with_type(self):
         '''
         Return the element name within the hierarch including the element type
         E.g. "Top.Lower.myName (Inport)"
         '''
-        return self.hierarchy_name() + "(" + self.type_str + ")"
+        if self._hierarchy_name_gen != self._generations.hierarchy:
+            self._update_hierarchy_names()
+        return self._hierarchy_name_with_type
 
     def obj_name(self):
         '''
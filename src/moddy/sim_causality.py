@@ -0,0 +1,394 @@
+"""
+:mod:`sim_causality` -- Causal chains of messages
+=================================================
+
+.. module:: sim_causality
+   :synopsis: Track end-to-end latencies across chains of messages
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`CausalityTracker` is enabled via :meth:`~.Sim.enable_causality`.
+It follows chains of messages through the model: a message sent while a
+part handles a received message belongs to the same chain as the received
+message. So do messages sent when a timer expires that was started while
+handling a message of the chain.
+
+A chain starts
+
+    * when a message is sent via a source port (see \
+        :meth:`CausalityTracker.add_source`)
+    * when the model calls :meth:`~.SimPart.start_causal_chain`
+
+Probe points record the latency of the chains, i.e. the time since the
+chain started, into histograms:
+
+    * probe ports record the latency when a message of a chain arrives \
+        (see :meth:`CausalityTracker.add_probe`)
+    * the model calls :meth:`~.SimPart.causal_probe`
+
+Each message of a chain is a hop. The tracker keeps the last
+*max_path_len* hops of the path that led to each message, so the path from
+the start of the chain to its slowest probe, the critical path, can be
+exported afterwards. Older hops are dropped, so the memory and the work per
+hop are bounded also for chains that never end, e.g. a ping-pong of
+messages.
+
+Messages received and sent by :class:`~.vthread.VThread` parts don't
+propagate the chain.
+"""
+
+import collections
+import json
+
+from .sim_port_stats import LogHistogram
+from .utils import create_dirs_and_open_output_file
+
+
+class CausalChain:
+    """
+    A chain of causally related messages.
+
+    :ivar int chain_id: number of the chain, counting from 0
+    :ivar str name: name of the source that started the chain
+    :ivar float start_time: time when the chain started
+    :ivar float latency: largest latency recorded by a probe, None if \
+        no probe recorded the chain
+    :ivar str end_probe: name of the probe that recorded *latency*
+    :ivar int end_hops: number of hops from the start of the chain to \
+        *end_probe*
+    """
+
+    # pylint: disable=too-few-public-methods
+    __slots__ = (
+        "chain_id",
+        "name",
+        "start_time",
+        "latency",
+        "end_probe",
+        "end_hops",
+        "end_path",
+    )
+
+    def __init__(self, chain_id, name, start_time):
+        self.chain_id = chain_id
+        self.name = name
+        self.start_time = start_time
+        self.latency = None
+        self.end_probe = None
+        self.end_hops = None
+        # last hops of the path at which latency was recorded
+        self.end_path = None
+
+
+class CausalHop:
+    """
+    A message of a chain, or the start of the chain.
+
+    :ivar out_port: output port that sent the message, None for the start
+    :ivar in_port: input port that received the message, None for the start
+    :ivar float request_time: time when the message was sent
+    :ivar float time: time when the message arrived
+    """
+
+    # pylint: disable=too-few-public-methods
+    __slots__ = ("out_port", "in_port", "request_time", "time")
+
+    def __init__(self, out_port, in_port, request_time, time):
+        self.out_port = out_port
+        self.in_port = in_port
+        self.request_time = request_time
+        self.time = time
+
+
+class _CausalContext:
+    """
+    Position in a chain: the chain, the number of hops since its start
+    and the last hops that led to it
+    """
+
+    # pylint: disable=too-few-public-methods
+    __slots__ = ("chain", "num_hops", "path")
+
+    def __init__(self, chain, num_hops, path):
+        self.chain = chain
+        self.num_hops = num_hops
+        self.path = path
+
+
+class CausalProbe:
+    """
+    Latencies of the chains recorded at a probe point.
+
+    :ivar str name: name of the probe
+    :ivar LogHistogram latency: histogram of the latencies
+    :ivar CausalChain worst_chain: chain with the largest latency
+    :ivar float worst_latency: latency of *worst_chain* at this probe
+    """
+
+    # pylint: disable=too-few-public-methods
+    def __init__(self, name, bins_per_decade):
+        self.name = name
+        self.latency = LogHistogram(bins_per_decade)
+        self.worst_chain = None
+        self.worst_latency = None
+
+
+class CausalityTracker:
+    """
+    Track chains of messages and record their latencies at probe points.
+
+    :param sim: Simulator instance
+    :param bool through_timers: propagate chains via timers started while \
+        handling a message of a chain
+    :param int max_chains: number of most recent chains kept for \
+        :meth:`chains` and :meth:`critical_paths`
+    :param int bins_per_decade: resolution of the latency histograms
+    :param int max_path_len: number of hops kept of the critical paths. \
+        Longer paths keep their last hops
+    """
+
+    # pylint: disable=too-many-instance-attributes, too-many-arguments
+    def __init__(
+        self,
+        sim,
+        through_timers=True,
+        max_chains=1000,
+        bins_per_decade=20,
+        max_path_len=64,
+    ):
+        self._sim = sim
+        self.through_timers = through_timers
+        self._bins_per_decade = bins_per_decade
+        self._max_path_len = max(max_path_len, 1)
+        # position in the chain of the message being handled, None if not
+        # in a chain
+        self.current = None
+        self._num_chains = 0
+        self._chains = collections.deque(maxlen=max_chains)
+        # output port -> source name
+        self._sources = {}
+        # input port -> probe
+        self._port_probes = {}
+        # probe name -> probe
+        self._probes = {}
+
+    def _port(self, port, attr):
+        if isinstance(port, str):
+            port = self._sim.parts_mgr.find_port_by_name(port)
+        if hasattr(port, attr):
+            # IO port
+            port = getattr(port, attr)()
+        return port
+
+    def add_source(self, port, name=None):
+        """
+        Start a new chain for each message sent via *port*. Further
+        messages sent by the same callback belong to the new chain.
+
+        :param port: output port or I/O port, or its hierarchy name
+        :param str name: name of the chains. Default is the hierarchy name \
+            of the port
+        """
+        port = self._port(port, "out_port")
+        self._sources[port] = name or port.hierarchy_name()
+
+    def add_probe(self, port, name=None):
+        """
+        Record the latency of a chain whenever a message of the chain
+        arrives at *port*.
+
+        :param port: input port or I/O port, or its hierarchy name
+        :param str name: name of the probe. Default is the hierarchy name \
+            of the port
+        :return: the :class:`CausalProbe`
+        """
+        port = self._port(port, "in_port")
+        probe = self._probe(name or port.hierarchy_name())
+        self._port_probes[port] = probe
+        return probe
+
+    def _probe(self, name):
+        probe = self._probes.get(name)
+        if probe is None:
+            probe = self._probes[name] = CausalProbe(
+                name, self._bins_per_decade
+            )
+        return probe
+
+    def start_chain(self, name=None):
+        """
+        Start a new chain. Messages sent by the current callback belong to
+        the new chain
+
+        :return: the :class:`CausalChain`
+        """
+        chain = CausalChain(self._num_chains, name, self._sim.time())
+        self._num_chains += 1
+        self._chains.append(chain)
+        self.current = _CausalContext(
+            chain,
+            0,
+            (CausalHop(None, None, chain.start_time, chain.start_time),),
+        )
+        return chain
+
+    def probe(self, name):
+        """
+        Record the latency of the current chain at probe *name*.
+        Does nothing if the current callback doesn't handle a chain
+
+        :return: the latency, None if not in a chain
+        """
+        context = self.current
+        if context is None:
+            return None
+        return self._record(self._probe(name), context)
+
+    def _record(self, probe, context):
+        chain = context.chain
+        latency = self._sim.time() - chain.start_time
+        probe.latency.add(latency)
+        if chain.latency is None or latency > chain.latency:
+            chain.latency = latency
+            chain.end_probe = probe.name
+            chain.end_hops = context.num_hops
+            chain.end_path = context.path
+        if probe.worst_latency is None or latency > probe.worst_latency:
+            probe.worst_chain = chain
+            probe.worst_latency = latency
+        return latency
+
+    def msg_cause(self, port):
+        """
+        called when a message is sent via *port*.
+        return the position in the chain the message belongs to, or None
+        """
+        name = self._sources.get(port)
+        if name is not None:
+            self.start_chain(name)
+        return self.current
+
+    def msg_delivered(self, fire_event, in_port):
+        """
+        called when a message arrives at *in_port*. Adds the message as hop
+        to the chain
+        """
+        cause = fire_event.cause
+        if cause is None:
+            self.current = None
+            return
+        path = cause.path
+        drop = len(path) + 1 - self._max_path_len
+        if drop > 0:
+            # keep the last hops only
+            path = path[drop:]
+        context = _CausalContext(
+            cause.chain,
+            cause.num_hops + 1,
+            path
+            + (
+                CausalHop(
+                    fire_event.port,
+                    in_port,
+                    fire_event.request_time,
+                    self._sim.time(),
+                ),
+            ),
+        )
+        self.current = context
+        probe = self._port_probes.get(in_port)
+        if probe is not None:
+            self._record(probe, context)
+
+    def timer_cause(self):
+        """
+        called when a timer is started. return the position in the chain
+        or None
+        """
+        return self.current if self.through_timers else None
+
+    def num_chains(self):
+        """ return the number of chains started """
+        return self._num_chains
+
+    def chains(self):
+        """ return the list of the most recent chains """
+        return list(self._chains)
+
+    def probes(self):
+        """ return dictionary with the probes. key=name """
+        return dict(self._probes)
+
+    @staticmethod
+    def critical_path(chain):
+        """
+        return the hops from the start of *chain* to the probe that
+        recorded the largest latency, as list of :class:`CausalHop`.
+        The first hop is the start of the chain, unless the path is
+        longer than *max_path_len*, then it has only the last hops.
+        Empty if no probe recorded the chain
+        """
+        return list(chain.end_path or ())
+
+    def critical_paths(self):
+        """
+        return the critical paths of the most recent chains as list of
+        dictionaries, ready for JSON
+        """
+        rv = []
+        for chain in self._chains:
+            if chain.end_path is None:
+                continue
+            rv.append(
+                {
+                    "chain": chain.chain_id,
+                    "name": chain.name,
+                    "start_time": chain.start_time,
+                    "latency": chain.latency,
+                    "probe": chain.end_probe,
+                    "hops": chain.end_hops,
+                    "path": [
+                        {
+                            "from": hop.out_port.hierarchy_name(),
+                            "to": hop.in_port.hierarchy_name(),
+                            "request_time": hop.request_time,
+                            "time": hop.time,
+                        }
+                        for hop in self.critical_path(chain)
+                        if hop.out_port is not None
+                    ],
+                }
+            )
+        return rv
+
+    def save_critical_paths(self, file_name):
+        """ write :meth:`critical_paths` as JSON file """
+        file = create_dirs_and_open_output_file(file_name)
+        with file:
+            json.dump(self.critical_paths(), file, indent=1)
+
+    def summary_table(self):
+        """ return a table with the latencies of the probes as lines """
+        time_str = self._sim.time_str
+
+        def fmt(time):
+            return "-" if time is None else time_str(time)
+
+        lines = [
+            "%-24s %8s %10s %10s %10s %10s %10s"
+            % ("probe", "chains", "min", "avg", "p50", "p99", "max")
+        ]
+        for name, probe in sorted(self._probes.items()):
+            hist = probe.latency
+            lines.append(
+                "%-24s %8d %10s %10s %10s %10s %10s"
+                % (
+                    name,
+                    hist.count,
+                    fmt(hist.min),
+                    fmt(hist.mean()),
+                    fmt(hist.quantile(0.5)),
+                    fmt(hist.quantile(0.99)),
+                    fmt(hist.max),
+                )
+            )
+        return lines
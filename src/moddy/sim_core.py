@@ -13,7 +13,7 @@ from heapq import heappush, heappop
 from datetime import datetime
 
 from .version import VERSION
-from .sim_base import SimEvent
+from .sim_base import SimEvent, name_matcher
 from .sim_parts_mgr import SimPartsManager
 from .sim_trace import SimTracing
 from .sim_var_watch import SimVarWatchManager
@@ -26,7 +26,7 @@ class Sim:
 
     def __init__(self):
         self.parts_mgr = SimPartsManager()
-        self.tracing = SimTracing(self.time)
+        self.tracing = SimTracing(self.time, self.parts_mgr.generations)
         self.var_watch_mgr = SimVarWatchManager(self.tracing)
         self.monitor_mgr = SimMonitorManager()
 
@@ -40,6 +40,11 @@ class Sim:
         self._stop_event = None
         self._num_events = 0
         self._start_real_time = None
+        # print port statistics table when simulator stops
+        self._print_port_stats = False
+        # causal chain tracking, see enable_causality()
+        self.causality = None
+        self._print_causality = False
 
     def time(self):
         """ Return current simulation time """
@@ -56,12 +61,19 @@ class Sim:
         self._is_running = False
         elapsed_time = datetime.now() - self._start_real_time
         self._terminate_all_parts()
+        self.tracing.finish()
         print(
             "SIM: Simulator stopped at",
             self.time_str(self._time)
             + ". Executed %d events in %.3f seconds"
             % (self._num_events, elapsed_time.total_seconds()),
         )
+        if self._print_port_stats:
+            self.print_port_stats()
+        if self._print_causality and self.causality is not None:
+            print("SIM: Causal chain latencies")
+            for line in self.causality.summary_table():
+                print("SIM: " + line)
         self.tracing.print_assertion_failures()
 
     def run(
@@ -120,10 +132,14 @@ class Sim:
         self.var_watch_mgr.watch_variables()
 
         self._num_events = 0
+        causality = self.causality
+        if causality is not None:
+            causality.current = None
 
         try:
             while True:
                 if not self._list_events:
+                    self.tracing.flush_trace_prints()
                     print("SIM: Simulator has no more events")
                     break  # no more events, stop
 
@@ -139,15 +155,20 @@ class Sim:
                 self._time = event.exec_time
 
                 if event == self._stop_event:
+                    self.tracing.flush_trace_prints()
                     print("SIM: Stops because stopTime reached")
                     break
 
+                if causality is not None:
+                    # no causal chain until a callback handles one
+                    causality.current = None
                 # print("SIM: Exec event", event, self._time)
                 # pylint: disable=bare-except
                 try:
                     # Catch model exceptions
                     event.execute()
                 except Exception:
+                    self.tracing.flush_trace_prints()
                     print(
                         "SIM: Caught exception while executing event %s"
                         % event,
@@ -161,6 +182,7 @@ class Sim:
                 self.monitor_mgr.call_monitors()
 
                 if max_events is not None and self._num_events >= max_events:
+                    self.tracing.flush_trace_prints()
                     print(
                         "SIM: Simulator has got too many events "
                         "(pass a higher number to run(maxEvents=n)"
@@ -171,6 +193,7 @@ class Sim:
                     self._stop_on_assertion_failure
                     and self.tracing.assertion_failures() > 0
                 ):
+                    self.tracing.flush_trace_prints()
                     print("SIM: Stops due to Assertion Failure")
                     break
         finally:
@@ -188,7 +211,7 @@ class Sim:
         for part in self.parts_mgr.walk_parts():
             part.terminate_sim()
 
-    def smart_bind(self, bindings):
+    def smart_bind(self, bindings, delay=0):
         """
         Create many port bindings at once using simple lists.
 
@@ -204,9 +227,124 @@ class Sim:
             which specifies ports that shall be \
             connected to each other. \
             The strings must specify the hierarchy names of the ports.
+        :param delay: (default: 0) propagation delay of all bindings, \
+            see :meth:`~.SimOutputPort.bind`
 
         """
-        self.parts_mgr.smart_bind(bindings)
+        self.parts_mgr.smart_bind(bindings, delay)
+
+    def bind_pattern(self, out_pattern, in_pattern, delay=0):
+        """
+        Bind ports selected by glob or regex patterns over their hierarchy
+        names. Refer to :meth:`~.SimPartsManager.bind_pattern`
+        """
+        return self.parts_mgr.bind_pattern(out_pattern, in_pattern, delay)
+
+    def bind_matrix(
+        self, parts, out_port_name, in_port_name, matrix, delay=0
+    ):
+        # pylint: disable=too-many-arguments
+        """
+        Bind ports of parts according to an adjacency matrix.
+        Refer to :meth:`~.SimPartsManager.bind_matrix`
+        """
+        self.parts_mgr.bind_matrix(
+            parts, out_port_name, in_port_name, matrix, delay
+        )
+
+    def bind_edges(self, parts, out_port_name, in_port_name, edges, delay=0):
+        # pylint: disable=too-many-arguments
+        """
+        Bind ports of parts according to a list of (i, j) part index pairs.
+        Refer to :meth:`~.SimPartsManager.bind_edges`
+        """
+        self.parts_mgr.bind_edges(
+            parts, out_port_name, in_port_name, edges, delay
+        )
+
+    def enable_port_stats(
+        self, pattern="*", print_summary=True, bins_per_decade=20
+    ):
+        """
+        Collect message statistics on output ports, see
+        :meth:`~.SimOutputPort.enable_stats`.
+        Call this after the model has been created.
+
+        Example:
+
+        .. code-block:: python
+
+            simu.enable_port_stats("Net.*")
+            simu.run(10)
+            stats = simu.port_stats()["Net.port_out"]
+            print(stats.end_to_end.quantile(0.99))
+
+        :param pattern: glob pattern (see :mod:`fnmatch`) or compiled \
+            regular expression that must match the whole hierarchy name \
+            of the output ports
+        :param bool print_summary: print a table with the statistics \
+            when the simulator stops
+        :param int bins_per_decade: resolution of the delay histograms
+        :return: list of :class:`~.sim_port_stats.PortStats`
+        """
+        match = name_matcher(pattern)
+        self._print_port_stats = print_summary
+        return [
+            port.enable_stats(bins_per_decade=bins_per_decade)
+            for port in self.parts_mgr.all_output_ports()
+            if match(port.hierarchy_name())
+        ]
+
+    def port_stats(self):
+        """
+        Return a dictionary with the statistics of all output ports
+        that collect statistics.
+        key=hierarchy name of port, value=:class:`~.sim_port_stats.PortStats`
+        """
+        return {
+            port.hierarchy_name(): port.stats()
+            for port in self.parts_mgr.all_output_ports()
+            if port.stats() is not None
+        }
+
+    def print_port_stats(self):
+        """ print a table with the statistics of the output ports """
+        stats = list(self.port_stats().values())
+        if stats:
+            from .sim_port_stats import port_stats_table
+
+            print("SIM: Port statistics")
+            for line in port_stats_table(stats, self.time_str):
+                print("SIM: " + line)
+
+    def enable_causality(self, print_summary=True, **kwargs):
+        """
+        Track chains of causally related messages and their end-to-end
+        latencies, see :mod:`~.sim_causality`.
+        Must be called before :meth:`run`.
+
+        Example:
+
+        .. code-block:: python
+
+            causality = simu.enable_causality()
+            causality.add_source("Sensor.out_port")
+            causality.add_probe("Actuator.in_port")
+            simu.run(10)
+            causality.save_critical_paths("output/critical_paths.json")
+
+        :param bool print_summary: print a table with the latencies at \
+            the probes when the simulator stops
+        :param kwargs: arguments for \
+            :class:`~.sim_causality.CausalityTracker`: *through_timers*, \
+            *max_chains*, *bins_per_decade*, *max_path_len*
+        :return: the :class:`~.sim_causality.CausalityTracker`
+        """
+        from .sim_causality import CausalityTracker
+
+        self.causality = CausalityTracker(self, **kwargs)
+        self._print_causality = print_summary
+        return self.causality
 
     def time_str(self, time):
         """
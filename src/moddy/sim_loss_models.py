@@ -0,0 +1,222 @@
+"""
+:mod:`sim_loss_models` -- Lost message models
+==============================================
+
+.. module:: sim_loss_models
+   :synopsis: Models to decide which messages sent via an output port \
+       are lost
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A loss model is attached to an output port via
+:meth:`~.SimOutputPort.set_loss_model`. The port asks the model for each
+message it starts to send, whether the message shall be lost.
+
+Random decisions are drawn from a private random generator in blocks, so
+that the per message check is just an index into a pre-drawn block.
+Pass a *seed* to get reproducible losses.
+"""
+import abc
+import random
+
+
+def _check_probability(name, value):
+    """ raise ValueError if *value* is not a probability in [0, 1] """
+    if not 0.0 <= value <= 1.0:
+        raise ValueError("%s must be in [0, 1], not %s" % (name, value))
+
+
+class LossModel(abc.ABC):
+    """
+    Base class of all loss models.
+
+    Subclasses implement :meth:`_next_block`, which must return a sequence
+    of booleans, one decision for each of the next messages. They may
+    override :meth:`is_lost` to decide on the message itself.
+
+    :param seed: seed for random generator. None for a random seed
+    :param int block_size: number of decisions to pre-draw at once
+    """
+
+    def __init__(self, seed=None, block_size=4096):
+        self._rng = random.Random(seed)
+        self._block_size = block_size
+        self._block = ()
+        self._idx = 0
+
+    def is_lost(self, fire_event):
+        """
+        Decide if the message of *fire_event* shall be lost
+
+        :param fire_event: the :class:`~.SimOutputPort.FireEvent` of \
+            the message
+        :return: True if message shall be lost
+        """
+        del fire_event
+        idx = self._idx
+        if idx >= len(self._block):
+            self._block = self._next_block()
+            idx = 0
+        self._idx = idx + 1
+        return self._block[idx]
+
+    @abc.abstractmethod
+    def _next_block(self):
+        """ return the next block of decisions """
+
+    def _uniform_block(self):
+        """ return a block of uniform random numbers in [0,1) """
+        rnd = self._rng.random
+        return [rnd() for _ in range(self._block_size)]
+
+
+class BernoulliLossModel(LossModel):
+    """
+    Lose messages independently of each other.
+
+    Either the frame error rate or the bit error rate must be given.
+    With a bit error rate, the loss probability of a message depends on its
+    length: ``1 - (1 - bit_error_rate) ** bits``. The length is
+    taken from the message's ``byte_len()`` method (e.g. for
+    :class:`~.lib.pdu.Pdu`), otherwise from the length of the serialized
+    message.
+
+    :param float frame_error_rate: probability that a message is lost
+    :param float bit_error_rate: probability that a bit is corrupted
+    :param seed: seed for random generator. None for a random seed
+    :param int block_size: number of random numbers to pre-draw at once
+    :raise ValueError: if not exactly one of the rates is given, or the \
+        rate is not in [0, 1]
+    """
+
+    def __init__(
+        self,
+        frame_error_rate=None,
+        bit_error_rate=None,
+        seed=None,
+        block_size=4096,
+    ):
+        super().__init__(seed, block_size)
+        if (frame_error_rate is None) == (bit_error_rate is None):
+            raise ValueError(
+                "Specify either frame_error_rate or bit_error_rate"
+            )
+        if frame_error_rate is not None:
+            _check_probability("frame_error_rate", frame_error_rate)
+        else:
+            _check_probability("bit_error_rate", bit_error_rate)
+        self._frame_error_rate = frame_error_rate
+        self._bit_error_rate = bit_error_rate
+
+    def _next_block(self):
+        fer = self._frame_error_rate
+        return [rnd < fer for rnd in self._uniform_block()]
+
+    def is_lost(self, fire_event):
+        if self._bit_error_rate is None:
+            return super().is_lost(fire_event)
+
+        idx = self._idx
+        if idx >= len(self._block):
+            self._block = self._uniform_block()
+            idx = 0
+        self._idx = idx + 1
+        bits = fire_event.msg_byte_len() * 8
+        return self._block[idx] < 1 - (1 - self._bit_error_rate) ** bits
+
+
+class GilbertElliottLossModel(LossModel):
+    """
+    Burst loss model with a "good" and a "bad" state.
+
+    Before each message, the model changes from good to bad state with
+    probability *p* and from bad to good state with probability *r*.
+    The message is then lost with the loss probability of the current
+    state.
+
+    :param float p: transition probability from good to bad state
+    :param float r: transition probability from bad to good state
+    :param float loss_good: (default: 0) loss probability in good state
+    :param float loss_bad: (default: 1) loss probability in bad state
+    :param seed: seed for random generator. None for a random seed
+    :param int block_size: number of decisions to pre-draw at once
+    :raise ValueError: if a probability is not in [0, 1]
+    """
+
+    def __init__(
+        self, p, r, loss_good=0.0, loss_bad=1.0, seed=None, block_size=4096
+    ):
+        # pylint: disable=too-many-arguments
+        super().__init__(seed, block_size)
+        for name, value in (
+            ("p", p),
+            ("r", r),
+            ("loss_good", loss_good),
+            ("loss_bad", loss_bad),
+        ):
+            _check_probability(name, value)
+        self._p = p
+        self._r = r
+        self._loss_good = loss_good
+        self._loss_bad = loss_bad
+        self._bad = False
+
+    def _next_block(self):
+        rnd = self._rng.random
+        p_good_bad, p_bad_good = self._p, self._r
+        loss_good, loss_bad = self._loss_good, self._loss_bad
+        bad = self._bad
+        block = []
+        for _ in range(self._block_size):
+            if bad:
+                bad = rnd() >= p_bad_good
+            else:
+                bad = rnd() < p_good_bad
+            block.append(rnd() < (loss_bad if bad else loss_good))
+        self._bad = bad
+        return block
+
+
+class PatternLossModel(LossModel):
+    """
+    Lose messages according to a fixed pattern.
+
+    :param pattern: sequence of decisions, one for each message. \
+        Either a sequence of booleans or a string where ``'x'`` or ``'X'`` \
+        marks a lost message, e.g. ``'..x'`` loses every third message.
+    :param bool repeat: (default: True) repeat the pattern. If False, \
+        no more messages are lost after the pattern
+    """
+
+    def __init__(self, pattern, repeat=True):
+        super().__init__()
+        if isinstance(pattern, str):
+            pattern = [c in "xX" for c in pattern]
+        self._pattern = [bool(lost) for lost in pattern]
+        self._repeat = repeat
+        if not self._pattern:
+            raise ValueError("Empty loss pattern")
+
+    def _next_block(self):
+        if self._repeat:
+            return self._pattern
+        block = self._pattern
+        self._pattern = [False]
+        self._repeat = True
+        return block
+
+
+class PeriodicLossModel(PatternLossModel):
+    """
+    Lose *burst* messages every *period* messages.
+
+    :param int period: number of messages in one period
+    :param int burst: (default: 1) number of lost messages per period
+    :param int offset: (default: 0) index of first lost message in period
+    """
+
+    def __init__(self, period, burst=1, offset=0):
+        if not 0 < burst <= period or not 0 <= offset < period:
+            raise ValueError("Illegal period, burst or offset")
+        super().__init__(
+            [(idx - offset) % period < burst for idx in range(period)]
+        )
@@ -0,0 +1,422 @@
+"""
+:mod:`sim_model_desc` -- Declarative model descriptions
+=======================================================
+
+.. module:: sim_model_desc
+   :synopsis: Build models from JSON, YAML or TOML model descriptions
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A model description lists the parts of a model with their classes,
+constructor parameters and elements, and the port bindings.
+Example in YAML:
+
+.. code-block:: yaml
+
+    parts:
+      - name: Prod
+        class: mymodel.Producer
+        params: {interval: 2}
+        elems: {out: port, tmr: tmr}
+      - name: Node
+        class: mymodel.Node
+        count: 100              # creates Node[0] .. Node[99]
+        elems: {in: port}
+        subparts:
+          - {name: Cpu, class: mymodel.Cpu}
+    bindings:
+      - [Prod.port, "Node[0].port"]
+      - {ports: [Prod.port, "Node[1].port"], delay: 0.5}
+      - {out: Prod.port, in: 'Node\\[[2-9]\\]\\.port', regex: true}
+
+Part keys:
+
+    * ``name`` (required): object name of the part. With ``count``, the \
+        base name of the parts
+    * ``class``: dotted path of the part class, default ``moddy.SimPart``. \
+        The class must accept the keyword arguments *sim*, *obj_name* and \
+        *parent_obj*
+    * ``params``: further keyword arguments for the part's constructor
+    * ``elems``: ports and timers to create, as the ``elems`` parameter of \
+        :class:`~.SimPart`. They are created by a \
+        :class:`~.sim_part_template.SimPartTemplate`, so the part class must \
+        not create them itself
+    * ``count``: number of parts to create. The parts are named \
+        ``name[0]``, ``name[1]``...
+    * ``subparts``: list of child parts, with the same keys
+
+A binding is either a list of port hierarchy names
+(see :meth:`~.Sim.smart_bind`), or a dictionary with either ``ports`` (the
+same list) or ``out`` and ``in`` patterns (see :meth:`~.Sim.bind_pattern`,
+``regex: true`` to use regular expressions, which must match the whole
+port name) and an optional ``delay``.
+
+The description is validated and compiled into a :class:`CompiledModel`.
+:func:`compile_model_file` caches the compiled model in a file whose name is
+the hash of the description, so later runs with the same description skip
+parsing and validation.
+"""
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import re
+
+from .sim_part_template import SimPartTemplate
+
+# increment when the compiled model format changes
+_COMPILED_FORMAT = 1
+
+_PART_KEYS = {"name", "class", "params", "elems", "count", "subparts"}
+_DEFAULT_PART_CLASS = "moddy.SimPart"
+
+
+class CompiledModel:
+    """
+    A validated model description that can be built into simulators.
+
+    Parts are stored as tuples
+    ``(name, class path, params, elems, count, subparts)``, bindings as
+    tuples ``('ports', port names, delay)`` or
+    ``('pattern', out pattern, in pattern, regex, delay)``.
+
+    :param tuple parts: compiled top level parts
+    :param tuple bindings: compiled bindings
+    """
+
+    def __init__(self, parts, bindings):
+        self.parts = parts
+        self.bindings = bindings
+
+    def build(self, sim):
+        """
+        Create the parts and bindings of the model in *sim*
+
+        :param sim: Simulator instance
+        :return: dictionary of all parts created from the description, \
+            indexed by their hierarchy name
+        """
+        templates = {}
+        created = {}
+
+        def build_parts(parts, parent_obj):
+            for spec in parts:
+                name, class_path, params, elems, count, subparts = spec
+                # one template per part spec, also for subparts of
+                # multiple parents
+                template = templates.get(id(spec))
+                if template is None:
+                    template = SimPartTemplate(
+                        _import_class(class_path), elems, **params
+                    )
+                    templates[id(spec)] = template
+
+                if count is None:
+                    new_parts = [template.instantiate(sim, name, parent_obj)]
+                else:
+                    new_parts = template.instantiate_many(
+                        sim, name, count, parent_obj
+                    )
+                for part in new_parts:
+                    created[part.hierarchy_name()] = part
+                    if subparts:
+                        build_parts(subparts, part)
+
+        build_parts(self.parts, None)
+
+        for binding in self.bindings:
+            if binding[0] == "ports":
+                sim.smart_bind([binding[1]], binding[2])
+            else:
+                _, out_pattern, in_pattern, regex, delay = binding
+                if regex:
+                    out_pattern = re.compile(out_pattern)
+                    in_pattern = re.compile(in_pattern)
+                sim.bind_pattern(out_pattern, in_pattern, delay)
+        return created
+
+
+def _import_class(class_path):
+    """ import class from dotted path "module.Class" """
+    module_name, _, class_name = class_path.rpartition(".")
+    if not module_name:
+        raise ValueError("class %s must be a dotted path" % class_path)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _compile_elems(elems, where):
+    if not isinstance(elems, dict):
+        raise ValueError("%s: elems must be a dictionary" % where)
+    compiled = {}
+    for el_type, names in elems.items():
+        if isinstance(names, str):
+            names = [names]
+        if not isinstance(names, list) or not all(
+            isinstance(name, str) for name in names
+        ):
+            raise ValueError(
+                "%s: elems %s must be a name or list of names"
+                % (where, el_type)
+            )
+        compiled[el_type] = list(names)
+    return compiled
+
+
+def _compile_parts(parts, where):
+    if not isinstance(parts, list):
+        raise ValueError("%s must be a list" % where)
+    compiled = []
+    names = set()
+    for idx, part in enumerate(parts):
+        part_where = "%s[%d]" % (where, idx)
+        if not isinstance(part, dict):
+            raise ValueError("%s must be a dictionary" % part_where)
+        unknown = set(part) - _PART_KEYS
+        if unknown:
+            raise ValueError(
+                "%s: unknown keys %s" % (part_where, ", ".join(sorted(unknown)))
+            )
+        name = part.get("name")
+        if not isinstance(name, str) or not name or "." in name:
+            raise ValueError("%s: illegal or missing name" % part_where)
+        if name in names:
+            raise ValueError("%s: duplicate part name %s" % (part_where, name))
+        names.add(name)
+
+        class_path = part.get("class", _DEFAULT_PART_CLASS)
+        if not isinstance(class_path, str) or "." not in class_path:
+            raise ValueError("%s: class must be a dotted path" % part_where)
+
+        params = part.get("params", {})
+        if not isinstance(params, dict):
+            raise ValueError("%s: params must be a dictionary" % part_where)
+
+        count = part.get("count")
+        if count is not None and (
+            not isinstance(count, int) or isinstance(count, bool) or count < 0
+        ):
+            raise ValueError("%s: count must be an integer >= 0" % part_where)
+
+        compiled.append(
+            (
+                name,
+                class_path,
+                params,
+                _compile_elems(part.get("elems", {}), part_where),
+                count,
+                _compile_parts(
+                    part.get("subparts", []), part_where + ".subparts"
+                ),
+            )
+        )
+    return tuple(compiled)
+
+
+def _compile_delay(binding, where):
+    delay = binding.get("delay", 0)
+    if (
+        not isinstance(delay, (int, float))
+        or isinstance(delay, bool)
+        or delay < 0
+    ):
+        raise ValueError("%s: delay must be a number >= 0" % where)
+    return delay
+
+
+def _compile_port_list(ports, where):
+    if (
+        not isinstance(ports, list)
+        or len(ports) < 2
+        or not all(isinstance(port, str) for port in ports)
+    ):
+        raise ValueError("%s must be a list of at least 2 port names" % where)
+    return tuple(ports)
+
+
+def _compile_bindings(bindings):
+    if not isinstance(bindings, list):
+        raise ValueError("bindings must be a list")
+    compiled = []
+    for idx, binding in enumerate(bindings):
+        where = "bindings[%d]" % idx
+        if isinstance(binding, list):
+            compiled.append(("ports", _compile_port_list(binding, where), 0))
+        elif isinstance(binding, dict):
+            delay = _compile_delay(binding, where)
+            if "ports" in binding:
+                if set(binding) - {"ports", "delay"}:
+                    raise ValueError("%s: unknown keys" % where)
+                ports = _compile_port_list(binding["ports"], where)
+                compiled.append(("ports", ports, delay))
+            else:
+                if set(binding) - {"out", "in", "regex", "delay"}:
+                    raise ValueError("%s: unknown keys" % where)
+                out_pattern = binding.get("out")
+                in_pattern = binding.get("in")
+                if not isinstance(out_pattern, str) or not isinstance(
+                    in_pattern, str
+                ):
+                    raise ValueError(
+                        "%s: needs 'ports' or 'out' and 'in' patterns" % where
+                    )
+                regex = bool(binding.get("regex", False))
+                if regex:
+                    for pattern in (out_pattern, in_pattern):
+                        try:
+                            re.compile(pattern)
+                        except re.error as exc:
+                            raise ValueError(
+                                "%s: illegal regex %s: %s"
+                                % (where, pattern, exc)
+                            ) from exc
+                compiled.append(
+                    ("pattern", out_pattern, in_pattern, regex, delay)
+                )
+        else:
+            raise ValueError("%s must be a list or dictionary" % where)
+    return tuple(compiled)
+
+
+def compile_model(desc):
+    """
+    Validate a model description and compile it
+
+    :param dict desc: the model description, with the keys ``parts`` and \
+        (optionally) ``bindings``
+    :return: :class:`CompiledModel`
+    :raise ValueError: if the description is invalid
+    """
+    if not isinstance(desc, dict):
+        raise ValueError("model description must be a dictionary")
+    unknown = set(desc) - {"parts", "bindings"}
+    if unknown:
+        raise ValueError("unknown keys %s" % ", ".join(sorted(unknown)))
+    return CompiledModel(
+        _compile_parts(desc.get("parts", []), "parts"),
+        _compile_bindings(desc.get("bindings", [])),
+    )
+
+
+def _parse_model_file(path, content):
+    """ parse model description file content according to file extension """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        return json.loads(content.decode("utf-8"))
+    if ext in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as exc:
+            raise ImportError(
+                "PyYAML is required to load %s" % path
+            ) from exc
+        return yaml.safe_load(content)
+    if ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError as exc:
+                raise ImportError(
+                    "tomli is required to load %s" % path
+                ) from exc
+        return tomllib.loads(content.decode("utf-8"))
+    raise ValueError("Unknown model description format %s" % path)
+
+
+def _read_cache(cache_file):
+    """
+    return the compiled model from *cache_file*, None if there is no
+    usable cache file. Files of other users are ignored, unreadable files
+    are deleted
+    """
+    try:
+        with open(cache_file, "rb") as file:
+            getuid = getattr(os, "getuid", None)
+            if (
+                getuid is not None
+                and os.fstat(file.fileno()).st_uid != getuid()
+            ):
+                return None
+            compiled = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception:  # pylint: disable=broad-except
+        # stale or corrupt cache, e.g. refers to renamed classes
+        compiled = None
+    if not isinstance(compiled, CompiledModel):
+        try:
+            os.remove(cache_file)
+        except OSError:
+            pass
+        return None
+    return compiled
+
+
+def compile_model_file(path, cache_dir=None, use_cache=True):
+    """
+    Load and compile a model description file.
+
+    The format is determined by the file extension: ``.json``, ``.yaml`` or
+    ``.yml`` (requires PyYAML), ``.toml`` (requires Python 3.11 or tomli).
+
+    The cache is a pickle file. Loading a pickle file can run arbitrary
+    code, so the cache must be in a directory that only trusted users can
+    write to. On POSIX systems, cache files that are not owned by the
+    current user are ignored.
+
+    :param str path: path of the model description
+    :param str cache_dir: directory for the compiled model cache. \
+        Default is ``__moddycache__`` next to the description file
+    :param bool use_cache: (default: True) read and write the compiled \
+        model cache
+    :return: :class:`CompiledModel`
+    :raise ValueError: if the description is invalid
+    """
+    with open(path, "rb") as file:
+        content = file.read()
+
+    cache_file = None
+    if use_cache:
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.path.dirname(os.path.abspath(path)), "__moddycache__"
+            )
+        digest = hashlib.sha256(content)
+        digest.update(os.path.splitext(path)[1].lower().encode())
+        cache_file = os.path.join(
+            cache_dir, "%s.%d.pickle" % (digest.hexdigest(), _COMPILED_FORMAT)
+        )
+        compiled = _read_cache(cache_file)
+        if compiled is not None:
+            return compiled
+
+    compiled = compile_model(_parse_model_file(path, content))
+
+    if cache_file is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+            with open(tmp_file, "wb") as file:
+                pickle.dump(compiled, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass  # model can be used without cache
+    return compiled
+
+
+def load_model(sim, path, cache_dir=None, use_cache=True):
+    """
+    Build the model described in a model description file
+
+    :param sim: Simulator instance
+    :param str path: path of the model description
+    :param str cache_dir: directory for the compiled model cache, \
+        see :func:`compile_model_file`. Loading the cache runs code of the \
+        pickled objects, so don't use a cache directory that others can \
+        write to, or pass ``use_cache=False``
+    :param bool use_cache: (default: True) use the compiled model cache
+    :return: dictionary of all parts created from the description, \
+        indexed by their hierarchy name
+    """
+    return compile_model_file(path, cache_dir, use_cache).build(sim)
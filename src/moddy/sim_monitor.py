@@ -7,7 +7,7 @@
 .. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
 
 """
-from .sim_base import add_elem_to_list
+from .sim_base import ElemList, add_elem_to_list
 
 
 class SimMonitorManager:
@@ -17,7 +17,7 @@ class SimMonitorManager:
 
     def __init__(self):
         # list of monitors (called on each simulator step)
-        self._list_monitors = []
+        self._list_monitors = ElemList()
 
     def add_monitor(self, monitor_func):
         """
@@ -8,7 +8,7 @@
 .. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
 
 """
-from .sim_base import SimBaseElement, add_elem_to_list
+from .sim_base import SimBaseElement, ElemList, add_elem_to_list
 from .sim_var_watch import SimVariableWatcher
 from .sim_ports import SimInputPort, SimOutputPort, SimIOPort, SimTimer
 
@@ -27,10 +27,13 @@ class SimPart(SimBaseElement):
 
     def __init__(self, sim, obj_name, parent_obj=None, elems=None):
         super().__init__(sim, parent_obj, obj_name, "Part")
-        self._list_ports = []
-        self._list_timers = []
-        self._list_subparts = []  # child parts list
-        self._list_var_watchers = []
+        self._list_ports = ElemList()
+        self._list_timers = ElemList()
+        self._list_subparts = ElemList()  # child parts list
+        self._list_var_watchers = ElemList()
+        # name indexes of sub parts and ports (incl. IO sub-ports)
+        self._sub_parts_by_name = {}
+        self._ports_by_name = {}
         self._state_ind = None
 
         if parent_obj is not None:
@@ -51,15 +54,31 @@ class SimPart(SimBaseElement):
         add_elem_to_list(
             self._list_subparts, sub_part, self.__str__() + ":subparts"
         )
+        self._sub_parts_by_name.setdefault(sub_part.obj_name(), sub_part)
+        self.structure_changed()
 
     def sub_parts(self):
         """ return list of child parts """
         return self._list_subparts
 
+    def sub_part_by_name(self, name):
+        """
+        return child part with object name *name* (None if not found)
+        """
+        return self._sub_parts_by_name.get(name)
+
     def ports(self):
         """ return all ports of that part """
         return self._list_ports
 
+    def port_by_name(self, name):
+        """
+        return port with object name *name* (None if not found).
+        The input and output ports of IO ports can be found by their
+        names, e.g. "io_port1_in"
+        """
+        return self._ports_by_name.get(name)
+
     def annotation(self, text):
         """Add annotation from model at current simulation time"""
         self._sim.tracing.annotation(self, text)
@@ -90,6 +109,30 @@ class SimPart(SimBaseElement):
         self._state_ind = text
         self._sim.tracing.set_state_indicator(self, text, appearance)
 
+    def start_causal_chain(self, name=None):
+        """
+        Start a new causal chain. Messages sent by the current callback
+        belong to the chain. Does nothing if causality tracking is not
+        enabled, see :meth:`~.Sim.enable_causality`
+
+        :param str name: name of the chain. Default is the part's \
+            hierarchy name
+        """
+        causality = self._sim.causality
+        if causality is not None:
+            causality.start_chain(name or self.hierarchy_name())
+
+    def causal_probe(self, name):
+        """
+        Record the latency of the causal chain handled by the current
+        callback at the probe *name*. Does nothing if the callback doesn't
+        handle a chain or causality tracking is not enabled, see
+        :meth:`~.Sim.enable_causality`
+        """
+        causality = self._sim.causality
+        if causality is not None:
+            causality.probe(name)
+
     def new_input_port(self, name, msg_received_func):
         """
         Add a new input port to the part
@@ -161,6 +204,11 @@ class SimPart(SimBaseElement):
         :raise: RuntimeError If port already in this part
         """
         add_elem_to_list(self._list_ports, port, self.__str__() + ":ports")
+        self._ports_by_name.setdefault(port.obj_name(), port)
+        if isinstance(port, SimIOPort):
+            for sub_port in (port.in_port(), port.out_port()):
+                self._ports_by_name.setdefault(sub_port.obj_name(), sub_port)
+        self.structure_changed()
 
     def add_timer(self, timer):
         """
@@ -171,6 +219,25 @@ class SimPart(SimBaseElement):
         """
         add_elem_to_list(self._list_timers, timer, self.__str__() + ":timers")
 
+    def add_new_elements(self, ports=(), timers=()):
+        """
+        Add many newly created ports and timers to this part at once.
+        Unlike :meth:`add_port` and :meth:`add_timer`, this does not check
+        whether an element has already been added.
+
+        :param list ports: ports to add
+        :param list timers: timers to add
+        """
+        self._list_ports.extend(ports)
+        self._list_timers.extend(timers)
+        ports_by_name = self._ports_by_name
+        for port in ports:
+            ports_by_name.setdefault(port.obj_name(), port)
+            if isinstance(port, SimIOPort):
+                for sub_port in (port.in_port(), port.out_port()):
+                    ports_by_name.setdefault(sub_port.obj_name(), sub_port)
+        self.structure_changed()
+
     def add_var_watcher(self, var_watcher):
         """
         Add a variable watcher to this part and to simulator
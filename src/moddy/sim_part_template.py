@@ -0,0 +1,155 @@
+"""
+:mod:`sim_part_template` -- Bulk part instantiation
+===================================================
+
+.. module:: sim_part_template
+   :synopsis: Stamp out many instances of the same part class
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`SimPartTemplate` analyzes the element specification of a part
+class once: it normalizes the *elems* dictionary and determines the
+names of the ``<port>_recv`` and ``<tmr>_expired`` callbacks. Instantiating
+the template then only constructs the ports and timers and adds them to the
+new part at once, without the per element checks of
+:meth:`~.SimPart.create_elements`.
+"""
+from .sim_part import SimPart
+from .sim_ports import SimInputPort, SimOutputPort, SimIOPort, SimTimer
+
+# element type -> (element class, callback name format or None)
+_ELEM_TYPES = {
+    "in": (SimInputPort, "%s_recv"),
+    "out": (SimOutputPort, None),
+    "io": (SimIOPort, "%s_recv"),
+    "tmr": (SimTimer, "%s_expired"),
+}
+
+
+class SimPartTemplate:
+    """
+    Template to create many parts of the same class with the same elements.
+
+    The part class must accept the keyword arguments *sim*, *obj_name* and
+    *parent_obj*. *elems* are not passed to the part's constructor, but
+    created by the template after the part has been constructed.
+
+    If the part class overrides :meth:`~.SimPart.create_elements`,
+    :meth:`~.SimPart.create_ports` or :meth:`~.SimPart.create_timers`
+    (e.g. :class:`~.vthread.VThread`), the template calls the part's
+    ``create_elements`` for each instance.
+
+    :param part_class: class of the parts to create, a subclass of \
+        :class:`~.SimPart`
+    :param dict elems: A dictionary with elements (ports and timers) to \
+        create, e.g. ``{ 'in': 'inPort1', 'out': ['outPort1', 'outPort2'], \
+        'tmr' : 'timer1' }``
+    :param part_args: further keyword arguments passed to the constructor \
+        of each part
+    :raise ValueError: if an element name is used twice
+    """
+
+    def __init__(self, part_class, elems=None, **part_args):
+        self._part_class = part_class
+        self._part_args = part_args
+        self._elems = {}
+        names = set()
+        for el_type, el_names in (elems or {}).items():
+            if isinstance(el_names, str):
+                el_names = [el_names]
+            for name in el_names:
+                if name in names:
+                    raise ValueError("Element %s used twice" % name)
+                names.add(name)
+            self._elems.setdefault(el_type, []).extend(el_names)
+
+        self._elem_specs = None
+        if self._standard_elements():
+            self._elem_specs = self._make_elem_specs()
+
+    def _standard_elements(self):
+        """
+        return True if the elements can be created by the template itself
+        """
+        part_class = self._part_class
+        return (
+            part_class.create_elements is SimPart.create_elements
+            and part_class.create_ports is SimPart.create_ports
+            and part_class.create_timers is SimPart.create_timers
+            and all(el_type in _ELEM_TYPES for el_type in self._elems)
+        )
+
+    def _make_elem_specs(self):
+        """
+        return list of (name, element class, callback name, is timer)
+        callback name is None for output ports
+        """
+        specs = []
+        for el_type, el_names in self._elems.items():
+            el_class, cb_fmt = _ELEM_TYPES[el_type]
+            for name in el_names:
+                cb_name = None if cb_fmt is None else cb_fmt % name
+                specs.append((name, el_class, cb_name, el_class is SimTimer))
+        return specs
+
+    def part_class(self):
+        """ return the class of the parts created by the template """
+        return self._part_class
+
+    def instantiate(self, sim, obj_name, parent_obj=None):
+        """
+        Create one part from the template
+
+        :param sim: Simulator instance
+        :param obj_name: part's name
+        :param parent_obj: parent part. None if part has no parent.
+        :return: the new part
+        """
+        part = self._part_class(
+            sim=sim, obj_name=obj_name, parent_obj=parent_obj, **self._part_args
+        )
+        specs = self._elem_specs
+        if specs is None:
+            part.create_elements(self._elems)
+            return part
+
+        elements = {}
+        ports = []
+        timers = []
+        for name, el_class, cb_name, is_timer in specs:
+            if cb_name is None:
+                elem = el_class(sim, part, name)
+            else:
+                # resolved at the instance, so that callbacks assigned in
+                # the part's constructor, static methods and callable
+                # objects work like with create_elements
+                elem = el_class(sim, part, name, getattr(part, cb_name))
+            if is_timer:
+                timers.append(elem)
+            else:
+                ports.append(elem)
+            elements[name] = elem
+        part.add_new_elements(ports, timers)
+        part.__dict__.update(elements)
+        return part
+
+    def instantiate_many(
+        self, sim, base_name, count, parent_obj=None, name_fmt="%s[%d]"
+    ):
+        """
+        Create *count* parts from the template
+
+        :param sim: Simulator instance
+        :param base_name: base name of the parts
+        :param int count: number of parts to create
+        :param parent_obj: parent part. None if parts have no parent.
+        :param name_fmt: format of the part names, formatted with \
+            *base_name* and the part index (0..count-1). \
+            The default creates names like ``node[0]``, ``node[1]``...
+        :return: list of the new parts
+        """
+        # pylint: disable=too-many-arguments
+        instantiate = self.instantiate
+        return [
+            instantiate(sim, name_fmt % (base_name, idx), parent_obj)
+            for idx in range(count)
+        ]
@@ -7,10 +7,10 @@
 .. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
 
 '''
-
 from .sim_base import SimBaseElement
 from .sim_part import SimPart
-from .sim_base import add_elem_to_list
+from .sim_base import add_elem_to_list, ElemList, ModelGenerations, \
+    name_matcher
 from .sim_ports import SimOutputPort, SimIOPort
 from moddy.sim_ports import SimInputPort
 
@@ -21,7 +21,16 @@ class SimPartsManager:
     '''
 
     def __init__(self):
-        self._top_level_parts = []
+        # counters that change whenever the model changes
+        self.generations = ModelGenerations()
+        self._top_level_parts = ElemList()
+        # name index of top level parts. Lower levels are indexed by parts
+        self._top_level_parts_by_name = {}
+        # flattened, pre-ordered lists of all parts and ports.
+        # Valid while _flat_generation equals generations.structure
+        self._flat_parts = []
+        self._flat_ports = []
+        self._flat_generation = None
 
     def add_top_level_part(self, part):
         '''Add part to simulators part list'''
@@ -31,21 +40,68 @@ class SimPartsManager:
             raise ValueError("part %s is not a top level part" % (part))
 
         add_elem_to_list(self._top_level_parts, part, "SimParts TL-Parts")
+        if part._sim is None:
+            # elements created without simulator, and elements added to
+            # them later, use the generations of this manager
+            self._adopt_generations(part)
+        self._top_level_parts_by_name.setdefault(part.obj_name(), part)
+        self.generations.structure += 1
+
+    def _adopt_generations(self, part):
+        '''
+        Let *part* and all elements below it use the generations of this
+        manager
+        '''
+        part._generations = self.generations
+        elems = list(part._list_timers) + list(part._list_var_watchers)
+        for port in part.ports():
+            elems.append(port)
+            if isinstance(port, SimIOPort):
+                elems += [port.out_port(), port.in_port()]
+        for elem in elems:
+            elem._generations = self.generations
+        for sub_part in part.sub_parts():
+            self._adopt_generations(sub_part)
 
     def top_level_parts(self):
         ''' get list of top level parts '''
         return self._top_level_parts
 
-    def walk_parts(self):
-        ''' Generator to walk recoursively through all parts '''
-        for part in self._top_level_parts:
-            yield part
-            yield from self._walk_sub_parts(part)
+    def _update_flat_lists(self):
+        '''
+        Rebuild the flattened part and port lists if the model structure
+        has changed since they have been built
+        '''
+        if self._flat_generation == self.generations.structure:
+            return
+
+        parts = []
+        ports = []
+        # iterative pre-order walk
+        stack = list(reversed(self._top_level_parts))
+        while stack:
+            part = stack.pop()
+            parts.append(part)
+            stack.extend(reversed(part.sub_parts()))
 
-    def _walk_sub_parts(self, part):
-        for sub_part in part.sub_parts():
-            yield sub_part
-            yield from self._walk_sub_parts(sub_part)
+            for port in part.ports():
+                if isinstance(port, SimIOPort):
+                    ports.append(port.in_port())
+                    ports.append(port.out_port())
+                else:
+                    ports.append(port)
+
+        self._flat_parts = parts
+        self._flat_ports = ports
+        self._flat_generation = self.generations.structure
+
+    def walk_parts(self):
+        '''
+        Iterate through all parts, parents before their children.
+        Uses a cached, flattened list of all parts
+        '''
+        self._update_flat_lists()
+        return iter(self._flat_parts)
 
     def find_part_by_name(self, part_hierarchy_name, start_part=None):
         '''
@@ -56,28 +112,29 @@ class SimPartsManager:
         :return simPart part: the found part
         :raises ValueError: if part not found
         '''
+        path_elems = part_hierarchy_name.split('.')
+
         if start_part is None:
-            lst_parts = self._top_level_parts
+            part = self._top_level_parts_by_name.get(path_elems[0])
+            path_elems = path_elems[1:]
         else:
-            lst_parts = start_part.sub_parts()
-
-        path_elems = part_hierarchy_name.split('.')
+            part = start_part
 
-        for part in lst_parts:
-            if path_elems[0] == part.obj_name():
-                if len(path_elems) > 1:
-                    return self.find_part_by_name('.'.join(path_elems[1:]),
-                                                  part)
-                return part
+        for path_elem in path_elems:
+            if part is None:
+                break
+            part = part.sub_part_by_name(path_elem)
 
-        raise ValueError("Part not found %s" %
-                         (start_part.hierarchy_name() if start_part
-                          is not None else '' + '.' +
-                          part_hierarchy_name))
+        if part is None:
+            raise ValueError("Part not found %s" %
+                             (part_hierarchy_name if start_part is None
+                              else start_part.hierarchy_name() + '.' +
+                              part_hierarchy_name))
+        return part
 
     def walk_ports(self, port_class=SimBaseElement):
         '''
-        Generator to walk recoursively through all ports.
+        Iterate through all ports. Uses a cached, flattened list of all ports.
 
         For SimIOPorts the in and out ports are returned separately
         (but not the ioport)
@@ -85,16 +142,11 @@ class SimPartsManager:
         :param port_class: only handle ports with this class or \
             a subclass of it. If None, handle all
         '''
-        for part in self.walk_parts():
-            for port in part.ports():
-                if isinstance(port, SimIOPort):
-                    sub_ports = [port.in_port(), port.out_port()]
-                else:
-                    sub_ports = [port]
-
-                for sub_port in sub_ports:
-                    if isinstance(sub_port, port_class):
-                        yield sub_port
+        self._update_flat_lists()
+        if port_class in (None, SimBaseElement):
+            return iter(self._flat_ports)
+        return (port for port in self._flat_ports
+                if isinstance(port, port_class))
 
     def all_output_ports(self):
         ''' Return a list of all output ports '''
@@ -119,22 +171,20 @@ class SimPartsManager:
         :raises ValueError: if port not found
         '''
 
-        for part in self.walk_parts():
-            for port in part.ports():
-                # print("findPortByName %s %s" % (port.hierarchy_name(),
-                # port._typeStr ))
-                if port.hierarchy_name() == port_hierarchy_name:
-                    return port
-
-                if isinstance(port, SimIOPort):
-                    if port.in_port().hierarchy_name() == port_hierarchy_name:
-                        return port.in_port()
-                    if port.out_port().hierarchy_name() == port_hierarchy_name:
-                        return port.out_port()
+        port = None
+        part_name, _, port_name = port_hierarchy_name.rpartition('.')
+        if part_name != '':
+            try:
+                port = self.find_part_by_name(part_name).port_by_name(
+                    port_name)
+            except ValueError:
+                pass
 
-        raise ValueError("Port not found %s" % port_hierarchy_name)
+        if port is None:
+            raise ValueError("Port not found %s" % port_hierarchy_name)
+        return port
 
-    def smart_bind(self, bindings):
+    def smart_bind(self, bindings, delay=0):
         '''
         Create many port bindings at once using simple lists.
 
@@ -150,32 +200,211 @@ class SimPartsManager:
             which specifies ports that shall be \
             connected to each other. \
             The strings must specify the hierarchy names of the ports.
+        :param delay: (default: 0) propagation delay of all bindings, \
+            see :meth:`~.SimOutputPort.bind`
 
         '''
 
         for binding in bindings:
-            self._single_smart_bind(binding)
+            self._single_smart_bind(binding, delay)
 
-    def _single_smart_bind(self, binding):
+    def _single_smart_bind(self, binding, delay):
         # determine output and input ports
         out_ports = []
         in_ports = []
 
         for port_name in binding:
-            port = self.find_port_by_name(port_name)
+            self._add_to_out_in_ports(self.find_port_by_name(port_name),
+                                      out_ports, in_ports)
 
-            if isinstance(port, SimOutputPort):
-                out_ports.append(port)
-            elif isinstance(port, SimIOPort):
-                out_ports.append(port.out_port())
-                in_ports.append(port.in_port())
-            elif isinstance(port, SimInputPort):
-                in_ports.append(port)
+        self._bind_all(out_ports, in_ports, delay)
 
-        # bind all output ports to all input ports
+    @staticmethod
+    def _add_to_out_in_ports(port, out_ports, in_ports):
+        '''
+        add port to out_ports or in_ports. IO ports are added to both
+        '''
+        if isinstance(port, SimOutputPort):
+            out_ports.append(port)
+        elif isinstance(port, SimIOPort):
+            out_ports.append(port.out_port())
+            in_ports.append(port.in_port())
+        elif isinstance(port, SimInputPort):
+            in_ports.append(port)
+
+    @staticmethod
+    def _bind_all(out_ports, in_ports, delay):
+        '''
+        bind all output ports to all input ports (except the in/out ports of
+        the same IO port)
+        '''
         for out_port in out_ports:
             for in_port in in_ports:
                 if out_port.io_port() is None or \
                         (out_port.io_port() != in_port.io_port()):
 
-                    out_port.bind(in_port)
+                    out_port.bind(in_port, delay)
+
+    def bind_pattern(self, out_pattern, in_pattern, delay=0):
+        '''
+        Bind ports selected by patterns over their hierarchy names.
+
+        Example:
+
+        .. code-block:: python
+
+            # bind the output of the producer to the inputs of all nodes
+            simu.bind_pattern('Prod.out_port', 'Node*.in_port')
+
+            # bind nodes to a ring
+            simu.bind_pattern(re.compile(r'Node(\\d+)\\.out_port'),
+                              lambda m: 'Node%d.in_port' %
+                              ((int(m.group(1)) + 1) % num_nodes))
+
+        :param out_pattern: pattern for the ports that send the messages. \
+            Either a glob pattern string (see :mod:`fnmatch`) or a compiled \
+            regular expression that must match the whole name.
+        :param in_pattern: pattern for the ports that receive the messages \
+            (same types as *out_pattern*). All matching output ports are \
+            bound to all matching input ports. \
+            Alternatively, a function that is called for each matching \
+            output port with the regex match object (None for glob \
+            patterns) and the port, and returns the hierarchy name or a \
+            list of hierarchy names of the ports to bind to.
+        :param delay: (default: 0) propagation delay of all bindings, \
+            see :meth:`~.SimOutputPort.bind`
+        :return: number of output ports that matched *out_pattern*
+
+        IO ports match with their own name and with the names of their \
+        input and output ports. IO ports contribute to the sending and \
+        receiving ports, like in :meth:`smart_bind`.
+        '''
+        out_match = name_matcher(out_pattern)
+        out_is_regex = hasattr(out_pattern, 'match')
+        in_match = (None if callable(in_pattern) and not
+                    hasattr(in_pattern, 'match')
+                    else name_matcher(in_pattern))
+        # key=port, value=match. dicts to ignore ports matched twice
+        out_ports = {}
+        in_ports = {}
+
+        # single pass over all ports
+        for part in self.walk_parts():
+            for port in part.ports():
+                if isinstance(port, SimIOPort):
+                    candidates = (port, port.out_port(), port.in_port())
+                else:
+                    candidates = (port,)
+
+                for cand in candidates:
+                    name = cand.hierarchy_name()
+                    match = out_match(name)
+                    if match:
+                        cand_out = []
+                        self._add_to_out_in_ports(cand, cand_out, [])
+                        for out_port in cand_out:
+                            out_ports.setdefault(out_port, match)
+                    if in_match is not None and in_match(name):
+                        cand_in = []
+                        self._add_to_out_in_ports(cand, [], cand_in)
+                        for in_port in cand_in:
+                            in_ports.setdefault(in_port, True)
+
+        if in_match is not None:
+            self._bind_all(out_ports, in_ports, delay)
+        else:
+            for out_port, match in out_ports.items():
+                names = in_pattern(match if out_is_regex else None,
+                                   out_port)
+                if isinstance(names, str):
+                    names = [names]
+                peer_in_ports = []
+                for name in names:
+                    self._add_to_out_in_ports(self.find_port_by_name(name),
+                                              [], peer_in_ports)
+                self._bind_all([out_port], peer_in_ports, delay)
+
+        return len(out_ports)
+
+    def _resolve_parts_ports(self, parts, out_port_name, in_port_name):
+        '''
+        return lists with output and input ports of *parts*
+        '''
+        out_ports = []
+        in_ports = []
+        for part in parts:
+            if isinstance(part, str):
+                part = self.find_part_by_name(part)
+            for port_name, lst, idx in ((out_port_name, out_ports, 0),
+                                        (in_port_name, in_ports, 1)):
+                port = part.port_by_name(port_name)
+                if port is None:
+                    raise ValueError("Port not found %s.%s" %
+                                     (part.hierarchy_name(), port_name))
+                if isinstance(port, SimIOPort):
+                    port = (port.out_port(), port.in_port())[idx]
+                lst.append(port)
+        return out_ports, in_ports
+
+    def bind_edges(self, parts, out_port_name, in_port_name, edges,
+                   delay=0):
+        '''
+        Bind ports of parts according to a list of edges.
+
+        For each edge *(i, j)*, the port *out_port_name* of ``parts[i]`` is
+        bound to the port *in_port_name* of ``parts[j]``.
+
+        :param list parts: parts (references or hierarchy names)
+        :param str out_port_name: name of sending port in each part. \
+            If it is an IO port, its output port is used.
+        :param str in_port_name: name of receiving port in each part. \
+            If it is an IO port, its input port is used.
+        :param edges: iterable of (i, j) part index pairs, e.g. a NumPy \
+            array of shape (n, 2)
+        :param delay: (default: 0) propagation delay of all bindings, \
+            see :meth:`~.SimOutputPort.bind`
+        :raise ValueError: if a part or port was not found
+        '''
+        # pylint: disable=too-many-arguments
+        out_ports, in_ports = self._resolve_parts_ports(parts, out_port_name,
+                                                        in_port_name)
+        if hasattr(edges, 'tolist'):
+            edges = edges.tolist()
+        for src, dst in edges:
+            out_ports[src].bind(in_ports[dst], delay)
+
+    def bind_matrix(self, parts, out_port_name, in_port_name, matrix,
+                    delay=0):
+        '''
+        Bind ports of parts according to an adjacency matrix.
+
+        If ``matrix[i][j]`` is true, the port *out_port_name* of
+        ``parts[i]`` is bound to the port *in_port_name* of ``parts[j]``.
+
+        Example:
+
+        .. code-block:: python
+
+            # full mesh of 3 nodes
+            simu.bind_matrix(['N0', 'N1', 'N2'], 'net', 'net',
+                             [[0, 1, 1], [1, 0, 1], [1, 1, 0]])
+
+        :param list parts: parts (references or hierarchy names)
+        :param str out_port_name: name of sending port in each part. \
+            If it is an IO port, its output port is used.
+        :param str in_port_name: name of receiving port in each part. \
+            If it is an IO port, its input port is used.
+        :param matrix: square matrix, either nested lists or a \
+            NumPy array
+        :param delay: (default: 0) propagation delay of all bindings, \
+            see :meth:`~.SimOutputPort.bind`
+        :raise ValueError: if a part or port was not found
+        '''
+        # pylint: disable=too-many-arguments
+        if hasattr(matrix, 'nonzero'):
+            # NumPy array: let NumPy find the edges
+            edges = zip(*(idx.tolist() for idx in matrix.nonzero()))
+        else:
+            edges = ((src, dst) for src, row in enumerate(matrix)
+                     for dst, val in enumerate(row) if val)
+        self.bind_edges(parts, out_port_name, in_port_name, edges, delay)
@@ -0,0 +1,236 @@
+"""
+:mod:`sim_port_stats` -- Message statistics of output ports
+===========================================================
+
+.. module:: sim_port_stats
+   :synopsis: Online latency and throughput statistics per output port
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`PortStats` collector is attached to an output port via
+:meth:`~.SimOutputPort.enable_stats` or to many ports via
+:meth:`~.Sim.enable_port_stats`. It updates counters and histograms when
+the messages of the port are sent and delivered, so no trace is needed.
+
+Delays are collected in :class:`LogHistogram` instances, which have
+bins of constant relative width. So they need little memory regardless of
+the number of messages, and give quantiles with a bounded relative error.
+"""
+import math
+
+
+class LogHistogram:
+    """
+    Streaming histogram with logarithmic bins.
+
+    Values <= 0 are counted in a separate zero bin.
+
+    :param int bins_per_decade: number of bins per factor of 10
+    """
+
+    def __init__(self, bins_per_decade=20):
+        self._bins_per_decade = bins_per_decade
+        # bin number -> count. Bin n covers [10**(n/bpd), 10**((n+1)/bpd))
+        self._bins = {}
+        self._num_zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """ add *value* to the histogram """
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value <= 0:
+            self._num_zero += 1
+        else:
+            idx = math.floor(math.log10(value) * self._bins_per_decade)
+            self._bins[idx] = self._bins.get(idx, 0) + 1
+
+    def mean(self):
+        """ return the mean value, None if empty """
+        return self.sum / self.count if self.count else None
+
+    def _bin_range(self, idx):
+        bpd = self._bins_per_decade
+        return 10 ** (idx / bpd), 10 ** ((idx + 1) / bpd)
+
+    def bins(self):
+        """
+        return list of (lower bound, upper bound, count) of all non empty
+        bins in ascending order. The zero bin has the bounds (0, 0)
+        """
+        rv = [(0.0, 0.0, self._num_zero)] if self._num_zero else []
+        for idx in sorted(self._bins):
+            rv.append(self._bin_range(idx) + (self._bins[idx],))
+        return rv
+
+    def quantile(self, fraction):
+        """
+        return the approximate value below which *fraction* of the values
+        are, e.g. 0.99 for the 99th percentile. None if empty.
+        The relative error is below the bin width
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = self._num_zero
+        if rank <= seen:
+            return max(self.min, 0.0)
+        for idx in sorted(self._bins):
+            seen += self._bins[idx]
+            if rank <= seen:
+                low, high = self._bin_range(idx)
+                return min(max(math.sqrt(low * high), self.min), self.max)
+        return self.max
+
+
+class PortStats:
+    """
+    Message statistics of an output port.
+
+    The statistics cover the messages whose transmission ended after
+    the collector was attached.
+
+    :ivar int num_msgs: number of messages whose transmission ended, \
+        including lost messages
+    :ivar int num_lost: number of lost messages
+    :ivar int num_bytes: number of bytes of the messages, see \
+        :meth:`~.SimOutputPort.FireEvent.msg_byte_len`
+    :ivar float busy_time: time the port was transmitting messages
+    :ivar LogHistogram queueing_delay: time from :meth:`send` until the \
+        message transmission begins
+    :ivar LogHistogram flight_time: message transmission time
+    :ivar LogHistogram end_to_end: time from :meth:`send` until the message \
+        arrives at an input port, including the delay of the binding. \
+        One value per bound input port. Lost messages are not included
+
+    :param sim: Simulator instance
+    :param port: the :class:`~.SimOutputPort`
+    :param int bins_per_decade: resolution of the histograms
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, sim, port, bins_per_decade=20):
+        self.port = port
+        self._sim = sim
+        self.start_time = self._sim.time()
+        self.num_msgs = 0
+        self.num_lost = 0
+        self.num_bytes = 0
+        self.busy_time = 0.0
+        self.queueing_delay = LogHistogram(bins_per_decade)
+        self.flight_time = LogHistogram(bins_per_decade)
+        self.end_to_end = LogHistogram(bins_per_decade)
+
+    def msg_sent(self, fire_event):
+        """ called by the port when the transmission of a message ended """
+        flight_time = fire_event.flight_time
+        self.num_msgs += 1
+        if fire_event.is_lost:
+            self.num_lost += 1
+        self.num_bytes += fire_event.msg_byte_len()
+        self.busy_time += flight_time
+        self.flight_time.add(flight_time)
+        self.queueing_delay.add(
+            fire_event.exec_time - flight_time - fire_event.request_time
+        )
+
+    def msg_delivered(self, fire_event):
+        """ called by the port when a message arrives at an input port """
+        self.end_to_end.add(self._sim.time() - fire_event.request_time)
+
+    def elapsed(self):
+        """ return the simulation time since the collector was attached """
+        return self._sim.time() - self.start_time
+
+    def msgs_per_second(self):
+        """ return the number of messages per second (simulation time) """
+        elapsed = self.elapsed()
+        return self.num_msgs / elapsed if elapsed > 0 else 0.0
+
+    def bytes_per_second(self):
+        """ return the number of bytes per second (simulation time) """
+        elapsed = self.elapsed()
+        return self.num_bytes / elapsed if elapsed > 0 else 0.0
+
+    def utilization(self):
+        """
+        return the fraction of time the port was transmitting messages
+        (0..1)
+        """
+        elapsed = self.elapsed()
+        return min(self.busy_time / elapsed, 1.0) if elapsed > 0 else 0.0
+
+    def summary(self):
+        """ return the statistics as dictionary """
+        rv = {
+            "port": self.port.hierarchy_name(),
+            "msgs": self.num_msgs,
+            "lost": self.num_lost,
+            "bytes": self.num_bytes,
+            "msgs_per_s": self.msgs_per_second(),
+            "bytes_per_s": self.bytes_per_second(),
+            "utilization": self.utilization(),
+        }
+        for name in ("queueing_delay", "flight_time", "end_to_end"):
+            hist = getattr(self, name)
+            rv[name] = {
+                "mean": hist.mean(),
+                "min": hist.min,
+                "p50": hist.quantile(0.5),
+                "p99": hist.quantile(0.99),
+                "max": hist.max,
+            }
+        return rv
+
+
+def port_stats_table(stats_list, time_str):
+    """
+    return a table with the statistics of the ports as list of lines
+
+    :param stats_list: list of :class:`PortStats`
+    :param time_str: function to format the delays
+    """
+
+    def fmt(time):
+        return "-" if time is None else time_str(time)
+
+    lines = [
+        "%-24s %8s %6s %10s %12s %6s %10s %10s %10s %10s %10s"
+        % (
+            "port",
+            "msgs",
+            "lost",
+            "msgs/s",
+            "bytes/s",
+            "util%",
+            "queue avg",
+            "flight avg",
+            "e2e avg",
+            "e2e p99",
+            "e2e max",
+        )
+    ]
+    for stats in stats_list:
+        lines.append(
+            "%-24s %8d %6d %10.2f %12.2f %6.1f %10s %10s %10s %10s %10s"
+            % (
+                stats.port.hierarchy_name(),
+                stats.num_msgs,
+                stats.num_lost,
+                stats.msgs_per_second(),
+                stats.bytes_per_second(),
+                stats.utilization() * 100,
+                fmt(stats.queueing_delay.mean()),
+                fmt(stats.flight_time.mean()),
+                fmt(stats.end_to_end.mean()),
+                fmt(stats.end_to_end.quantile(0.99)),
+                fmt(stats.end_to_end.max),
+            )
+        )
+    return lines
@@ -8,13 +8,13 @@
 .. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
 
 """
+import numbers
 import pickle
 from heapq import heappush, heappop
 from collections import deque
 
 from .sim_base import SimBaseElement, SimEvent
-from .sim_base import add_elem_to_list
-from .sim_trace import SimTraceEvent
+from .sim_base import ElemList, add_elem_to_list
 
 
 class SimInputPort(SimBaseElement):
@@ -33,7 +33,7 @@ class SimInputPort(SimBaseElement):
     # pylint: disable=too-many-arguments
     def __init__(self, sim, part, name, msg_received_func, io_port=None):
         super().__init__(sim, part, name, "InPort")
-        self._out_ports = []  # connected output ports
+        self._out_ports = ElemList()  # connected output ports
         # function that gets called when message arrives
         self._msg_received_func = msg_received_func
         # function that gets called when message transmission has started on
@@ -110,12 +110,23 @@ class SimOutputPort(SimBaseElement):
             self._sim = sim
             self.port = port
             self._serialized_msg = self.__class__.msg_serialize(msg)
+            # message length, taken from the message now if the loss model
+            # or the statistics need it, so that the message needn't be
+            # deserialized later
+            self._msg_byte_len = None
+            if port._loss_model is not None or port._stats is not None:
+                self._msg_byte_len = self._byte_len_of(msg)
             self.msg_color = msg.msgColor if hasattr(msg, "msgColor") else None
             self.flight_time = flight_time  # message transmit time
             # time when application called send()
             self.request_time = sim.time()
             self.exec_time = -1  # when message arrives at input port
             self.is_lost = False  # Flags that message is a lost message
+            # position in the causal chain when the message was sent
+            causality = sim.causality
+            self.cause = (
+                None if causality is None else causality.msg_cause(port)
+            )
 
         def __str__(self):
             """Create a user readable form of the event. Used by tracer"""
@@ -131,6 +142,24 @@ class SimOutputPort(SimBaseElement):
         def __repr__(self):
             return self.port.obj_name() + "#fireEvent"
 
+        def _byte_len_of(self, msg):
+            """ return the length of *msg*, see :meth:`msg_byte_len` """
+            if hasattr(msg, "byte_len"):
+                return msg.byte_len()
+            return len(self._serialized_msg)
+
+        def msg_byte_len(self):
+            """
+            return message length in bytes. Uses the message's
+            byte_len() method if available, otherwise the length of the
+            serialized message
+            """
+            if self._msg_byte_len is None:
+                self._msg_byte_len = self._byte_len_of(
+                    self.__class__.msg_unserialize(self._serialized_msg)
+                )
+            return self._msg_byte_len
+
         def msg_text(self):
             """ return message's __str__ """
             return self.__class__.msg_unserialize(
@@ -138,21 +167,25 @@ class SimOutputPort(SimBaseElement):
             ).__str__()
 
         def execute(self):
+            bind_delays = self.port.bind_delays()
 
             # pass the message to all bound input ports
             for inport in self.port.in_ports():
-
-                self._sim.tracing.add_trace_event(
-                    SimTraceEvent(self.port.parent_obj, inport, self, "<MSG")
-                )
-
-                if not self.is_lost:
-                    # make a deep copy (by using pickle) of the message,
-                    # so that application can modify the message
-                    msg_copy = self.__class__.msg_unserialize(
-                        self._serialized_msg
+                if bind_delays and inport in bind_delays:
+                    # deliver after the binding's propagation delay
+                    self._sim.schedule_event(
+                        SimOutputPort.BindDelayEvent(
+                            self.exec_time + bind_delays[inport],
+                            self.deliver,
+                            inport,
+                        )
                     )
-                    inport.msg_event(msg_copy)
+                else:
+                    self.deliver(inport)
+
+            stats = self.port._stats
+            if stats is not None:
+                stats.msg_sent(self)
 
             # remove me from pending queue
             # print(self, "exec", len(self.port._list_pending_msg))
@@ -161,24 +194,59 @@ class SimOutputPort(SimBaseElement):
             if self.port.pending_msg():
                 event = self.port.pending_msg()[0]
                 self.port.send_schedule(event)
-                self._sim.tracing.add_trace_event(
-                    SimTraceEvent(
+                tracing = self._sim.tracing
+                if tracing.active:
+                    tracing.trace(
                         self.port.parent_obj, self.port, event, ">MSG(Q)"
                     )
-                )
             self.port._seq_no += 1
 
+        def deliver(self, inport):
+            """ pass the message to a single bound input port """
+            tracing = self._sim.tracing
+            if tracing.active:
+                tracing.trace(self.port.parent_obj, inport, self, "<MSG")
+
+            if not self.is_lost:
+                stats = self.port._stats
+                if stats is not None:
+                    stats.msg_delivered(self)
+                causality = self._sim.causality
+                if causality is not None:
+                    causality.msg_delivered(self, inport)
+                # make a deep copy (by using pickle) of the message,
+                # so that application can modify the message
+                msg_copy = self.__class__.msg_unserialize(self._serialized_msg)
+                inport.msg_event(msg_copy)
+
         def notify_start(self):
             """
             tell all bound input ports that message transmission has begun
             """
+            bind_delays = self.port.bind_delays()
+
             for inport in self.port.in_ports():
                 if inport.uses_msg_start_event():
-                    inport.msg_start_event(
-                        self.__class__.msg_unserialize(self._serialized_msg),
-                        self,
-                        self.flight_time,
-                    )
+                    if bind_delays and inport in bind_delays:
+                        self._sim.schedule_event(
+                            SimOutputPort.BindDelayEvent(
+                                self._sim.time() + bind_delays[inport],
+                                self.notify_start_to,
+                                inport,
+                            )
+                        )
+                    else:
+                        self.notify_start_to(inport)
+
+        def notify_start_to(self, inport):
+            """
+            tell a single bound input port that message transmission has begun
+            """
+            inport.msg_start_event(
+                self.__class__.msg_unserialize(self._serialized_msg),
+                self,
+                self.flight_time,
+            )
 
         @staticmethod
         def msg_serialize(msg):
@@ -190,11 +258,30 @@ class SimOutputPort(SimBaseElement):
             """Un-Serialize message using pickle"""
             return pickle.loads(stream)
 
+    class BindDelayEvent(SimEvent):
+        """
+        Event that is passed to scheduler to deliver a message
+        (or its start notification) to an input port whose binding
+        has a propagation delay
+        """
+
+        def __init__(self, exec_time, func, inport):
+            super().__init__()
+            self.exec_time = exec_time
+            self._func = func
+            self._inport = inport
+
+        def __repr__(self):
+            return self._inport.hierarchy_name() + "#bindDelayEvent"
+
+        def execute(self):
+            self._func(self._inport)
+
     def __init__(self, sim, part, name, color=None, io_port=None):
         # pylint: disable=too-many-arguments
         super().__init__(sim, part, name, "OutPort")
         # list of all input ports
-        self._list_in_ports = []
+        self._list_in_ports = ElemList()
         # list of pending messages (not yet fired)
         self._list_pending_msg = deque()
         # color for messages leaving that port
@@ -208,20 +295,52 @@ class SimOutputPort(SimBaseElement):
         self._seq_no = 0
         # heap with message sequence numbers that will be lost
         self._lost_seq_heap = []
-
-    def bind(self, input_port):
+        # loss model that decides which messages are lost (None if no model)
+        self._loss_model = None
+        # propagation delays of bindings, key=input port (only if delay > 0)
+        self._bind_delays = {}
+        # message statistics collector (None if disabled)
+        self._stats = None
+
+    def bind(self, input_port, delay=0):
         """bind an output port to an input port
 
         :param input_port: input port to which this output port shall be bound
+        :param delay: (default: 0) additional latency of this binding, \
+            e.g. propagation or cut-through delay. Messages (and their \
+            start notifications) arrive at *input_port* *delay* seconds \
+            later than without delay. The output port is not blocked \
+            during that time.
         :raise RuntimeError: if input port is already bound to that output port
+        :raise ValueError: if delay is negative
 
         """
+        if delay < 0:
+            raise ValueError(
+                "%s: bind delay must not be negative" % self.hierarchy_name()
+            )
         add_elem_to_list(
             input_port.out_ports(), self, input_port.__str__() + ":outPorts"
         )
         add_elem_to_list(
             self.in_ports(), input_port, self.__str__() + ":inPorts"
         )
+        if delay > 0:
+            self._bind_delays[input_port] = delay
+
+    def bind_delay(self, input_port):
+        """
+        Return the propagation delay of the binding to *input_port*
+        (0 if binding has no delay)
+        """
+        return self._bind_delays.get(input_port, 0)
+
+    def bind_delays(self):
+        """
+        Return dictionary with bindings that have a propagation delay.
+        key=input port, value=delay
+        """
+        return self._bind_delays
 
     def is_bound(self):
         """Report True if port is bound to at least one input port"""
@@ -252,7 +371,7 @@ class SimOutputPort(SimBaseElement):
         event.exec_time = self._sim.time() + event.flight_time
         self._sim.schedule_event(event)
         # check if the message is marked as lost
-        event.is_lost = self.is_lost_message()
+        event.is_lost = self.is_lost_message(event)
         if not event.is_lost:
             event.notify_start()
 
@@ -268,13 +387,59 @@ class SimOutputPort(SimBaseElement):
         if not self._list_pending_msg:
             # no pending messages, send now
             self.send_schedule(event)
-            self._sim.tracing.add_trace_event(
-                SimTraceEvent(self.parent_obj, self, event, ">MSG")
-            )
+            tracing = self._sim.tracing
+            if tracing.active:
+                tracing.trace(self.parent_obj, self, event, ">MSG")
 
         self._list_pending_msg.append(event)
         # print(self, "sendlp", len(self._list_pending_msg))
 
+    def send_many(self, msgs, flight_times):
+        """Send a burst of messages in one operation.
+
+        Behaves like calling :meth:`send` for each message, i.e. the
+        messages are queued and sent one after each other, but enqueues
+        the whole burst at once.
+
+        :param msgs: iterable with messages to send
+        :param flight_times: flight time of each message. Either a list \
+            with one flight time per message or a single flight time \
+            for all messages
+        :raise ValueError: if number of flight times does not match \
+            number of messages
+
+        """
+        msgs = list(msgs)
+        if isinstance(flight_times, numbers.Real):
+            flight_times = [flight_times] * len(msgs)
+        else:
+            flight_times = list(flight_times)
+            if len(flight_times) != len(msgs):
+                raise ValueError(
+                    "%s: send_many got %d messages but %d flight times"
+                    % (self.hierarchy_name(), len(msgs), len(flight_times))
+                )
+        if not msgs:
+            return
+
+        fire_event = self.FireEvent
+        sim = self._sim
+        events = [
+            fire_event(sim, self, msg, flight_time)
+            for msg, flight_time in zip(msgs, flight_times)
+        ]
+        for msg in msgs:
+            self._learn_msg_types(msg)
+
+        if not self._list_pending_msg:
+            # no pending messages, send head now. The other messages
+            # are traced as >MSG(Q) when they are sent
+            self.send_schedule(events[0])
+            if sim.tracing.active:
+                sim.tracing.trace(self.parent_obj, self, events[0], ">MSG")
+
+        self._list_pending_msg.extend(events)
+
     def set_color(self, color):
         """ Set color for messages leaving that port """
         self.color = color
@@ -295,20 +460,69 @@ class SimOutputPort(SimBaseElement):
             heappush(self._lost_seq_heap, lost_seq)
         # print("lostSeqHeap=", self._lostSeqHeap)
 
-    def is_lost_message(self):
+    def set_loss_model(self, loss_model):
+        """
+        Inject errors according to a loss model. The model decides for
+        each message sent via this port whether it is lost.
+        Errors injected via :meth:`inject_lost_message_error_by_sequence`
+        are still applied.
+
+        :param loss_model: a :class:`~.sim_loss_models.LossModel`, \
+            e.g. :class:`~.sim_loss_models.BernoulliLossModel`. \
+            None to remove the model
+        """
+        self._loss_model = loss_model
+
+    def enable_stats(self, enable=True, bins_per_decade=20):
+        """
+        Collect statistics of the messages sent via this port:
+        queueing delay, flight time, end-to-end delay, message and byte
+        rates and utilization.
+        See :class:`~.sim_port_stats.PortStats`
+
+        :param bool enable: False to stop collecting statistics
+        :param int bins_per_decade: resolution of the delay histograms
+        :return: the :class:`~.sim_port_stats.PortStats`, None if disabled
+        """
+        if enable:
+            from .sim_port_stats import PortStats
+
+            self._stats = PortStats(self._sim, self, bins_per_decade)
+        else:
+            self._stats = None
+        return self._stats
+
+    def stats(self):
+        """
+        Return the :class:`~.sim_port_stats.PortStats` of the port,
+        None if statistics are not enabled
+        """
+        return self._stats
+
+    def is_lost_message(self, event=None):
         """
         Test if the current message is marked to be lost.
         Return True if so and remove the current sequence from the lost
         sequence heap
+
+        :param event: the FireEvent of the current message. Passed to the \
+            loss model, if any. The loss model is not asked without *event*
         """
+        is_lost = False
         if (
             len(self._lost_seq_heap) > 0
             and self._seq_no == self._lost_seq_heap[0]
         ):
 
             heappop(self._lost_seq_heap)
-            return True
-        return False
+            is_lost = True
+        if (
+            event is not None
+            and self._loss_model is not None
+            and self._loss_model.is_lost(event)
+        ):
+            is_lost = True
+        return is_lost
 
     def io_port(self):
         """
@@ -358,14 +572,24 @@ class SimIOPort(SimBaseElement):
         """ Return the output port """
         return self._out_port
 
-    def bind(self, other_io_port):
-        """ Bind IOPort to another IOPort, in/out will be crossed """
-        self._out_port.bind(other_io_port.in_port())
-        other_io_port.out_port().bind(self.in_port())
+    def bind(self, other_io_port, delay=0):
+        """
+        Bind IOPort to another IOPort, in/out will be crossed
 
-    def loop_bind(self):
-        """ Loop in/out ports of an IO port together """
-        self._out_port.bind(self._in_port)
+        :param delay: (default: 0) propagation delay of both directions. \
+            Refer to :func:`simOutputPort.bind`
+        """
+        self._out_port.bind(other_io_port.in_port(), delay)
+        other_io_port.out_port().bind(self.in_port(), delay)
+
+    def loop_bind(self, delay=0):
+        """
+        Loop in/out ports of an IO port together
+
+        :param delay: (default: 0) propagation delay of the loop. \
+            Refer to :func:`simOutputPort.bind`
+        """
+        self._out_port.bind(self._in_port, delay)
 
     # delegation methods to output port
 
@@ -376,6 +600,13 @@ class SimIOPort(SimBaseElement):
         """
         self._out_port.send(msg, flight_time)
 
+    def send_many(self, msgs, flight_times):
+        """send a burst of messages to IoPorts output port
+
+        Refer to :func:`simOutputPort.send_many` for parameters.
+        """
+        self._out_port.send_many(msgs, flight_times)
+
     def inject_lost_message_error_by_sequence(self, next_seq):
         """
         inject error on IoPorts output port
@@ -384,6 +615,27 @@ class SimIOPort(SimBaseElement):
         """
         self._out_port.inject_lost_message_error_by_sequence(next_seq)
 
+    def set_loss_model(self, loss_model):
+        """
+        set loss model of IoPorts output port
+        Refer to :func:`simOutputPort.set_loss_model` for details.
+        """
+        self._out_port.set_loss_model(loss_model)
+
+    def enable_stats(self, enable=True, bins_per_decade=20):
+        """
+        collect statistics of the messages of IoPorts output port
+        Refer to :func:`simOutputPort.enable_stats` for details.
+        """
+        return self._out_port.enable_stats(enable, bins_per_decade)
+
+    def stats(self):
+        """
+        return statistics of IoPorts output port
+        Refer to :func:`simOutputPort.stats` for details.
+        """
+        return self._out_port.stats()
+
     def set_color(self, color):
         """ Set color for messages leaving that IOport """
         self._out_port.color = color
@@ -434,17 +686,22 @@ class SimTimer(SimBaseElement):
             self._sim = sim
             self._timer = timer
             self.exec_time = exec_time
+            # position in the causal chain when the timer was started
+            causality = sim.causality
+            self.cause = None if causality is None else causality.timer_cause()
 
         def __repr__(self):
             return self._timer.hierarchy_name() + "#timerEvent"
 
         def execute(self):
             self._timer._pending_event = None
-            self._sim.tracing.add_trace_event(
-                SimTraceEvent(
+            tracing = self._sim.tracing
+            if tracing.active:
+                tracing.trace(
                     self._timer.parent_obj, self._timer, None, "T-EXP"
                 )
-            )
+            if self.cause is not None:
+                self._sim.causality.current = self.cause
             self._timer.elapsed_func(self._timer)
 
     class TimeoutFmt:
@@ -484,14 +741,14 @@ class SimTimer(SimBaseElement):
         :raise: AttributeError if timeout <= 0
         """
         self._start(timeout)
-        self._sim.tracing.add_trace_event(
-            SimTraceEvent(
+        tracing = self._sim.tracing
+        if tracing.active:
+            tracing.trace(
                 self.parent_obj,
                 self,
                 self.TimeoutFmt(self._sim, timeout),
                 "T-START",
             )
-        )
 
     def _stop(self):
         if self._pending_event is not None:
@@ -500,9 +757,9 @@ class SimTimer(SimBaseElement):
 
     def stop(self):
         """Stop timer. Does nothing if timer not running"""
-        self._sim.tracing.add_trace_event(
-            SimTraceEvent(self.parent_obj, self, None, "T-STOP")
-        )
+        tracing = self._sim.tracing
+        if tracing.active:
+            tracing.trace(self.parent_obj, self, None, "T-STOP")
         self._stop()
 
     def restart(self, timeout):
@@ -511,13 +768,13 @@ class SimTimer(SimBaseElement):
 
         :param timeout: Timer will fire after *timeout*
         """
-        self._sim.tracing.add_trace_event(
-            SimTraceEvent(
+        tracing = self._sim.tracing
+        if tracing.active:
+            tracing.trace(
                 self.parent_obj,
                 self,
                 self.TimeoutFmt(self._sim, timeout),
                 "T-RESTA",
             )
-        )
         self._stop()
         self._start(timeout)
@@ -9,11 +9,10 @@
 '''
 import os
 import sys
-import inspect
 
 from collections import deque
 
-from .sim_base import time_unit_to_factor
+from .sim_base import time_unit_to_factor, name_matcher, ModelGenerations
 
 
 class SimTraceEvent:
@@ -42,33 +41,403 @@ class SimTraceEvent:
 class SimTracing:
     '''
     Simulator Tracing and logging
+
+    Trace events are recorded in the trace buffer, printed, and passed
+    to the subscribed consumers (see :meth:`subscribe`).
+    If none of them is enabled, :attr:`active` is False and the
+    simulator does not create trace events at all. Code that generates
+    trace events should check :attr:`active` before preparing the
+    event's transport value.
     '''
 
-    def __init__(self, time_func):
+    def __init__(self, time_func, generations=None):
         # list of all traced events during execution
         self._list_traced_events = deque()
         self._dis_time_scale = 1  # time scale factor
         self._dis_time_scale_str = "s"  # time scale string
         self._enable_trace_prints = False
+        # buffered printer, None to print each event immediately
+        self._printer = None
+        self._enable_trace_recording = True
+        self._subscribers = []
+        # trace fingerprint, see enable_fingerprint()
+        self._fingerprint = None
+        # True if trace events are recorded, printed or consumed
+        self.active = True
         self._time_func = time_func
         self._num_assertion_failures = 0
+        self._assertion_failure_events = []
+        # trace filter rules, see include_trace_events()
+        self._include_rules = []
+        self._exclude_rules = []
+        self._filtering = False
+        # model generations of the simulator, see ModelGenerations
+        self._generations = (
+            ModelGenerations() if generations is None else generations
+        )
+        # cached filter decisions (part, sub_obj, action) -> bool.
+        # valid for _filter_hierarchy_gen
+        self._filter_decisions = {}
+        self._filter_hierarchy_gen = None
 
     def enable_trace_prints(self, enable_prints):
         ''' enable/disable trace prints '''
         self._enable_trace_prints = enable_prints
+        self._update_active()
+
+    def set_trace_printer(self, buffered=True, **kwargs):
+        '''
+        Configure how trace events are printed if trace printing is enabled.
+
+        By default, each event is printed immediately.
+        A buffered printer (see :class:`~.trace_printer.TracePrinter`)
+        collects the printed lines and writes them in chunks. It can print
+        only every nth event, and limit the number of events printed per
+        second. Lines printed by the model may appear before trace lines
+        of earlier events.
+
+        Example:
+
+        .. code-block:: python
+
+            # print every 10th event, at most 100 events per second
+            simu.tracing.set_trace_printer(every_nth=10, max_rate=100)
+
+        :param bool buffered: use the buffered printer. False to print each \
+            event immediately
+        :param kwargs: arguments for :class:`~.trace_printer.TracePrinter`: \
+            *every_nth*, *max_rate*, *buffer_lines*, *flush_interval*, \
+            *file*, *clock*
+        '''
+        if self._printer is not None:
+            self._printer.finish()
+        self._printer = None
+        if buffered:
+            from .trace_printer import TracePrinter
+            self._printer = TracePrinter(self.time_str, **kwargs)
+
+    def flush_trace_prints(self):
+        ''' write the lines collected by the buffered printer '''
+        if self._printer is not None:
+            self._printer.flush()
+
+    def enable_trace_recording(self, enable_recording):
+        '''
+        enable/disable recording of trace events in the trace buffer
+        (default: enabled).
+        Disable recording for simulation runs that don't need the trace,
+        e.g. to collect only statistics.
+        The outputs that are generated from the trace (sequence diagrams,
+        trace tables) contain only the recorded events.
+        '''
+        self._enable_trace_recording = enable_recording
+        self._update_active()
+
+    def subscribe(self, consumer):
+        '''
+        Subscribe a consumer of trace events.
+        The consumer is called with each :class:`SimTraceEvent` that passes
+        the trace filters, also when recording is disabled.
+
+        :param consumer: function with signature ``consumer(trace_ev)``
+        '''
+        self._subscribers.append(consumer)
+        self._update_active()
+
+    def unsubscribe(self, consumer):
+        '''
+        Remove a consumer subscribed via :meth:`subscribe`
+
+        :raise ValueError: if consumer not subscribed
+        '''
+        self._subscribers.remove(consumer)
+        self._update_active()
+
+    def enable_fingerprint(self, checkpoint_interval=10000,
+                           algorithm='sha256', time_resolution=1e-9):
+        '''
+        Compute a rolling hash of the trace events while the simulation
+        runs (see :class:`~.trace_fingerprint.TraceFingerprint`).
+        Compare the fingerprints of two runs to check that the runs
+        had the same trace.
+
+        Example:
+
+        .. code-block:: python
+
+            simu.tracing.enable_fingerprint(checkpoint_interval=1000)
+            simu.run(10)
+            simu.tracing.fingerprint().save("output/fp_new.json")
+
+            ref = TraceFingerprint.load("output/fp_ref.json")
+            print(simu.tracing.fingerprint().compare(ref))
+
+        The fingerprint covers the events that pass the trace filters,
+        also when recording is disabled.
+
+        :param int checkpoint_interval: number of events between \
+            checkpoint hashes
+        :param str algorithm: name of the :mod:`hashlib` algorithm
+        :param float time_resolution: the event times are rounded to \
+            multiples of this (in seconds) before hashing
+        :return: the :class:`~.trace_fingerprint.TraceFingerprint`
+        '''
+        from .trace_fingerprint import TraceFingerprint
+        if self._fingerprint is not None:
+            self.unsubscribe(self._fingerprint)
+        self._fingerprint = TraceFingerprint(
+            checkpoint_interval, algorithm, time_resolution)
+        self.subscribe(self._fingerprint)
+        return self._fingerprint
+
+    def fingerprint(self):
+        '''
+        :return: the :class:`~.trace_fingerprint.TraceFingerprint` \
+            enabled by :meth:`enable_fingerprint`, or None
+        '''
+        return self._fingerprint
+
+    def finish(self):
+        '''
+        Called by the simulator when the simulation stops.
+        Writes the lines of the buffered printer.
+        Calls the method ``finish()`` of all subscribed consumers that have
+        one, e.g. to close the files of the trace sinks
+        (see :mod:`~.trace_sinks`)
+        '''
+        if self._printer is not None:
+            self._printer.finish()
+        for consumer in list(self._subscribers):
+            finish = getattr(consumer, 'finish', None)
+            if finish is not None:
+                finish()
+
+    def _update_active(self):
+        self.active = bool(self._enable_trace_recording
+                           or self._enable_trace_prints
+                           or self._subscribers)
 
     def add_trace_event(self, trace_ev):
-        ''' Add new event to Trace list, timestamp it, print it'''
+        '''
+        Add new event to Trace list, timestamp it, print it.
+        Does nothing if the event is filtered out by the trace filters
+        or tracing is not active
+        '''
+        if not self.active:
+            return
+        if self._filtering and not self.is_traced(
+                trace_ev.part, trace_ev.sub_obj, trace_ev.action):
+            return
+        self._record(trace_ev)
+
+    def trace(self, part, sub_obj, trans_val, action):
+        '''
+        Add a new trace event, see :class:`SimTraceEvent`.
+        If the event is filtered out or tracing is not active, the trace
+        event is not even created.
+        '''
+        if not self.active:
+            return
+        if self._filtering:
+            traced = self._decision_cache().get((part, sub_obj, action))
+            if traced is None:
+                traced = self.is_traced(part, sub_obj, action)
+            if not traced:
+                return
+        self._record(SimTraceEvent(part, sub_obj, trans_val, action))
+
+    def _record(self, trace_ev):
+        ''' Add event to Trace list, timestamp it, print it'''
         trace_ev.trace_time = self._time_func()
-        self._list_traced_events.append(trace_ev)
+        if self._enable_trace_recording:
+            self._list_traced_events.append(trace_ev)
 
         if self._enable_trace_prints:
-            trace_str = "TRC: %10s %s" % (self.time_str(trace_ev.trace_time),
-                                          trace_ev)
-            print(trace_str)
+            if self._printer is None:
+                trace_str = "TRC: %10s %s" % (
+                    self.time_str(trace_ev.trace_time), trace_ev)
+                print(trace_str)
+            else:
+                self._printer.print_event(trace_ev)
+
+        for consumer in self._subscribers:
+            consumer(trace_ev)
+
+    #
+    # Trace filters
+    #
+    @staticmethod
+    def _make_filter_rule(part, action, elem_class):
+        if part is not None:
+            part = name_matcher(part)
+        if isinstance(action, str):
+            action = (action,)
+        if action is not None:
+            action = frozenset(action)
+        if isinstance(elem_class, list):
+            elem_class = tuple(elem_class)
+        return (part, action, elem_class)
+
+    def include_trace_events(self, part=None, action=None, elem_class=None):
+        '''
+        Add a rule that selects the trace events to record.
+
+        If include rules exist, only events that match at least one include
+        rule are recorded. Events that match an exclude rule
+        (see :meth:`exclude_trace_events`) are never recorded.
+        Assertion failures are always recorded.
+
+        A rule matches an event if all of its given criteria match.
+        Rules can be changed before or during the simulation.
+
+        Example:
+
+        .. code-block:: python
+
+            # record only timer events and messages received by Cpu parts
+            simu.tracing.include_trace_events(action=['T-EXP', 'T-START'])
+            simu.tracing.include_trace_events(part='Cpu*', action='<MSG')
+
+        :param part: glob pattern (see :mod:`fnmatch`) or compiled regular \
+            expression that must match the whole hierarchy name of the \
+            part the event is shown for. That is the part owning the port, \
+            timer or watched variable, e.g. the receiving part for ``<MSG``
+        :param action: action string or list of action strings, \
+            e.g. ``'<MSG'``, ``'T-EXP'``, ``'VC'``
+        :param elem_class: class or tuple of classes of the element \
+            (port, timer, watched variable or part), e.g. \
+            :class:`~.sim_ports.SimTimer`
+        '''
+        self._include_rules.append(
+            self._make_filter_rule(part, action, elem_class))
+        self._filters_changed()
+
+    def exclude_trace_events(self, part=None, action=None, elem_class=None):
+        '''
+        Add a rule that selects trace events that shall not be recorded.
+        Parameters as in :meth:`include_trace_events`.
+
+        Example:
+
+        .. code-block:: python
+
+            # don't record variable changes and anything of the Net part
+            simu.tracing.exclude_trace_events(action='VC')
+            simu.tracing.exclude_trace_events(part='Net*')
+        '''
+        self._exclude_rules.append(
+            self._make_filter_rule(part, action, elem_class))
+        self._filters_changed()
+
+    def clear_trace_filters(self):
+        ''' Remove all trace filter rules. Record all events again '''
+        self._include_rules = []
+        self._exclude_rules = []
+        self._filters_changed()
+
+    def _filters_changed(self):
+        self._filtering = bool(self._include_rules or self._exclude_rules)
+        self._filter_decisions = {}
+
+    @staticmethod
+    def _rule_matches(rule, owner, sub_obj, action):
+        part, actions, elem_class = rule
+        return (
+            (part is None or (owner is not None and
+                              part(owner.hierarchy_name()) is not None))
+            and (actions is None or action in actions)
+            and (elem_class is None or isinstance(sub_obj, elem_class))
+        )
+
+    def _decision_cache(self):
+        '''
+        return the cached filter decisions (part, sub_obj, action) -> bool.
+        The cache is cleared when hierarchy names have changed
+        '''
+        if self._filter_hierarchy_gen != self._generations.hierarchy:
+            self._filter_decisions.clear()
+            self._filter_hierarchy_gen = self._generations.hierarchy
+        return self._filter_decisions
+
+    def is_traced(self, part, sub_obj, action):
+        '''
+        Check if a trace event passes the trace filters
+
+        :param part: the part that generated the event
+        :param sub_obj: the element of the event (port, timer, part...)
+        :param action: action string of the event
+        :return: True if the event shall be recorded
+        '''
+        if action == 'ASSFAIL':
+            return True
+        decisions = self._decision_cache()
+        key = (part, sub_obj, action)
+        traced = decisions.get(key)
+        if traced is None:
+            owner = part
+            if sub_obj is not None and sub_obj is not part:
+                owner = sub_obj.parent_obj
+            traced = (
+                (not self._include_rules or any(
+                    self._rule_matches(rule, owner, sub_obj, action)
+                    for rule in self._include_rules))
+                and not any(
+                    self._rule_matches(rule, owner, sub_obj, action)
+                    for rule in self._exclude_rules)
+            )
+            decisions[key] = traced
+        return traced
+
+    def set_trace_buffer(self, max_events=None, spill_dir=None,
+                         segment_size=None, columnar=False):
+        '''
+        Configure the buffer of recorded trace events.
+        Existing events are removed from the buffer.
+
+        By default, all events are kept in memory. With *max_events*, at most
+        *max_events* events are kept in memory. Older events are dropped, or
+        written to compressed files in *spill_dir*.
+        :meth:`traced_events` returns all in-memory and spilled events.
+
+        With *columnar*, all events are kept in a compact
+        :class:`~.sim_trace_store.ColumnarTraceStore`.
+
+        :param int max_events: maximum number of events in memory. \
+            None for no limit
+        :param str spill_dir: directory to write old events to. \
+            None to drop old events
+        :param int segment_size: number of events written to one file. \
+            Default: a quarter of *max_events*
+        :param bool columnar: use a columnar store. Can't be combined with \
+            *max_events*, *spill_dir* or *segment_size*
+        :raise ValueError: if spill_dir is given without max_events, \
+            or columnar with max_events, spill_dir or segment_size
+        '''
+        if columnar:
+            if max_events is not None:
+                raise ValueError("columnar store has no max_events")
+            if spill_dir is not None or segment_size is not None:
+                raise ValueError("columnar store can't spill events")
+        self._list_traced_events.clear()
+        if columnar:
+            from .sim_trace_store import ColumnarTraceStore
+            self._list_traced_events = ColumnarTraceStore()
+        elif max_events is None:
+            if spill_dir is not None:
+                raise ValueError("spill_dir requires max_events")
+            self._list_traced_events = deque()
+        else:
+            from .sim_trace_store import TraceRingBuffer
+            self._list_traced_events = TraceRingBuffer(
+                max_events, spill_dir, segment_size)
 
     def traced_events(self):
-        ''' return list of traced events'''
+        '''
+        return list of traced events.
+        A :class:`~.sim_trace_store.TraceRingBuffer` or
+        :class:`~.sim_trace_store.ColumnarTraceStore` if configured by
+        :meth:`set_trace_buffer`
+        '''
         return self._list_traced_events
 
     def annotation(self, part, text):
@@ -76,8 +445,8 @@ class SimTracing:
         User routine to add an annotation to a life line at the
         current simulation time
         '''
-        trace_ev = SimTraceEvent(part, part, text, 'ANN')
-        self.add_trace_event(trace_ev)
+        if self.active:
+            self.trace(part, part, text, 'ANN')
 
     class StateIndTransVal:
         '''
@@ -105,9 +474,9 @@ class SimTracing:
         :param str text: text to display (Empty string to clear indicator)
         :param dict appearance: (default: {}) colors for indicator
         '''
-        trace_ev = SimTraceEvent(
-            part, part, self.StateIndTransVal(text, appearance), 'STA')
-        self.add_trace_event(trace_ev)
+        if self.active:
+            self.trace(part, part, self.StateIndTransVal(text, appearance),
+                       'STA')
 
     def set_display_time_unit(self, unit):
         '''
@@ -140,6 +509,8 @@ class SimTracing:
         :param int frame_idx: traceback frame index \
             (1 if caller's frame, 2 if caller-caller's frame...)
         '''
+        import inspect  # only needed for assertion failures
+
         _, file_name, line_number, function_name, _, _ = \
             inspect.stack()[frame_idx]
 
@@ -147,7 +518,11 @@ class SimTracing:
                                           os.path.basename(file_name),
                                           line_number)
         trace_ev = SimTraceEvent(part, part, te_str, 'ASSFAIL')
-        self.add_trace_event(trace_ev)
+        trace_ev.trace_time = self._time_func()
+        # keep assertion failures also if tracing is not active
+        self._assertion_failure_events.append(trace_ev)
+        if self.active:
+            self._record(trace_ev)
         self._num_assertion_failures += 1
 
     def assertion_failures(self):
@@ -159,10 +534,9 @@ class SimTracing:
         if self._num_assertion_failures > 0:
             print("%d Assertion failures during simulation" %
                   self._num_assertion_failures, file=sys.stderr)
-            for trace_ev in self.traced_events():
-                if trace_ev.action == "ASSFAIL":
-                    print("%10s: %s: %s" % (self.time_str(
-                        trace_ev.trace_time),
-                        trace_ev.part,
-                        trace_ev.trans_val.__str__()),
-                        file=sys.stderr)
+            for trace_ev in self._assertion_failure_events:
+                print("%10s: %s: %s" % (self.time_str(
+                    trace_ev.trace_time),
+                    trace_ev.part,
+                    trace_ev.trans_val.__str__()),
+                    file=sys.stderr)
@@ -0,0 +1,485 @@
+'''
+:mod:`sim_trace_store` -- Trace stores
+======================================
+
+.. module:: sim_trace_store
+   :synopsis: Ring buffer with spill-to-disk and columnar store for \
+       trace events
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`TraceRingBuffer` keeps the most recent trace events in memory.
+Older events are either dropped, or written in segments to compressed files
+on disk. Iterating over the buffer or indexing it covers the spilled and the
+in-memory events, so :class:`~.lib.trace_search.TraceSearch` and the
+trace exporters work unchanged.
+
+A :class:`ColumnarTraceStore` keeps all events in typed arrays, one array per
+attribute, which needs much less memory than the trace event objects.
+
+Both stores reference parts, ports and timers by an integer id, which is
+mapped back to the live model elements when the events are read. Messages
+are replaced by :class:`RecordedFireEvent` objects that keep the message
+text instead of the message.
+'''
+import gzip
+import os
+import pickle
+import tempfile
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+from .sim_ports import SimOutputPort, SimTimer
+from .sim_trace import SimTraceEvent, SimTracing
+
+
+class RecordedFireEvent:
+    '''
+    Stand-in for a :class:`~.SimOutputPort.FireEvent` read from a spilled
+    trace segment. Provides the attributes and methods that trace consumers
+    use.
+    '''
+
+    # pylint: disable=too-few-public-methods, too-many-instance-attributes
+    def __init__(self, port, text, msg_color, flight_time, request_time,
+                 exec_time, is_lost):
+        # pylint: disable=too-many-arguments
+        self.port = port
+        self._text = text
+        self.msg_color = msg_color
+        self.flight_time = flight_time
+        self.request_time = request_time
+        self.exec_time = exec_time
+        self.is_lost = is_lost
+
+    def msg_text(self):
+        ''' return message's __str__ '''
+        return self._text
+
+    def __str__(self):
+        time_str = self.port._sim.time_str
+        return "%s req=%s beg=%s end=%s dur=%s msg=[%s]" % (
+            "(LOST)" if self.is_lost else "",
+            time_str(self.request_time),
+            time_str(self.exec_time - self.flight_time),
+            time_str(self.exec_time),
+            time_str(self.flight_time),
+            self._text)
+
+    def __repr__(self):
+        return self.port.obj_name() + "#fireEvent"
+
+
+class ElementTable:
+    '''
+    Bidirectional mapping between model elements (parts, ports, timers,
+    watched variables) and small integers. None is mapped to -1.
+    '''
+
+    def __init__(self):
+        self._elements = []
+        self._ids = {}
+        # the simulator of the elements
+        self.sim = None
+
+    def elem_id(self, elem):
+        ''' return id of *elem*, assign a new id if necessary '''
+        if elem is None:
+            return -1
+        try:
+            return self._ids[elem]
+        except KeyError:
+            elem_id = len(self._elements)
+            self._elements.append(elem)
+            self._ids[elem] = elem_id
+            if self.sim is None:
+                self.sim = getattr(elem, '_sim', None)
+            return elem_id
+
+    def find_id(self, elem):
+        ''' return id of *elem*, None if elem has no id '''
+        if elem is None:
+            return -1
+        return self._ids.get(elem)
+
+    def element(self, elem_id):
+        ''' return element with *elem_id* '''
+        if elem_id < 0:
+            return None
+        return self._elements[elem_id]
+
+    def __len__(self):
+        return len(self._elements)
+
+
+class TraceEventCodec:
+    '''
+    Convert trace events into picklable tuples and back.
+
+    :param ElementTable elements: table to map model elements to ids
+    '''
+
+    # transport value kinds
+    _MSG = 0
+    _TIMEOUT = 1
+    _VALUE = 2
+    _STATE = 3
+
+    def __init__(self, elements):
+        self._elements = elements
+
+    def encode(self, trace_ev):
+        '''
+        return tuple (time, part id, sub_obj id, action, transport value)
+        '''
+        elem_id = self._elements.elem_id
+        return (trace_ev.trace_time, elem_id(trace_ev.part),
+                elem_id(trace_ev.sub_obj), trace_ev.action,
+                self.encode_trans_val(trace_ev.trans_val))
+
+    def encode_trans_val(self, trans_val):
+        '''
+        return transport value as picklable tuple, or None for None.
+        The tuple is hashable, unless it contains unhashable message colors
+        '''
+        if trans_val is None:
+            return None
+        if isinstance(trans_val, (SimOutputPort.FireEvent,
+                                  RecordedFireEvent)):
+            return (self._MSG, self._elements.elem_id(trans_val.port),
+                    trans_val.msg_text(), trans_val.msg_color,
+                    trans_val.flight_time, trans_val.request_time,
+                    trans_val.exec_time, trans_val.is_lost)
+        if isinstance(trans_val, SimTimer.TimeoutFmt):
+            return (self._TIMEOUT, trans_val.timeout)
+        if isinstance(trans_val, SimTracing.StateIndTransVal):
+            return (self._STATE, trans_val.text,
+                    tuple(sorted((trans_val.appearance or {}).items())))
+        if isinstance(trans_val, str):
+            return (self._VALUE, trans_val)
+        return (self._VALUE, str(trans_val))
+
+    def decode_trans_val(self, trans_val):
+        '''
+        return transport value from tuple returned by
+        :meth:`encode_trans_val`
+        '''
+        if trans_val is None:
+            return None
+        kind = trans_val[0]
+        if kind == self._MSG:
+            return RecordedFireEvent(self._elements.element(trans_val[1]),
+                                     *trans_val[2:])
+        if kind == self._TIMEOUT:
+            return SimTimer.TimeoutFmt(self._elements.sim, trans_val[1])
+        if kind == self._STATE:
+            return SimTracing.StateIndTransVal(trans_val[1],
+                                               dict(trans_val[2]))
+        return trans_val[1]
+
+    def decode(self, record):
+        ''' return :class:`~.SimTraceEvent` from tuple returned by encode '''
+        trace_time, part_id, sub_obj_id, action, trans_val = record
+        element = self._elements.element
+        sub_obj = element(sub_obj_id)
+        trace_ev = SimTraceEvent(element(part_id), sub_obj,
+                                 self.decode_trans_val(trans_val), action)
+        trace_ev.trace_time = trace_time
+        return trace_ev
+
+
+class TraceRingBuffer:
+    '''
+    Trace buffer that keeps at most *max_events* events in memory.
+
+    Without *spill_dir*, the oldest events are dropped. With *spill_dir*,
+    the oldest *segment_size* events are written to a gzip compressed file
+    in *spill_dir* whenever the buffer is full.
+
+    The buffer behaves like a read-only sequence of
+    :class:`~.sim_trace.SimTraceEvent` that contains the spilled and the
+    in-memory events in trace order.
+
+    :param int max_events: maximum number of events in memory
+    :param str spill_dir: directory for spilled segments. \
+        None to drop old events
+    :param int segment_size: number of events per spilled segment. \
+        Default: a quarter of *max_events*
+    '''
+
+    def __init__(self, max_events, spill_dir=None, segment_size=None):
+        if max_events <= 0:
+            raise ValueError("max_events must be > 0")
+        if segment_size is None:
+            segment_size = max(1, max_events // 4)
+        if not 0 < segment_size <= max_events:
+            raise ValueError("segment_size must be in 1..max_events")
+        self._max_events = max_events
+        self._spill_dir = spill_dir
+        self._segment_size = segment_size
+        self._codec = TraceEventCodec(ElementTable())
+        if spill_dir is None:
+            self._events = deque(maxlen=max_events)
+        else:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._events = deque()
+        # spilled segment file names and index of their first event
+        self._segment_files = []
+        self._segment_starts = []
+        self._num_spilled = 0
+        self._num_dropped = 0
+        # last segment read from disk (index, list of events)
+        self._cached_segment = (None, None)
+
+    def append(self, trace_ev):
+        ''' add event to buffer '''
+        events = self._events
+        if len(events) >= self._max_events:
+            if self._spill_dir is None:
+                self._num_dropped += 1
+            else:
+                self._spill()
+        events.append(trace_ev)
+
+    def _spill(self):
+        ''' write the oldest segment_size events to disk '''
+        events = self._events
+        encode = self._codec.encode
+        records = [encode(events.popleft())
+                   for _ in range(self._segment_size)]
+        # unique name, also when processes share the spill directory
+        fd, file_name = tempfile.mkstemp(
+            suffix=".pickle.gz", prefix="trace-", dir=self._spill_dir)
+        with os.fdopen(fd, 'wb') as raw_file, gzip.GzipFile(
+                fileobj=raw_file, mode='wb', compresslevel=1) as file:
+            pickle.dump(records, file, pickle.HIGHEST_PROTOCOL)
+        self._segment_files.append(file_name)
+        self._segment_starts.append(self._num_spilled)
+        self._num_spilled += len(records)
+
+    def _load_segment(self, seg_idx):
+        ''' return list of decoded events of spilled segment seg_idx '''
+        cached_idx, cached_events = self._cached_segment
+        if cached_idx == seg_idx:
+            return cached_events
+        with gzip.open(self._segment_files[seg_idx], 'rb') as file:
+            records = pickle.load(file)
+        decode = self._codec.decode
+        events = [decode(record) for record in records]
+        self._cached_segment = (seg_idx, events)
+        return events
+
+    def num_dropped(self):
+        ''' return number of events dropped because the buffer was full '''
+        return self._num_dropped
+
+    def num_spilled(self):
+        ''' return number of events written to disk '''
+        return self._num_spilled
+
+    def segment_files(self):
+        ''' return list of files with spilled segments '''
+        return list(self._segment_files)
+
+    def __len__(self):
+        return self._num_spilled + len(self._events)
+
+    def __iter__(self):
+        for seg_idx in range(len(self._segment_files)):
+            yield from self._load_segment(seg_idx)
+        # copy, so that events can be added while iterating
+        yield from list(self._events)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("trace index out of range")
+        if idx >= self._num_spilled:
+            return self._events[idx - self._num_spilled]
+        seg_idx = bisect_right(self._segment_starts, idx) - 1
+        return self._load_segment(seg_idx)[
+            idx - self._segment_starts[seg_idx]]
+
+    def clear(self):
+        ''' remove all events, delete spilled segment files '''
+        self._events.clear()
+        for file_name in self._segment_files:
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+        self._segment_files = []
+        self._segment_starts = []
+        self._num_spilled = 0
+        self._num_dropped = 0
+        self._cached_segment = (None, None)
+
+
+class ColumnarTraceStore:
+    '''
+    Trace store that keeps the events in typed arrays (columns):
+
+        * ``time``: event time (float64)
+        * ``action``: action code (int8), see :meth:`action_names`
+        * ``part``: part id (int32), see :meth:`element`
+        * ``element``: id of port, timer, watched variable or part (int32)
+        * ``value``: index into the value table (int32), -1 for no value, \
+            see :meth:`value`
+
+    Equal transport values (e.g. annotation texts) are stored only once
+    in the value table.
+
+    The store behaves like a read-only sequence of
+    :class:`~.sim_trace.SimTraceEvent`, which are created on access.
+    '''
+
+    #: action codes of the simulator's trace actions. Other actions are
+    #: assigned codes when they are first recorded
+    ACTIONS = ('>MSG', '>MSG(Q)', '<MSG', 'T-START', 'T-STOP', 'T-RESTA',
+               'T-EXP', 'ANN', 'STA', 'VC', 'ASSFAIL')
+
+    def __init__(self):
+        self._elements = ElementTable()
+        self._codec = TraceEventCodec(self._elements)
+        self._time = array('d')
+        self._action = array('b')
+        self._part = array('i')
+        self._element = array('i')
+        self._value = array('i')
+        self._action_names = list(self.ACTIONS)
+        self._action_codes = {name: code for code, name in
+                              enumerate(self._action_names)}
+        self._values = []
+        self._value_indexes = {}
+
+    def _action_code(self, action):
+        code = self._action_codes.get(action)
+        if code is None:
+            code = len(self._action_names)
+            if code > 127:
+                raise ValueError("Too many different trace actions")
+            self._action_names.append(action)
+            self._action_codes[action] = code
+        return code
+
+    def _value_index(self, trans_val):
+        if trans_val is None:
+            return -1
+        value = self._codec.encode_trans_val(trans_val)
+        try:
+            idx = self._value_indexes.get(value)
+        except TypeError:
+            # unhashable, store without deduplication
+            idx = None
+            value_indexes = None
+        else:
+            value_indexes = self._value_indexes
+        if idx is None:
+            idx = len(self._values)
+            self._values.append(value)
+            if value_indexes is not None:
+                value_indexes[value] = idx
+        return idx
+
+    def append(self, trace_ev):
+        ''' add event to store '''
+        elem_id = self._elements.elem_id
+        self._time.append(trace_ev.trace_time)
+        self._action.append(self._action_code(trace_ev.action))
+        self._part.append(elem_id(trace_ev.part))
+        self._element.append(elem_id(trace_ev.sub_obj))
+        self._value.append(self._value_index(trace_ev.trans_val))
+
+    def __len__(self):
+        return len(self._time)
+
+    def _event(self, idx):
+        sub_obj = self._elements.element(self._element[idx])
+        value_idx = self._value[idx]
+        trans_val = None
+        if value_idx >= 0:
+            trans_val = self._codec.decode_trans_val(self._values[value_idx])
+        trace_ev = SimTraceEvent(self._elements.element(self._part[idx]),
+                                 sub_obj, trans_val,
+                                 self._action_names[self._action[idx]])
+        trace_ev.trace_time = self._time[idx]
+        return trace_ev
+
+    def __iter__(self):
+        for idx in range(len(self._time)):
+            yield self._event(idx)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._event(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("trace index out of range")
+        return self._event(idx)
+
+    def clear(self):
+        ''' remove all events '''
+        self.__init__()
+
+    def columns(self):
+        '''
+        return the columns as dictionary of :class:`array.array`, with the
+        keys ``time``, ``action``, ``part``, ``element`` and ``value``
+        '''
+        return {'time': self._time, 'action': self._action,
+                'part': self._part, 'element': self._element,
+                'value': self._value}
+
+    def numpy_columns(self):
+        '''
+        return the columns as dictionary of NumPy arrays (see
+        :meth:`columns`). The arrays share the memory with the store
+        (no copy), so they are read-only.
+        Release them before the simulation continues: the store cannot
+        grow while NumPy arrays refer to it.
+
+        :raise ImportError: if NumPy is not installed
+        '''
+        import numpy as np
+
+        columns = {}
+        for name, column in self.columns().items():
+            view = np.frombuffer(column, dtype=column.typecode) \
+                if len(column) else np.array([], dtype=column.typecode)
+            view.flags.writeable = False
+            columns[name] = view
+        return columns
+
+    def action_names(self):
+        ''' return list of action names, indexed by action code '''
+        return list(self._action_names)
+
+    def action_code(self, action):
+        ''' return code of *action* string, None if never recorded '''
+        return self._action_codes.get(action)
+
+    def element(self, elem_id):
+        ''' return part, port or timer with id *elem_id*, None for -1 '''
+        return self._elements.element(elem_id)
+
+    def element_id(self, elem):
+        ''' return id of *elem*, None if not in store '''
+        return self._elements.find_id(elem)
+
+    def value(self, value_idx):
+        '''
+        return the transport value of a value index.
+        Messages are returned as :class:`RecordedFireEvent`
+        '''
+        if value_idx < 0:
+            return None
+        return self._codec.decode_trans_val(self._values[value_idx])
+
+    def nbytes(self):
+        ''' return number of bytes used by the columns '''
+        return sum(column.itemsize * len(column)
+                   for column in self.columns().values())
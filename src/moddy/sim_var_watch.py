@@ -7,8 +7,7 @@
 .. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
 
 """
-from .sim_base import SimBaseElement, add_elem_to_list
-from .sim_trace import SimTraceEvent
+from .sim_base import SimBaseElement, ElemList, add_elem_to_list
 
 
 class SimVariableWatcher(SimBaseElement):
@@ -91,42 +90,55 @@ class SimVarWatchManager:
     def __init__(self, sim_tracing):
         self._sim_tracing = sim_tracing
 
-        self._list_variable_watches = []  # list of watched variables
+        self._list_variable_watches = ElemList()  # watched variables
+        # watched variables by hierarchy name
+        self._variable_watches_by_name = {}
 
     def add_var_watcher(self, var_watcher):
         """Add watcher to watcher list"""
         add_elem_to_list(
             self._list_variable_watches, var_watcher, "Simulator Watcher"
         )
+        self._variable_watches_by_name.setdefault(
+            var_watcher.hierarchy_name(), var_watcher
+        )
 
     def watch_variables(self):
         """
         Check all registered variables for changes.
-        Generate a trace event for all changed variables
+        Generate a trace event for all changed variables.
+        If tracing is not active, only the last values are updated, so that
+        the changes are reported correctly when tracing is activated
         """
+        if not self._sim_tracing.active:
+            for var_watcher in self._list_variable_watches:
+                var_watcher.check_value_changed()
+            return
         for var_watcher in self._list_variable_watches:
             changed, _ = var_watcher.check_value_changed()
             if changed:
                 new_val_str = var_watcher.__str__()
-                trace_ev = SimTraceEvent(
+                self._sim_tracing.trace(
                     var_watcher.parent_obj, var_watcher, new_val_str, "VC"
                 )
-                self._sim_tracing.add_trace_event(trace_ev)
 
     def watch_variables_current_value(self):
         """
         Generate a trace event for all watched variables with their
         current value.
-        Used at start of simulator to report the initial values
+        Used at start of simulator to report the initial values.
+        If tracing is not active, only the last values are updated
         """
+        if not self._sim_tracing.active:
+            self.watch_variables()
+            return
         for var_watcher in self._list_variable_watches:
-            trace_ev = SimTraceEvent(
+            self._sim_tracing.trace(
                 var_watcher.parent_obj,
                 var_watcher,
                 var_watcher.__str__(),
                 "VC",
             )
-            self._sim_tracing.add_trace_event(trace_ev)
 
     def find_watched_variable_by_name(self, variable_hierarchy_name):
         """
@@ -135,9 +147,11 @@ class SimVarWatchManager:
         :return SimVariableWatcher: the found variable watcher
         :raises ValueError: if variable not found
         """
-        for var_watcher in self._list_variable_watches:
-            if var_watcher.hierarchy_name() == variable_hierarchy_name:
-                return var_watcher
+        var_watcher = self._variable_watches_by_name.get(
+            variable_hierarchy_name
+        )
+        if var_watcher is not None:
+            return var_watcher
         raise ValueError(
             "Watched Variable not found %s" % variable_hierarchy_name
         )
@@ -0,0 +1,428 @@
+"""
+:mod:`trace_diff` -- Compare two traces
+=======================================
+
+.. module:: trace_diff
+   :synopsis: Find where the traces of two simulation runs differ
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+:func:`diff_traces` compares the traces of two simulation runs, e.g. of an
+old and a new version of a model. Each trace can be a simulator, a list of
+trace events, a csv trace table (see :func:`~.trace_to_csv.gen_trace_table`
+and :class:`~.trace_sinks.CsvTraceSink`) or a binary trace file (see
+:class:`~.trace_sinks.BinaryTraceSink`).
+
+The traces are read in lockstep, one time stamp after the other. So only
+the events of one time stamp, the context and the reported divergences are
+kept in memory. Events with the same time stamp may be in a different
+order in the two traces.
+"""
+import collections
+import csv
+
+from .sim_base import time_unit_to_factor
+from .trace_sinks import BINARY_MAGIC, KIND_MSG, KIND_TIMER, trace_event_record
+from .trace_to_csv import CSV_FORMAT
+
+# normalized trace event.
+# *times* are the request, begin, end and flight time of messages,
+# the timeout of timers, otherwise empty
+DiffEvent = collections.namedtuple(
+    "DiffEvent", ["time", "action", "part", "sub_obj", "value", "times"]
+)
+
+ONLY_A = "only_a"
+ONLY_B = "only_b"
+CHANGED = "changed"
+
+
+class TraceDivergence:
+    """
+    An event that is only in one trace, or that has changed.
+
+    :ivar str kind: ``'only_a'``, ``'only_b'`` or ``'changed'`` (an event \
+        with the same time stamp, action and element is in both traces, \
+        but its value or times differ)
+    :ivar index_a: number of the event in trace A (counted from 0), \
+        None for ``'only_b'``
+    :ivar index_b: number of the event in trace B, None for ``'only_a'``
+    :ivar event_a: :class:`DiffEvent` of trace A, None for ``'only_b'``
+    :ivar event_b: :class:`DiffEvent` of trace B, None for ``'only_a'``
+    :ivar before: list of (index, :class:`DiffEvent`) of trace A \
+        before the divergence
+    :ivar after: list of (index, :class:`DiffEvent`) of trace A \
+        after the divergence
+    """
+
+    # pylint: disable=too-few-public-methods, too-many-arguments
+    def __init__(self, kind, index_a, index_b, event_a, event_b, before):
+        self.kind = kind
+        self.index_a = index_a
+        self.index_b = index_b
+        self.event_a = event_a
+        self.event_b = event_b
+        self.before = before
+        self.after = []
+
+    def action(self):
+        """ return the action of the divergent event """
+        return (self.event_a or self.event_b).action
+
+
+class TraceDiff:
+    """
+    Result of :func:`diff_traces`
+
+    :ivar list divergences: the first *max_divergences* \
+        :class:`TraceDivergence`
+    :ivar int num_events_a: number of events in trace A
+    :ivar int num_events_b: number of events in trace B
+    :ivar int num_divergences: number of all divergences
+    """
+
+    def __init__(self, time_unit):
+        self._time_unit = time_unit
+        self._time_unit_factor = time_unit_to_factor(time_unit)
+        self.divergences = []
+        self.num_events_a = 0
+        self.num_events_b = 0
+        self.num_divergences = 0
+        # action -> [only_a, only_b, changed]
+        self._action_counts = {}
+
+    def equal(self):
+        """ return True if the traces have no divergences """
+        return self.num_divergences == 0
+
+    def action_counts(self):
+        """
+        return the number of divergences per action as dictionary
+        action -> (only_a, only_b, changed)
+        """
+        return {
+            action: tuple(counts)
+            for action, counts in sorted(self._action_counts.items())
+        }
+
+    def _count(self, kind, action):
+        counts = self._action_counts.get(action)
+        if counts is None:
+            counts = self._action_counts[action] = [0, 0, 0]
+        counts[(ONLY_A, ONLY_B, CHANGED).index(kind)] += 1
+        self.num_divergences += 1
+
+    def event_str(self, event):
+        """ return a line for a :class:`DiffEvent` """
+        line = "%.6f%s %-8s %s%s" % (
+            event.time / self._time_unit_factor,
+            self._time_unit,
+            event.action,
+            event.part,
+            "" if not event.sub_obj else " " + event.sub_obj,
+        )
+        if event.value:
+            line += " " + event.value
+        if event.times:
+            line += " (%s)" % ", ".join(
+                "%.6f" % (time / self._time_unit_factor)
+                for time in event.times
+            )
+        return line
+
+    def report(self):
+        """ return a text report of the divergences """
+        lines = [
+            "Trace A: %d events, trace B: %d events, %d divergences"
+            % (self.num_events_a, self.num_events_b, self.num_divergences)
+        ]
+        for div in self.divergences:
+            lines.append("")
+            lines.append(
+                "%s at A#%s B#%s:"
+                % (
+                    div.kind,
+                    "-" if div.index_a is None else div.index_a,
+                    "-" if div.index_b is None else div.index_b,
+                )
+            )
+            for idx, event in div.before:
+                lines.append("    A#%-8d %s" % (idx, self.event_str(event)))
+            if div.event_a is not None:
+                lines.append(
+                    "  - A#%-8d %s"
+                    % (div.index_a, self.event_str(div.event_a))
+                )
+            if div.event_b is not None:
+                lines.append(
+                    "  + B#%-8d %s"
+                    % (div.index_b, self.event_str(div.event_b))
+                )
+            for idx, event in div.after:
+                lines.append("    A#%-8d %s" % (idx, self.event_str(event)))
+        if self._action_counts:
+            lines.append("")
+            lines.append(
+                "%-10s %10s %10s %10s" % ("action", ONLY_A, ONLY_B, CHANGED)
+            )
+            for action, counts in self.action_counts().items():
+                lines.append("%-10s %10d %10d %10d" % ((action,) + counts))
+        return "\n".join(lines)
+
+
+def diff_traces(
+    trace_a,
+    trace_b,
+    max_divergences=10,
+    context=3,
+    time_resolution=None,
+    time_unit="s",
+    float_comma=",",
+):
+    """
+    Compare two traces.
+
+    Example:
+
+    .. code-block:: python
+
+        diff = diff_traces("output/trace_ref.bin", simu)
+        if not diff.equal():
+            print(diff.report())
+
+    :param trace_a: first trace: a simulator, an iterable of trace events, \
+        or the file name of a csv trace table or binary trace file
+    :param trace_b: second trace, same types as *trace_a*
+    :param int max_divergences: number of divergences reported with \
+        details. All divergences are counted
+    :param int context: number of events of trace A reported before and \
+        after each divergence
+    :param float time_resolution: times are compared after rounding them to \
+        multiples of this (in seconds). Default is 1ns, or the resolution \
+        of the csv table if a trace is a csv table
+    :param str time_unit: time unit of csv trace tables, also used for \
+        the report
+    :param str float_comma: comma character of csv trace tables
+    :return: :class:`TraceDiff`
+    """
+    # pylint: disable=too-many-arguments, too-many-locals
+    factor = time_unit_to_factor(time_unit)
+    if time_resolution is None:
+        time_resolution = 1e-9
+        if any(_is_csv_file(trace) for trace in (trace_a, trace_b)):
+            time_resolution = 1e-6 * factor
+
+    diff = TraceDiff(time_unit)
+    with _TraceReader(trace_a, factor, float_comma) as reader_a, _TraceReader(
+        trace_b, factor, float_comma
+    ) as reader_b:
+        groups_a = _time_groups(reader_a.events(), time_resolution)
+        groups_b = _time_groups(reader_b.events(), time_resolution)
+        group_a = next(groups_a, None)
+        group_b = next(groups_b, None)
+        ctx = collections.deque(maxlen=context)
+        # divergences that need more events after them
+        pending = []
+
+        def add_divergence(kind, idx_a, idx_b, event_a, event_b):
+            # pylint: disable=too-many-arguments
+            diff._count(kind, (event_a or event_b).action)
+            if len(diff.divergences) < max_divergences:
+                div = TraceDivergence(
+                    kind, idx_a, idx_b, event_a, event_b, list(ctx)
+                )
+                diff.divergences.append(div)
+                if context:
+                    pending.append(div)
+
+        def add_context(idx, event):
+            for div in pending:
+                if div.index_a != idx:
+                    div.after.append((idx, event))
+            if pending and len(pending[0].after) >= context:
+                pending[:] = [
+                    div for div in pending if len(div.after) < context
+                ]
+            ctx.append((idx, event))
+
+        while group_a is not None or group_b is not None:
+            if group_b is None or (
+                group_a is not None and group_a[0] < group_b[0]
+            ):
+                for idx, event in group_a[1]:
+                    add_divergence(ONLY_A, idx, None, event, None)
+                    add_context(idx, event)
+                group_a = next(groups_a, None)
+            elif group_a is None or group_b[0] < group_a[0]:
+                for idx, event in group_b[1]:
+                    add_divergence(ONLY_B, None, idx, None, event)
+                group_b = next(groups_b, None)
+            else:
+                _diff_group(
+                    group_a[1], group_b[1], add_divergence, add_context
+                )
+                group_a = next(groups_a, None)
+                group_b = next(groups_b, None)
+
+        diff.num_events_a = reader_a.num_events
+        diff.num_events_b = reader_b.num_events
+    return diff
+
+
+def _diff_group(events_a, events_b, add_divergence, add_context):
+    """ compare the events of one time stamp """
+    keys_b = collections.Counter(_key(event) for _, event in events_b)
+    only_a = []
+    for idx, event in events_a:
+        key = _key(event)
+        if keys_b[key]:
+            keys_b[key] -= 1
+        else:
+            only_a.append((idx, event))
+    only_b = []
+    for idx, event in events_b:
+        key = _key(event)
+        if keys_b[key]:
+            keys_b[key] -= 1
+            only_b.append((idx, event))
+
+    # events in both traces with different values are changed
+    changed = {}
+    for idx, event in only_b:
+        changed.setdefault(event[1:4], collections.deque()).append(
+            (idx, event)
+        )
+    only_a_set = set(idx for idx, _ in only_a)
+    for idx, event in events_a:
+        if idx in only_a_set:
+            other = changed.get(event[1:4])
+            if other:
+                idx_b, event_b = other.popleft()
+                add_divergence(CHANGED, idx, idx_b, event, event_b)
+            else:
+                add_divergence(ONLY_A, idx, None, event, None)
+        add_context(idx, event)
+    for others in changed.values():
+        for idx, event in others:
+            add_divergence(ONLY_B, None, idx, None, event)
+
+
+def _key(event):
+    """ return the comparison key of a grouped event, without time """
+    return event[1:]
+
+
+def _time_groups(events, time_resolution):
+    """
+    yield (rounded time, [(idx, event), ...]) for each time stamp.
+    The times of the events in the groups are rounded
+    """
+    group = []
+    group_time = None
+    for idx, event in enumerate(events):
+        rounded = round(event.time / time_resolution)
+        if rounded != group_time:
+            if group:
+                yield group_time, group
+            group = []
+            group_time = rounded
+        times = event.times
+        if times:
+            event = event._replace(
+                times=tuple(
+                    round(time / time_resolution) * time_resolution
+                    for time in times
+                )
+            )
+        group.append((idx, event))
+    if group:
+        yield group_time, group
+
+
+def _is_csv_file(trace):
+    return isinstance(trace, str) and not _is_binary_file(trace)
+
+
+def _is_binary_file(file_name):
+    with open(file_name, "rb") as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+class _TraceReader:
+    """ yield the :class:`DiffEvent` of a trace """
+
+    def __init__(self, trace, time_unit_factor, float_comma):
+        self._trace = trace
+        self._factor = time_unit_factor
+        self._float_comma = float_comma
+        self._to_close = None
+        self.num_events = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._to_close is not None:
+            self._to_close.close()
+
+    def events(self):
+        """ yield the events of the trace """
+        trace = self._trace
+        if isinstance(trace, str):
+            if _is_binary_file(trace):
+                from .trace_file import BinaryTraceReader
+
+                self._to_close = BinaryTraceReader(trace)
+                trace = self._to_close
+            else:
+                self._to_close = open(trace, newline="")
+                events = self._csv_events(self._to_close)
+                trace = None
+        if trace is not None:
+            if hasattr(trace, "tracing"):
+                trace = trace.tracing.traced_events()
+            events = (_diff_event(trace_ev) for trace_ev in trace)
+        for event in events:
+            self.num_events += 1
+            yield event
+
+    def _csv_float(self, text):
+        return float(text.replace(self._float_comma, ".")) * self._factor
+
+    def _csv_events(self, file):
+        reader = csv.reader(file, **CSV_FORMAT)
+        for row in reader:
+            if not row or row[0].startswith("#"):
+                continue
+            action = row[1]
+            value = row[4] if len(row) > 4 else ""
+            times = ()
+            if "MSG" in action and len(row) > 8:
+                times = tuple(self._csv_float(text) for text in row[5:9])
+            elif action.startswith("T-") and value:
+                times = (self._csv_float(value),)
+                value = ""
+            yield DiffEvent(
+                self._csv_float(row[0]), action, row[2], row[3], value, times
+            )
+
+
+def _diff_event(trace_ev):
+    """ convert a trace event into a :class:`DiffEvent` """
+    rec = trace_event_record(trace_ev)
+    kind = rec[4]
+    value = "" if rec[5] is None else rec[5]
+    times = ()
+    if kind == KIND_MSG:
+        if rec[10]:
+            value = "(***LOST***)"
+        times = (rec[7], rec[8] - rec[9], rec[8], rec[9])
+    elif kind == KIND_TIMER:
+        times = (rec[7],)
+    return DiffEvent(
+        rec[0],
+        rec[1],
+        "Global" if rec[2] is None else rec[2],
+        rec[3] or "",
+        value,
+        times,
+    )
@@ -0,0 +1,725 @@
+"""
+:mod:`trace_file` -- Binary trace file reader
+=============================================
+
+.. module:: trace_file
+   :synopsis: Read binary trace files with random access by time
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`BinaryTraceReader` memory-maps a trace file written by
+:class:`~.trace_sinks.BinaryTraceSink`. The index of the file tells the
+time range of each chunk of records, so events in a time range are found
+without reading the rest of the file.
+
+The reader can be passed instead of the simulator to the output generators
+(e.g. :func:`~.trace_to_csv.gen_trace_table`,
+:func:`~.interactive_sequence_diagram.gen_interactive_sequence_diagram`) and
+to :class:`~.lib.trace_search.TraceSearch`.
+"""
+
+import json
+import mmap
+from bisect import bisect_left, bisect_right
+
+from .sim_base import name_matcher, time_unit_to_factor
+from .sim_ports import SimTimer
+from .sim_trace import SimTraceEvent, SimTracing
+from .sim_trace_store import RecordedFireEvent
+from .trace_sinks import (
+    BINARY_CHUNK_HEADER,
+    BINARY_CHUNK_TAG,
+    BINARY_ELEMENT,
+    BINARY_FILE_HEADER,
+    BINARY_FOOTER,
+    BINARY_FOOTER_MAGIC,
+    BINARY_INDEX_ENTRY,
+    BINARY_INDEX_HEADER,
+    BINARY_INDEX_TAG,
+    BINARY_MAGIC,
+    BINARY_RECORD,
+    BINARY_STRING_LEN,
+    BINARY_VERSION,
+    KIND_MSG,
+    KIND_NONE,
+    KIND_STATE,
+    KIND_TIMER,
+    KIND_VALUE,
+)
+
+
+class TracedElement:
+    """
+    Stand-in for a part, port, timer or watched variable read from a
+    trace file. Provides the attributes and methods that trace consumers
+    use.
+    """
+
+    # pylint: disable=too-few-public-methods, too-many-arguments
+    def __init__(
+        self, sim, hierarchy_name, type_str, parent_obj, color, is_part
+    ):
+        self._sim = sim
+        self._hierarchy_name = hierarchy_name
+        self.type_str = type_str
+        self.parent_obj = parent_obj
+        self.color = color
+        self.is_part = is_part
+
+    def hierarchy_name(self):
+        """Return the element name within the hierarchy"""
+        return self._hierarchy_name
+
+    def hierarchy_name_with_type(self):
+        """Return the element name within the hierarchy including type"""
+        return "%s(%s)" % (self._hierarchy_name, self.type_str)
+
+    def obj_name(self):
+        """return object name (without hierarchy)"""
+        if self.parent_obj is None:
+            return self._hierarchy_name
+        start = len(self.parent_obj.hierarchy_name()) + 1
+        return self._hierarchy_name[start:]
+
+    def __repr__(self):
+        return self.hierarchy_name_with_type()
+
+    def __str__(self):
+        return self._hierarchy_name
+
+
+class BinaryTraceReader:
+    """
+    Reader for trace files written by :class:`~.trace_sinks.BinaryTraceSink`.
+
+    The reader behaves like the list of traced events: it has a length,
+    can be iterated and indexed, and returns :class:`~.SimTraceEvent`
+    objects. Parts, ports, timers and variables of the events are
+    :class:`TracedElement` objects, messages are
+    :class:`~.sim_trace_store.RecordedFireEvent` objects.
+
+    It provides also the part of the simulator interface that is used by
+    the output generators and :class:`~.lib.trace_search.TraceSearch`,
+    so it can be passed to them instead of the simulator:
+
+    .. code-block:: python
+
+        with BinaryTraceReader("output/trace.bin") as trace:
+            moddy.gen_trace_table(trace, "output/trace.csv")
+            for trace_ev in trace.events_between(10, 20):
+                print(trace_ev)
+
+    :param str file_name: name of the trace file
+    :raise ValueError: if the file is not a binary trace file
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, "rb") as file:
+            header = file.read(BINARY_FILE_HEADER.size)
+            if len(header) < BINARY_FILE_HEADER.size:
+                raise ValueError("%s is not a moddy trace file" % file_name)
+            magic, version, record_size = BINARY_FILE_HEADER.unpack(header)
+            if magic != BINARY_MAGIC or record_size != BINARY_RECORD.size:
+                raise ValueError("%s is not a moddy trace file" % file_name)
+            if version != BINARY_VERSION:
+                raise ValueError(
+                    "%s: unsupported trace file version %d"
+                    % (file_name, version)
+                )
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # per chunk: offset, number of the first record, first/last time,
+        # number of the first string and element defined in the chunk
+        self._chunk_offsets = []
+        self._chunk_first_idx = []
+        self._chunk_first_time = []
+        self._chunk_last_time = []
+        self._chunk_first_string = []
+        self._chunk_first_elem = []
+        if not self._read_index():
+            self._scan_chunks()
+        # per chunk: offsets of strings, elements and records, and counts
+        self._chunk_layouts = {}
+
+        # string/element number -> string/element, loaded per chunk
+        self._strings = {-1: None}
+        self._elements = {-1: None}
+        self._strings_loaded = set()  # chunks with loaded strings
+        self._elements_loaded = set()  # chunks with loaded elements
+        self._all_defs_loaded = False
+        # hierarchy name -> elements with that name
+        self._elements_by_name = None
+        self._time_scale = 1.0
+        self._time_scale_str = "s"
+
+        # simulator interface for the output generators
+        self.tracing = self.parts_mgr = self.var_watch_mgr = self
+
+    def _add_chunk(
+        self,
+        offset,
+        first_idx,
+        first_time,
+        last_time,
+        first_string,
+        first_elem,
+    ):
+        # pylint: disable=too-many-arguments
+        self._chunk_offsets.append(offset)
+        self._chunk_first_idx.append(first_idx)
+        self._chunk_first_time.append(first_time)
+        self._chunk_last_time.append(last_time)
+        self._chunk_first_string.append(first_string)
+        self._chunk_first_elem.append(first_elem)
+
+    def _read_index(self):
+        """read the index at the end of the file. False if there is none"""
+        mm = self._mmap
+        if len(mm) < BINARY_FILE_HEADER.size + BINARY_FOOTER.size:
+            return False
+        index_offset, magic = BINARY_FOOTER.unpack_from(
+            mm, len(mm) - BINARY_FOOTER.size
+        )
+        if magic != BINARY_FOOTER_MAGIC:
+            return False
+        tag, num_chunks = BINARY_INDEX_HEADER.unpack_from(mm, index_offset)
+        if tag != BINARY_INDEX_TAG:
+            return False
+        offset = index_offset + BINARY_INDEX_HEADER.size
+        for _ in range(num_chunks):
+            self._add_chunk(*BINARY_INDEX_ENTRY.unpack_from(mm, offset))
+            offset += BINARY_INDEX_ENTRY.size
+        self._num_records = 0
+        if self._chunk_offsets:
+            self._num_records = (
+                self._chunk_first_idx[-1]
+                + BINARY_CHUNK_HEADER.unpack_from(mm, self._chunk_offsets[-1])[
+                    4
+                ]
+            )
+        return True
+
+    def _scan_chunks(self):
+        """find the chunks of a file without index"""
+        mm = self._mmap
+        offset = BINARY_FILE_HEADER.size
+        num_records = num_strings = num_elements = 0
+        while offset + BINARY_CHUNK_HEADER.size <= len(mm):
+            (
+                tag,
+                strings_size,
+                num_chunk_strings,
+                num_chunk_elements,
+                num_chunk_records,
+                first_time,
+                last_time,
+            ) = BINARY_CHUNK_HEADER.unpack_from(mm, offset)
+            if tag != BINARY_CHUNK_TAG:
+                break
+            end = (
+                offset
+                + BINARY_CHUNK_HEADER.size
+                + strings_size
+                + num_chunk_elements * BINARY_ELEMENT.size
+                + num_chunk_records * BINARY_RECORD.size
+            )
+            if end > len(mm):
+                break  # incomplete chunk
+            self._add_chunk(
+                offset,
+                num_records,
+                first_time,
+                last_time,
+                num_strings,
+                num_elements,
+            )
+            num_records += num_chunk_records
+            num_strings += num_chunk_strings
+            num_elements += num_chunk_elements
+            offset = end
+        self._num_records = num_records
+
+    def _chunk_layout(self, chunk_no):
+        """
+        return (strings offset, number of strings, elements offset,
+        number of elements, records offset, number of records) of a chunk
+        """
+        layout = self._chunk_layouts.get(chunk_no)
+        if layout is None:
+            offset = self._chunk_offsets[chunk_no]
+            (
+                _,
+                strings_size,
+                num_strings,
+                num_elements,
+                num_records,
+                _,
+                _,
+            ) = BINARY_CHUNK_HEADER.unpack_from(self._mmap, offset)
+            strings_offset = offset + BINARY_CHUNK_HEADER.size
+            elements_offset = strings_offset + strings_size
+            records_offset = (
+                elements_offset + num_elements * BINARY_ELEMENT.size
+            )
+            layout = (
+                strings_offset,
+                num_strings,
+                elements_offset,
+                num_elements,
+                records_offset,
+                num_records,
+            )
+            self._chunk_layouts[chunk_no] = layout
+        return layout
+
+    @staticmethod
+    def _defining_chunk(first_nums, num):
+        """
+        return number of the chunk that defines string or element *num*.
+        *first_nums* are the numbers of the first definition of the chunks
+        """
+        # chunks without definitions have the same first number as the
+        # next chunk, bisect_right skips them
+        return bisect_right(first_nums, num) - 1
+
+    def _load_strings(self, chunk_no):
+        """load the strings defined in chunk *chunk_no*"""
+        mm = self._mmap
+        strings = self._strings
+        self._strings_loaded.add(chunk_no)
+        offset, num_strings = self._chunk_layout(chunk_no)[:2]
+        first = self._chunk_first_string[chunk_no]
+        for num in range(first, first + num_strings):
+            (length,) = BINARY_STRING_LEN.unpack_from(mm, offset)
+            offset += BINARY_STRING_LEN.size
+            end = offset + length
+            strings[num] = mm[offset:end].decode("utf-8")
+            offset = end
+
+    def _load_elements(self, chunk_no):
+        """load the elements defined in chunk *chunk_no*"""
+        self._elements_loaded.add(chunk_no)
+        elements_offset, num_elements = self._chunk_layout(chunk_no)[2:4]
+        end = elements_offset + num_elements * BINARY_ELEMENT.size
+        string = self.string
+        for elem_id, (name, type_str, parent_id, color, is_part) in enumerate(
+            BINARY_ELEMENT.iter_unpack(self._mmap[elements_offset:end]),
+            self._chunk_first_elem[chunk_no],
+        ):
+            self._elements[elem_id] = TracedElement(
+                self,
+                string(name),
+                string(type_str),
+                self.element(parent_id),
+                string(color),
+                bool(is_part),
+            )
+
+    def _load_all_defs(self):
+        if self._all_defs_loaded:
+            return
+        for chunk_no in range(len(self._chunk_offsets)):
+            if chunk_no not in self._elements_loaded:
+                self._load_elements(chunk_no)
+        self._all_defs_loaded = True
+
+    def close(self):
+        """
+        Close the file. NumPy arrays returned by :meth:`numpy_records`
+        must be deleted before
+        """
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    #
+    # Events
+    #
+    def __len__(self):
+        return self._num_records
+
+    def _locate(self, idx):
+        """return chunk number and index within chunk of record *idx*"""
+        chunk_no = bisect_right(self._chunk_first_idx, idx) - 1
+        return chunk_no, idx - self._chunk_first_idx[chunk_no]
+
+    def _raw_record(self, chunk_no, rec_idx):
+        records_offset = self._chunk_layout(chunk_no)[4]
+        return BINARY_RECORD.unpack_from(
+            self._mmap, records_offset + rec_idx * BINARY_RECORD.size
+        )
+
+    def _decode(self, raw):
+        (
+            time,
+            request_time,
+            exec_time,
+            flight_time,
+            action,
+            part,
+            sub_obj,
+            value,
+            extra,
+            port,
+            flags,
+        ) = raw
+        string = self.string
+        kind = flags & 0x7F
+        if kind == KIND_NONE:
+            trans_val = None
+        elif kind == KIND_MSG:
+            trans_val = RecordedFireEvent(
+                self.element(port),
+                string(value),
+                string(extra),
+                flight_time,
+                request_time,
+                exec_time,
+                bool(flags & 0x80),
+            )
+        elif kind == KIND_TIMER:
+            trans_val = SimTimer.TimeoutFmt(self, request_time)
+        elif kind == KIND_STATE:
+            trans_val = SimTracing.StateIndTransVal(
+                string(value),
+                None if extra < 0 else json.loads(string(extra)),
+            )
+        else:
+            trans_val = string(value)
+        trace_ev = SimTraceEvent(
+            self.element(part),
+            self.element(sub_obj),
+            trans_val,
+            string(action),
+        )
+        trace_ev.trace_time = time
+        return trace_ev
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._num_records))]
+        if idx < 0:
+            idx += self._num_records
+        if not 0 <= idx < self._num_records:
+            raise IndexError("trace index out of range")
+        return self._decode(self._raw_record(*self._locate(idx)))
+
+    def __iter__(self):
+        return self.iter_events()
+
+    def _first_index(self, time, after):
+        """
+        return index of the first event at or after *time*, or, if *after*
+        is True, of the first event after *time*.
+        ``len(self)`` if there is no such event
+        """
+        bisect_chunks = bisect_right if after else bisect_left
+        chunk_no = bisect_chunks(self._chunk_last_time, time)
+        while chunk_no < len(self._chunk_offsets):
+            num_records = self._chunk_layout(chunk_no)[5]
+            # bisect within the chunk
+            low, high = 0, num_records
+            while low < high:
+                mid = (low + high) // 2
+                mid_time = self._raw_record(chunk_no, mid)[0]
+                if mid_time < time or (after and mid_time == time):
+                    low = mid + 1
+                else:
+                    high = mid
+            if low < num_records:
+                return self._chunk_first_idx[chunk_no] + low
+            chunk_no += 1  # chunk without records
+        return self._num_records
+
+    def index_of_time(self, time):
+        """
+        return index of the first event at or after *time*.
+        ``len(self)`` if there is no such event
+        """
+        return self._first_index(time, False)
+
+    def _index_range(self, t_from, t_to):
+        start = 0 if t_from is None else self._first_index(t_from, False)
+        if t_to is None:
+            return start, self._num_records
+        return start, max(start, self._first_index(t_to, True))
+
+    def iter_events(self, t_from=None, t_to=None, action=None, part=None):
+        """
+        Iterate over the events, optionally filtered.
+
+        :param float t_from: skip events before this time
+        :param float t_to: stop at events after this time
+        :param action: action string or list of action strings, \
+            e.g. ``'<MSG'``. None for all actions
+        :param part: glob pattern (see :mod:`fnmatch`) or compiled regular \
+            expression that must match the whole hierarchy name of the \
+            events' part. None for all parts
+        :return: iterator over :class:`~.SimTraceEvent` objects
+        """
+        # pylint: disable=too-many-locals
+        if isinstance(action, str):
+            action = (action,)
+        if action is not None:
+            action = frozenset(action)
+        match = None if part is None else name_matcher(part)
+        part_decisions = {}
+
+        start, end = self._index_range(t_from, t_to)
+        if start >= end:
+            return
+        chunk_no, rec_idx = self._locate(start)
+        idx = start
+        string = self.string
+        while idx < end:
+            records_offset, num_records = self._chunk_layout(chunk_no)[4:]
+            count = min(num_records - rec_idx, end - idx)
+            begin = records_offset + rec_idx * BINARY_RECORD.size
+            stop = begin + count * BINARY_RECORD.size
+            data = self._mmap[begin:stop]
+            for raw in BINARY_RECORD.iter_unpack(data):
+                if action is not None and string(raw[4]) not in action:
+                    continue
+                if match is not None:
+                    traced = part_decisions.get(raw[5])
+                    if traced is None:
+                        elem = self.element(raw[5])
+                        traced = part_decisions[raw[5]] = (
+                            elem is not None
+                            and match(elem.hierarchy_name()) is not None
+                        )
+                    if not traced:
+                        continue
+                yield self._decode(raw)
+            idx += count
+            chunk_no += 1
+            rec_idx = 0
+
+    def events_between(self, t_from, t_to):
+        """
+        return iterator over the events with
+        ``t_from <= trace_time <= t_to``
+        """
+        return self.iter_events(t_from, t_to)
+
+    def records(self):
+        """
+        Iterate over the events as tuples, like
+        :func:`~.trace_sinks.trace_event_record`. The *extra* field of
+        state indicators is the appearance dictionary, of messages the
+        color string
+        """
+        for trace_ev in self.iter_events():
+            part = trace_ev.part
+            sub_obj = trace_ev.sub_obj
+            trans_val = trace_ev.trans_val
+            record = (
+                trace_ev.trace_time,
+                trace_ev.action,
+                None if part is None else part.hierarchy_name(),
+                (
+                    None
+                    if sub_obj is None
+                    else sub_obj.hierarchy_name_with_type()
+                ),
+            )
+            if trans_val is None:
+                yield record + (KIND_NONE, None, None, 0.0, 0.0, 0.0, False)
+            elif isinstance(trans_val, RecordedFireEvent):
+                yield record + (
+                    KIND_MSG,
+                    trans_val.msg_text(),
+                    trans_val.msg_color,
+                    trans_val.request_time,
+                    trans_val.exec_time,
+                    trans_val.flight_time,
+                    trans_val.is_lost,
+                )
+            elif isinstance(trans_val, SimTimer.TimeoutFmt):
+                yield record + (
+                    KIND_TIMER,
+                    None,
+                    None,
+                    trans_val.timeout,
+                    0.0,
+                    0.0,
+                    False,
+                )
+            elif isinstance(trans_val, SimTracing.StateIndTransVal):
+                yield record + (
+                    KIND_STATE,
+                    trans_val.text,
+                    trans_val.appearance,
+                    0.0,
+                    0.0,
+                    0.0,
+                    False,
+                )
+            else:
+                yield record + (
+                    KIND_VALUE,
+                    trans_val,
+                    None,
+                    0.0,
+                    0.0,
+                    0.0,
+                    False,
+                )
+
+    def numpy_records(self, t_from=None, t_to=None):
+        """
+        return the records of the events in a time range as NumPy
+        structured array, with the fields ``time``, ``request_time``,
+        ``exec_time``, ``flight_time``, ``action``, ``part``, ``sub_obj``,
+        ``value``, ``extra``, ``port`` and ``flags``
+        (see :class:`~.trace_sinks.BinaryTraceSink`).
+        ``action``, ``value`` and ``extra`` are string numbers
+        (see :meth:`string`), ``part``, ``sub_obj`` and ``port`` element
+        numbers (see :meth:`element`).
+
+        If the records are stored in one chunk, the array is a read-only
+        view of the file, otherwise a copy.
+        Requires NumPy.
+
+        :param float t_from: start time, None for the first event
+        :param float t_to: end time (inclusive), None for the last event
+        """
+        import numpy as np
+
+        dtype = np.dtype(
+            {
+                "names": [
+                    "time",
+                    "request_time",
+                    "exec_time",
+                    "flight_time",
+                    "action",
+                    "part",
+                    "sub_obj",
+                    "value",
+                    "extra",
+                    "port",
+                    "flags",
+                ],
+                "formats": ["<f8"] * 4 + ["<i4"] * 6 + ["u1"],
+                "offsets": [0, 8, 16, 24, 32, 36, 40, 44, 48, 52, 56],
+                "itemsize": BINARY_RECORD.size,
+            }
+        )
+        start, end = self._index_range(t_from, t_to)
+        parts = []
+        idx = start
+        while idx < end:
+            chunk_no, rec_idx = self._locate(idx)
+            records_offset, num_records = self._chunk_layout(chunk_no)[4:]
+            count = min(num_records - rec_idx, end - idx)
+            parts.append(
+                np.frombuffer(
+                    self._mmap,
+                    dtype,
+                    count,
+                    records_offset + rec_idx * BINARY_RECORD.size,
+                )
+            )
+            idx += count
+        if not parts:
+            return np.zeros(0, dtype)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def string(self, num):
+        """return string with number *num*, None for -1"""
+        try:
+            return self._strings[num]
+        except KeyError:
+            chunk_no = self._defining_chunk(self._chunk_first_string, num)
+            if chunk_no < 0 or chunk_no in self._strings_loaded:
+                raise IndexError("string %d not in trace file" % num)
+            self._load_strings(chunk_no)
+            return self._strings[num]
+
+    def element(self, elem_id):
+        """return :class:`TracedElement` with number *elem_id*"""
+        try:
+            return self._elements[elem_id]
+        except KeyError:
+            chunk_no = self._defining_chunk(self._chunk_first_elem, elem_id)
+            if chunk_no < 0 or chunk_no in self._elements_loaded:
+                raise IndexError("element %d not in trace file" % elem_id)
+            self._load_elements(chunk_no)
+            return self._elements[elem_id]
+
+    #
+    # Simulator interface
+    #
+    def traced_events(self):
+        """return the traced events, i.e. the reader itself"""
+        return self
+
+    def set_display_time_unit(self, unit):
+        """
+        Define how the times are displayed
+
+        :param str unit: can be "s", "ms", "us", "ns"
+        """
+        self._time_scale = time_unit_to_factor(unit)
+        self._time_scale_str = unit
+
+    def time_str(self, time):
+        """return a formatted time string of *time*"""
+        return "%.1f%s" % (time / self._time_scale, self._time_scale_str)
+
+    def _find_element(self, hierarchy_name, kinds, what):
+        if self._elements_by_name is None:
+            self._load_all_defs()
+            by_name = self._elements_by_name = {}
+            for elem_id in range(len(self._elements) - 1):
+                elem = self._elements[elem_id]
+                by_name.setdefault(elem.hierarchy_name(), []).append(elem)
+        for elem in self._elements_by_name.get(hierarchy_name, ()):
+            if elem.is_part if kinds is None else elem.type_str in kinds:
+                return elem
+        raise ValueError("%s %s not found" % (what, hierarchy_name))
+
+    def walk_parts(self):
+        """Iterate through all parts, parents before their children"""
+        self._load_all_defs()
+        elements = self._elements
+        return (
+            elements[elem_id]
+            for elem_id in range(len(elements) - 1)
+            if elements[elem_id].is_part
+        )
+
+    def find_part_by_name(self, part_hierarchy_name):
+        """
+        Find a part by its hierarchy name
+
+        :raises ValueError: if part not found
+        """
+        return self._find_element(part_hierarchy_name, None, "Part")
+
+    def find_port_by_name(self, port_hierarchy_name):
+        """
+        Find a port by its hierarchy name
+
+        :raises ValueError: if port not found
+        """
+        return self._find_element(
+            port_hierarchy_name, ("InPort", "OutPort", "IOPort"), "Port"
+        )
+
+    def find_watched_variable_by_name(self, variable_hierarchy_name):
+        """
+        Find a watched variable by its hierarchy name
+
+        :raises ValueError: if variable not found
+        """
+        return self._find_element(
+            variable_hierarchy_name, ("WatchedVar",), "Variable"
+        )
@@ -0,0 +1,227 @@
+"""
+:mod:`trace_fingerprint` -- Trace fingerprints
+==============================================
+
+.. module:: trace_fingerprint
+   :synopsis: Rolling hash of the trace to compare simulation runs
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`TraceFingerprint` computes a rolling hash of the trace events
+while the simulation runs, see :meth:`~.SimTracing.enable_fingerprint`.
+Two runs of a model had the same trace if their fingerprints are equal.
+So you can check that a change in the model or in moddy didn't change
+the behavior of the model without comparing trace files.
+
+Each event is hashed by its time, action, element name and value text,
+and the times of messages and timers. The texts are prefixed with their
+length, so that different events can't hash the same byte stream.
+Every *checkpoint_interval* events, the hash so far is saved as
+checkpoint. If two fingerprints differ, :meth:`TraceFingerprint.compare`
+bisects the checkpoints to find the range of events that contains the
+first difference.
+"""
+import hashlib
+import json
+import struct
+
+from .trace_sinks import trace_event_record
+
+# time, request time/timeout, execution time, flight time, message lost
+_TIMES = struct.Struct("<qqqq?")
+# length of a text field
+_LEN = struct.Struct("<I")
+
+
+class TraceFingerprint:
+    """
+    Rolling hash of trace events.
+
+    The object is a trace event consumer, see :meth:`~.SimTracing.subscribe`.
+
+    :param int checkpoint_interval: number of events between checkpoints
+    :param str algorithm: name of the :mod:`hashlib` algorithm
+    :param float time_resolution: the event times are rounded to \
+        multiples of this (in seconds) before hashing
+    :raise ValueError: if *checkpoint_interval* < 1 or the algorithm \
+        is not supported
+    """
+
+    def __init__(
+        self,
+        checkpoint_interval=10000,
+        algorithm="sha256",
+        time_resolution=1e-9,
+    ):
+        if checkpoint_interval < 1:
+            raise ValueError("checkpoint_interval must be >= 1")
+        self.checkpoint_interval = checkpoint_interval
+        self.algorithm = algorithm
+        self.time_resolution = time_resolution
+        self._hash = hashlib.new(algorithm)
+        self._num_events = 0
+        self._last_time = 0.0
+        self._digest = None
+        # list of (number of events, time of last event, hex digest)
+        self._checkpoints = []
+
+    def __call__(self, trace_ev):
+        rec = trace_event_record(trace_ev)
+        res = self.time_resolution
+        update = self._hash.update
+        for text in (
+            rec[1],
+            rec[3] or rec[2] or "",
+            "" if rec[5] is None else str(rec[5]),
+        ):
+            data = text.encode("utf-8")
+            update(_LEN.pack(len(data)))
+            update(data)
+        update(
+            _TIMES.pack(
+                round(rec[0] / res),
+                round(rec[7] / res),
+                round(rec[8] / res),
+                round(rec[9] / res),
+                rec[10],
+            )
+        )
+        time = rec[0]
+        self._num_events += 1
+        self._last_time = time
+        self._digest = None
+        if self._num_events % self.checkpoint_interval == 0:
+            self._checkpoints.append(
+                (self._num_events, time, self.hexdigest())
+            )
+
+    def update_events(self, trace_events):
+        """
+        Add events, e.g. those recorded by the simulator or read by
+        :class:`~.trace_file.BinaryTraceReader`
+
+        :param trace_events: iterable of :class:`~.SimTraceEvent`
+        """
+        for trace_ev in trace_events:
+            self(trace_ev)
+
+    def num_events(self):
+        """ return the number of hashed events """
+        return self._num_events
+
+    def hexdigest(self):
+        """ return the hash of all events so far as hex string """
+        if self._digest is None:
+            self._digest = self._hash.hexdigest()
+        return self._digest
+
+    def checkpoints(self):
+        """
+        return the list of checkpoints.
+        Each checkpoint is a tuple (number of events, time of the last
+        event, hex digest)
+        """
+        return self._checkpoints
+
+    def __eq__(self, other):
+        if not isinstance(other, TraceFingerprint):
+            return NotImplemented
+        return (
+            self.algorithm == other.algorithm
+            and self._num_events == other.num_events()
+            and self.hexdigest() == other.hexdigest()
+        )
+
+    def __ne__(self, other):
+        rv = self.__eq__(other)
+        return rv if rv is NotImplemented else not rv
+
+    __hash__ = None
+
+    def compare(self, other):
+        """
+        Locate the first difference between two fingerprints.
+
+        Both fingerprints must use the same algorithm, checkpoint interval
+        and time resolution.
+
+        :param TraceFingerprint other: fingerprint to compare with
+        :return: None if the fingerprints are equal. Otherwise the tuple \
+            (first, last): the first different event is between event \
+            number *first* and *last*-1 (counted from 0). *last* can be \
+            larger than the number of events of one fingerprint
+        :raise ValueError: if the fingerprints are not comparable
+        """
+        if (
+            self.algorithm != other.algorithm
+            or self.checkpoint_interval != other.checkpoint_interval
+            or self.time_resolution != other.time_resolution
+        ):
+            raise ValueError(
+                "fingerprints use different algorithms, checkpoint intervals "
+                "or time resolutions"
+            )
+        if self == other:
+            return None
+
+        cps = self._checkpoints
+        other_cps = other.checkpoints()
+        # the hashes are rolling, so once different, all later
+        # checkpoints differ. Find the first different checkpoint
+        lo = 0
+        hi = min(len(cps), len(other_cps))
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cps[mid][2] == other_cps[mid][2]:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = cps[lo - 1][0] if lo > 0 else 0
+        if lo < len(cps) and lo < len(other_cps):
+            last = cps[lo][0]
+        else:
+            last = min(
+                first + self.checkpoint_interval,
+                max(self._num_events, other.num_events()),
+            )
+        return first, last
+
+    def to_dict(self):
+        """ return the fingerprint as dictionary, e.g. to save it """
+        return {
+            "algorithm": self.algorithm,
+            "checkpoint_interval": self.checkpoint_interval,
+            "time_resolution": self.time_resolution,
+            "num_events": self._num_events,
+            "last_time": self._last_time,
+            "digest": self.hexdigest(),
+            "checkpoints": [list(cp) for cp in self._checkpoints],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Create a fingerprint from a dictionary returned by :meth:`to_dict`.
+        It can be compared with other fingerprints, but not be updated
+        """
+        fp = cls(
+            data["checkpoint_interval"],
+            data["algorithm"],
+            data["time_resolution"],
+        )
+        fp._hash = None
+        fp._num_events = data["num_events"]
+        fp._last_time = data["last_time"]
+        fp._digest = data["digest"]
+        fp._checkpoints = [tuple(cp) for cp in data["checkpoints"]]
+        return fp
+
+    def save(self, file_name):
+        """ save the fingerprint as JSON file """
+        with open(file_name, "w") as file:
+            json.dump(self.to_dict(), file, indent=1)
+
+    @classmethod
+    def load(cls, file_name):
+        """ load a fingerprint saved by :meth:`save` """
+        with open(file_name) as file:
+            return cls.from_dict(json.load(file))
@@ -0,0 +1,128 @@
+"""
+:mod:`trace_printer` -- Buffered trace printing
+===============================================
+
+.. module:: trace_printer
+   :synopsis: Print trace events in chunks, sampled and rate limited
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A :class:`TracePrinter` replaces the synchronous ``print()`` of each trace
+event, see :meth:`~.SimTracing.set_trace_printer`.
+"""
+import sys
+import time
+
+
+class TracePrinter:
+    """
+    Print trace events to the console in chunks.
+
+    The lines of the printed events are collected and written with one
+    write call when *buffer_lines* lines are collected, *flush_interval*
+    seconds have elapsed since the last write, or the simulator stops.
+
+    :param time_str: function to format the trace time
+    :param int every_nth: print only every nth event (default: 1 = all)
+    :param float max_rate: maximum number of events printed per second \
+        (real time). Further events are counted, and the number of skipped \
+        events is printed before the next printed event. None for no limit
+    :param int buffer_lines: number of lines written at once
+    :param float flush_interval: maximum time in seconds (real time) \
+        that printed lines are kept in the buffer
+    :param file: file to write to. Default is the current ``sys.stdout``
+    :param clock: function that returns the real time in seconds, \
+        default :func:`time.monotonic`
+    :raise ValueError: if *every_nth* < 1 or *max_rate* <= 0
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(
+        self,
+        time_str,
+        every_nth=1,
+        max_rate=None,
+        buffer_lines=1000,
+        flush_interval=0.1,
+        file=None,
+        clock=time.monotonic,
+    ):
+        # pylint: disable=too-many-arguments
+        if every_nth < 1:
+            raise ValueError("every_nth must be >= 1")
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError("max_rate must be > 0")
+        self._time_str = time_str
+        self._every_nth = every_nth
+        self._max_rate = max_rate
+        self._buffer_lines = buffer_lines
+        self._flush_interval = flush_interval
+        self._file = file
+        self._clock = clock
+        self._lines = []
+        self._event_count = 0
+        self._num_skipped = 0
+        self._last_flush = clock()
+        # token bucket for the rate limit, allows bursts of max_rate events
+        self._tokens = max_rate
+        self._last_refill = self._last_flush
+
+    def print_event(self, trace_ev):
+        """ print *trace_ev*, if not skipped by sampling or rate limit """
+        count = self._event_count
+        self._event_count = count + 1
+        if count % self._every_nth:
+            return
+        now = None
+        if self._max_rate is not None:
+            now = self._clock()
+            tokens = min(
+                self._max_rate,
+                self._tokens + (now - self._last_refill) * self._max_rate,
+            )
+            self._last_refill = now
+            if tokens < 1:
+                self._tokens = tokens
+                self._num_skipped += 1
+                return
+            self._tokens = tokens - 1
+
+        lines = self._lines
+        if self._num_skipped:
+            lines.append(
+                "TRC: (%d events not printed due to rate limit)"
+                % self._num_skipped
+            )
+            self._num_skipped = 0
+        lines.append(
+            "TRC: %10s %s" % (self._time_str(trace_ev.trace_time), trace_ev)
+        )
+        if len(lines) >= self._buffer_lines:
+            self.flush()
+        else:
+            if now is None:
+                now = self._clock()
+            if now - self._last_flush >= self._flush_interval:
+                self.flush()
+
+    def flush(self):
+        """ write the collected lines """
+        self._last_flush = self._clock()
+        if self._lines:
+            self._lines.append("")
+            file = self._file if self._file is not None else sys.stdout
+            file.write("\n".join(self._lines))
+            file.flush()
+            self._lines = []
+
+    def finish(self):
+        """
+        Write the collected lines and the number of events not printed
+        due to the rate limit
+        """
+        if self._num_skipped:
+            self._lines.append(
+                "TRC: (%d events not printed due to rate limit)"
+                % self._num_skipped
+            )
+            self._num_skipped = 0
+        self.flush()
@@ -0,0 +1,649 @@
+"""
+:mod:`trace_sinks` -- Streaming trace output
+============================================
+
+.. module:: trace_sinks
+   :synopsis: Write trace events to files while the simulation runs
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+A trace sink subscribes to the simulator's tracing
+(see :meth:`~.SimTracing.subscribe`) and writes each trace event to a file
+while the simulation runs. So the trace doesn't need to be kept in memory,
+and the events written so far survive a crashing simulation.
+
+The simulation thread only converts the trace events into tuples of
+strings and numbers (see :func:`trace_event_record`) and collects them in
+batches. A background thread formats the batches and writes them to the
+file. The sinks are closed when the simulator stops.
+
+Available sinks:
+
+    * :class:`JsonLinesTraceSink`: one JSON object per line
+    * :class:`CsvTraceSink`: same columns as :func:`~.gen_trace_table`
+    * :class:`BinaryTraceSink`: compact binary format, read by \
+        :class:`~.trace_file.BinaryTraceReader`
+"""
+
+import abc
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+
+from .sim_base import time_unit_to_factor
+from .sim_part import SimPart
+from .utils import create_dirs_and_open_output_file
+
+# kinds of transport values in trace event records
+KIND_NONE = 0
+KIND_VALUE = 1
+KIND_MSG = 2
+KIND_TIMER = 3
+KIND_STATE = 4
+
+
+def trace_event_record(trace_ev):
+    """
+    Convert a trace event into a tuple that doesn't reference model objects:
+
+    ``(time, action, part, sub_obj, kind, value, extra, request_time,
+    exec_time, flight_time, is_lost)``
+
+    *part* is the hierarchy name of the part (None for global events),
+    *sub_obj* the hierarchy name with type of the port, timer or variable.
+    *kind* tells the type of the transport value:
+
+        * ``KIND_MSG``: *value* is the message text, *extra* the message \
+            color. *request_time*, *exec_time*, *flight_time* and \
+            *is_lost* are those of the message
+        * ``KIND_TIMER``: *request_time* is the timeout of the timer
+        * ``KIND_STATE``: *value* is the state text, *extra* the \
+            appearance dictionary
+        * ``KIND_VALUE``: *value* is the string of the transport value
+        * ``KIND_NONE``: no transport value
+
+    Unused fields are None, 0.0 or False.
+    """
+    part = trace_ev.part
+    sub_obj = trace_ev.sub_obj
+    part_name = None if part is None else part.hierarchy_name()
+    sub_obj_name = (
+        None if sub_obj is None else sub_obj.hierarchy_name_with_type()
+    )
+
+    return (
+        trace_ev.trace_time,
+        trace_ev.action,
+        part_name,
+        sub_obj_name,
+    ) + _trans_val_fields(trace_ev.action, trace_ev.trans_val)
+
+
+def _trans_val_fields(action, trans_val):
+    """
+    return fields (kind, value, extra, request_time, exec_time, flight_time,
+    is_lost) of a trace event record, see :func:`trace_event_record`
+    """
+    if trans_val is None:
+        return (KIND_NONE, None, None, 0.0, 0.0, 0.0, False)
+    if "MSG" in action:
+        return (
+            KIND_MSG,
+            trans_val.msg_text(),
+            trans_val.msg_color,
+            trans_val.request_time,
+            trans_val.exec_time,
+            trans_val.flight_time,
+            trans_val.is_lost,
+        )
+    if action.startswith("T-"):
+        return (KIND_TIMER, None, None, trans_val.timeout, 0.0, 0.0, False)
+    if action == "STA":
+        return (
+            KIND_STATE,
+            trans_val.text,
+            trans_val.appearance,
+            0.0,
+            0.0,
+            0.0,
+            False,
+        )
+    return (KIND_VALUE, str(trans_val), None, 0.0, 0.0, 0.0, False)
+
+
+class TraceSink(abc.ABC):
+    """
+    Base class of the streaming trace sinks.
+
+    The sink subscribes to *sim*'s tracing on construction. It is closed
+    when the simulator stops, or by calling :meth:`close`.
+
+    Subclasses implement :meth:`_write_batch` and optionally :meth:`_open`
+    and :meth:`_write_end`. They are called from the writer thread.
+    The events are passed to :meth:`_write_batch` as records returned by
+    :attr:`_make_record`, by default :func:`trace_event_record`.
+
+    :param sim: Simulator instance
+    :param str file_name: output file name
+    :param int batch_size: number of events passed to the writer thread \
+        at once. The file is flushed after each batch
+    :param int max_pending: maximum number of batches waiting for the \
+        writer thread. If reached, the simulation waits for the writer
+    """
+
+    # function to convert a trace event into the record to write
+    _make_record = staticmethod(trace_event_record)
+
+    def __init__(self, sim, file_name, batch_size=1000, max_pending=16):
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        self.file_name = file_name
+        self._tracing = sim.tracing
+        self._batch_size = batch_size
+        self._batch = []
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self._closed = False
+        self._file = self._open(file_name)
+        self._thread = threading.Thread(
+            target=self._writer, name="moddy trace sink", daemon=True
+        )
+        self._thread.start()
+        self._tracing.subscribe(self)
+
+    def __call__(self, trace_ev):
+        batch = self._batch
+        batch.append(self._make_record(trace_ev))
+        if len(batch) >= self._batch_size:
+            self._pass_batch()
+
+    def _pass_batch(self):
+        if self._error is not None:
+            self._raise_error()
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def _raise_error(self):
+        error = self._error
+        self._error = None
+        raise RuntimeError(
+            "Trace sink %s failed: %s" % (self.file_name, error)
+        ) from error
+
+    def _writer(self):
+        """writer thread"""
+        file = self._file
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if isinstance(item, threading.Event):
+                item.set()  # all batches before have been written
+                continue
+            if self._error is not None:
+                continue  # discard, error is reported to the simulation
+            try:
+                self._write_batch(file, item)
+                file.flush()
+            except Exception as exc:  # pylint: disable=broad-except
+                self._error = exc
+
+    def flush(self):
+        """
+        Pass the collected events to the writer thread and wait until
+        they are written to the file
+
+        :raise RuntimeError: if writing to the file failed
+        """
+        if self._closed:
+            return
+        self._pass_batch()
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+        if self._error is not None:
+            self._raise_error()
+
+    def close(self):
+        """
+        Write all events to the file, stop the writer thread, close the file
+        and unsubscribe from the tracing.
+        Called automatically when the simulator stops.
+
+        :raise RuntimeError: if writing to the file failed
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._tracing.unsubscribe(self)
+        except ValueError:
+            pass
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            if self._error is None:
+                self._write_end(self._file)
+        except Exception as exc:  # pylint: disable=broad-except
+            self._error = exc
+        finally:
+            self._file.close()
+        if self._error is not None:
+            self._raise_error()
+
+    # called by SimTracing.finish() when the simulator stops
+    finish = close
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open(self, file_name):
+        """open and return output file"""
+        return create_dirs_and_open_output_file(file_name)
+
+    @abc.abstractmethod
+    def _write_batch(self, file, batch):
+        """write list of records returned by :func:`trace_event_record`"""
+
+    def _write_end(self, file):
+        """write end of file"""
+
+
+class JsonLinesTraceSink(TraceSink):
+    """
+    Trace sink that writes one JSON object per trace event and line.
+
+    Each object has the keys ``time``, ``action``, ``part`` and ``sub_obj``.
+    Depending on the event, it has also the keys:
+
+        * messages: ``value`` (message text), ``color``, ``request_time``, \
+            ``begin_time``, ``end_time``, ``flight_time``, ``lost``
+        * timers: ``timeout``
+        * state indicators: ``value`` (state text), ``appearance``
+        * others: ``value``
+
+    Times are in seconds. Parameters as for :class:`TraceSink`.
+    """
+
+    def _write_batch(self, file, batch):
+        dumps = json.JSONEncoder(default=str).encode
+        lines = []
+        for (
+            time,
+            action,
+            part,
+            sub_obj,
+            kind,
+            value,
+            extra,
+            request_time,
+            exec_time,
+            flight_time,
+            is_lost,
+        ) in batch:
+            obj = {
+                "time": time,
+                "action": action,
+                "part": part,
+                "sub_obj": sub_obj,
+            }
+            if kind == KIND_MSG:
+                obj["value"] = value
+                obj["color"] = extra
+                obj["request_time"] = request_time
+                obj["begin_time"] = exec_time - flight_time
+                obj["end_time"] = exec_time
+                obj["flight_time"] = flight_time
+                obj["lost"] = is_lost
+            elif kind == KIND_TIMER:
+                obj["timeout"] = request_time
+            elif kind == KIND_STATE:
+                obj["value"] = value
+                obj["appearance"] = extra
+            elif kind == KIND_VALUE:
+                obj["value"] = value
+            lines.append(dumps(obj))
+        lines.append("")
+        file.write("\n".join(lines))
+
+
+class CsvTraceSink(TraceSink):
+    """
+    Trace sink that writes a csv trace table with the same columns as
+    :func:`~.trace_to_csv.gen_trace_table`.
+
+    :param sim: Simulator instance
+    :param str file_name: output file name
+    :param str time_unit: time unit for all time stamps in table \
+        ('s', 'ms', 'us', 'ns')
+    :param str float_comma: Comma character for float numbers
+    :param kwargs: further arguments for :class:`TraceSink`
+    """
+
+    def __init__(
+        self, sim, file_name, time_unit="s", float_comma=",", **kwargs
+    ):
+        # pylint: disable=too-many-arguments
+        self._time_unit_factor = time_unit_to_factor(time_unit)
+        self._float_comma = float_comma
+        self._csv_writer = None
+        super().__init__(sim, file_name, **kwargs)
+
+    def _open(self, file_name):
+        from .trace_to_csv import CSV_FORMAT, CSV_HEADER
+
+        file = create_dirs_and_open_output_file(file_name)
+        self._csv_writer = csv.writer(file, **CSV_FORMAT)
+        self._csv_writer.writerow(CSV_HEADER)
+        return file
+
+    def _time_fmt(self, time):
+        return ("%.6f" % (time / self._time_unit_factor)).replace(
+            ".", self._float_comma
+        )
+
+    def _write_batch(self, file, batch):
+        time_fmt = self._time_fmt
+        rows = []
+        for (
+            time,
+            action,
+            part,
+            sub_obj,
+            kind,
+            value,
+            _,
+            request_time,
+            exec_time,
+            flight_time,
+            is_lost,
+        ) in batch:
+            row = [
+                time_fmt(time),
+                action,
+                "Global" if part is None else part,
+                "" if sub_obj is None else sub_obj,
+            ]
+            if kind == KIND_MSG:
+                row += [
+                    "(***LOST***)" if is_lost else value,
+                    time_fmt(request_time),
+                    time_fmt(exec_time - flight_time),
+                    time_fmt(exec_time),
+                    time_fmt(flight_time),
+                ]
+            elif kind == KIND_TIMER:
+                row.append(time_fmt(request_time))
+            elif kind == KIND_NONE:
+                row.append("")
+            else:
+                row.append(value)
+            rows.append(row)
+        self._csv_writer.writerows(rows)
+
+
+# Binary trace file format:
+#
+#   file header
+#   chunks. Each chunk contains the strings and elements that are new in
+#       the chunk, and the records of the events of one batch
+#   index with one entry per chunk, written when the sink is closed
+#   footer with the offset of the index
+#
+# Strings (actions, names, values) and elements (parts, ports, timers,
+# watched variables) are numbered in the order they appear in the file,
+# starting with 0. -1 stands for None.
+# The index tells the number of the first string and element of each
+# chunk, so the chunk that defines a string or element is found by
+# bisection, and only its tables are read.
+# Without index (e.g. after a crash), the chunks are found by following
+# the chunk headers, which have the number of strings and elements.
+BINARY_MAGIC = b"MODDYTRC"
+BINARY_VERSION = 2
+# magic, version, record size
+BINARY_FILE_HEADER = struct.Struct("<8sHH")
+# tag, size of strings in bytes, number of strings, number of elements,
+# number of records, time of first and last record
+BINARY_CHUNK_HEADER = struct.Struct("<4sIIIIdd")
+BINARY_CHUNK_TAG = b"CHNK"
+# each string: length, followed by the utf-8 encoded string
+BINARY_STRING_LEN = struct.Struct("<I")
+# hierarchy name string, type string, parent element, color string, is_part
+BINARY_ELEMENT = struct.Struct("<iiiiB3x")
+# time, request_time (or timeout), exec_time, flight_time,
+# action string, part element, sub_obj element, value string, extra string,
+# port element of messages, kind (bits 0..6) and is_lost (bit 7)
+BINARY_RECORD = struct.Struct("<ddddiiiiiiB3x")
+# tag, number of entries
+BINARY_INDEX_HEADER = struct.Struct("<4sI")
+BINARY_INDEX_TAG = b"INDX"
+# chunk offset, number of the first record, time of first and last record,
+# number of the first string and of the first element defined in the chunk
+BINARY_INDEX_ENTRY = struct.Struct("<QQddII")
+# index offset, magic
+BINARY_FOOTER = struct.Struct("<Q8s")
+BINARY_FOOTER_MAGIC = b"MODDYIDX"
+
+
+class _ElementDef(tuple):
+    """element definition in a batch of the binary trace sink"""
+
+    __slots__ = ()
+
+
+class BinaryTraceSink(TraceSink):
+    """
+    Trace sink that writes a compact binary trace file.
+
+    Each event is stored as a fixed size record. Actions and transport value
+    texts are stored once in a string table, parts, ports, timers and
+    watched variables once in an element table. The events are written in
+    chunks of *batch_size* events. When the sink is closed, an index of the
+    chunks with their time ranges is appended.
+    A file of a crashed simulation can be read up to the last complete
+    chunk.
+
+    Use :class:`~.trace_file.BinaryTraceReader` to read the file.
+    Parameters as for :class:`TraceSink`.
+    """
+
+    def __init__(self, sim, file_name, **kwargs):
+        self._sim = sim
+        # model element -> element number. Assigned in the simulation thread
+        self._elem_ids = {}
+        # string -> string number. Assigned in the writer thread
+        self._strings = {None: -1}
+        self._num_records = 0
+        self._num_elements = 0  # number of element definitions written
+        self._last_time = 0.0
+        self._index = []
+        super().__init__(sim, file_name, **kwargs)
+
+    def _open(self, file_name):
+        if os.path.dirname(file_name) != "":
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        file = open(file_name, "wb")
+        file.write(
+            BINARY_FILE_HEADER.pack(
+                BINARY_MAGIC, BINARY_VERSION, BINARY_RECORD.size
+            )
+        )
+        return file
+
+    def _elem_id(self, elem):
+        """
+        return number of *elem*. Add the definition of new elements to
+        the batch
+        """
+        if elem is None:
+            return -1
+        try:
+            return self._elem_ids[elem]
+        except KeyError:
+            parent_id = self._elem_id(elem.parent_obj)
+            elem_id = self._elem_ids[elem] = len(self._elem_ids)
+            self._batch.append(
+                _ElementDef(
+                    (
+                        elem.hierarchy_name(),
+                        elem.type_str,
+                        parent_id,
+                        getattr(elem, "color", None),
+                        isinstance(elem, SimPart),
+                    )
+                )
+            )
+            return elem_id
+
+    def __call__(self, trace_ev):
+        elem_id = self._elem_id
+        if not self._elem_ids:
+            # define all parts first, so that the reader knows also the
+            # parts without events, in the order of the model
+            for part in self._sim.parts_mgr.walk_parts():
+                elem_id(part)
+
+        trans_val = trace_ev.trans_val
+        action = trace_ev.action
+        part_id = elem_id(trace_ev.part)
+        sub_obj_id = elem_id(trace_ev.sub_obj)
+        port_id = -1
+        if trans_val is not None and "MSG" in action:
+            port_id = elem_id(trans_val.port)
+        record = (
+            (
+                trace_ev.trace_time,
+                action,
+                part_id,
+                sub_obj_id,
+            )
+            + _trans_val_fields(action, trans_val)
+            + (port_id,)
+        )
+
+        batch = self._batch
+        batch.append(record)
+        if len(batch) >= self._batch_size:
+            self._pass_batch()
+
+    def _string_num(self, text, new_strings):
+        try:
+            return self._strings[text]
+        except KeyError:
+            num = self._strings[text] = len(self._strings) - 1
+            new_strings.append(text)
+            return num
+
+    def _write_batch(self, file, batch):
+        string_num = self._string_num
+        new_strings = []
+        elements = []
+        records = []
+        pack = BINARY_RECORD.pack
+        for item in batch:
+            if type(item) is _ElementDef:  # pylint: disable=C0123
+                name, type_str, parent_id, color, is_part = item
+                elements.append(
+                    BINARY_ELEMENT.pack(
+                        string_num(name, new_strings),
+                        string_num(type_str, new_strings),
+                        parent_id,
+                        string_num(
+                            None if color is None else str(color),
+                            new_strings,
+                        ),
+                        is_part,
+                    )
+                )
+                continue
+
+            (
+                time,
+                action,
+                part_id,
+                sub_obj_id,
+                kind,
+                value,
+                extra,
+                request_time,
+                exec_time,
+                flight_time,
+                is_lost,
+                port_id,
+            ) = item
+            if extra is not None:
+                if kind == KIND_STATE:
+                    extra = json.dumps(extra, default=str, sort_keys=True)
+                else:
+                    extra = str(extra)
+            records.append(
+                pack(
+                    time,
+                    request_time,
+                    exec_time,
+                    flight_time,
+                    string_num(action, new_strings),
+                    part_id,
+                    sub_obj_id,
+                    string_num(value, new_strings),
+                    string_num(extra, new_strings),
+                    port_id,
+                    kind | (0x80 if is_lost else 0),
+                )
+            )
+            self._last_time = time
+
+        string_data = []
+        for text in new_strings:
+            data = text.encode("utf-8")
+            string_data.append(BINARY_STRING_LEN.pack(len(data)))
+            string_data.append(data)
+        string_data = b"".join(string_data)
+
+        if records:
+            first_time = BINARY_RECORD.unpack_from(records[0])[0]
+        else:
+            first_time = self._last_time
+        self._index.append(
+            BINARY_INDEX_ENTRY.pack(
+                file.tell(),
+                self._num_records,
+                first_time,
+                self._last_time,
+                len(self._strings) - 1 - len(new_strings),
+                self._num_elements,
+            )
+        )
+        self._num_records += len(records)
+        self._num_elements += len(elements)
+        file.write(
+            BINARY_CHUNK_HEADER.pack(
+                BINARY_CHUNK_TAG,
+                len(string_data),
+                len(new_strings),
+                len(elements),
+                len(records),
+                first_time,
+                self._last_time,
+            )
+        )
+        file.write(string_data)
+        file.write(b"".join(elements))
+        file.write(b"".join(records))
+
+    def _write_end(self, file):
+        index_offset = file.tell()
+        file.write(
+            BINARY_INDEX_HEADER.pack(BINARY_INDEX_TAG, len(self._index))
+        )
+        file.write(b"".join(self._index))
+        file.write(BINARY_FOOTER.pack(index_offset, BINARY_FOOTER_MAGIC))
@@ -0,0 +1,373 @@
+"""
+:mod:`trace_to_chrome` -- Export simulator trace to Chrome trace format
+=======================================================================
+
+.. module:: trace_to_chrome
+   :synopsis: Export simulator trace to the Chrome Trace Event format
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+Writes the trace as Chrome Trace Event JSON file, which can be opened
+with trace viewers that handle millions of events, e.g.
+https://ui.perfetto.dev or ``chrome://tracing``.
+
+    * each part is a track
+    * state indicators are slices on the part's track. This includes the \
+        busy periods of virtual threads, see :meth:`~.VThread.busy`
+    * messages are flows from the sender to the receiver. The send and \
+        receive points are short slices on the sender's and receiver's \
+        tracks
+    * watched variables with numeric values are counters
+    * annotations and assertion failures are instant events
+
+The events are written one after each other, so the trace doesn't need
+to be in memory: :func:`gen_chrome_trace` reads the recorded events, or
+those of a binary trace file, and :class:`ChromeTraceSink` writes the
+events while the simulation runs.
+"""
+import json
+
+from .trace_sinks import (
+    KIND_MSG,
+    KIND_STATE,
+    KIND_TIMER,
+    TraceSink,
+    trace_event_record,
+)
+from .utils import create_dirs_and_open_output_file
+
+# process id of all events
+_PID = 1
+
+
+def gen_chrome_trace(sim, file_name, include_timers=False):
+    """
+    Moddy high level function to create a Chrome Trace Event file.
+
+    :param sim: Simulator instance, or an object with the same trace \
+        interface, e.g. :class:`~.trace_file.BinaryTraceReader`
+    :param file_name: output filename (including .json)
+    :param bool include_timers: include timer events as instant events
+    """
+    file = create_dirs_and_open_output_file(file_name)
+    with file:
+        writer = ChromeTraceWriter(file, include_timers)
+        batch = []
+        for trace_ev in sim.tracing.traced_events():
+            batch.append(chrome_trace_record(trace_ev))
+            if len(batch) >= 1000:
+                writer.write_records(batch)
+                batch = []
+        writer.write_records(batch)
+        writer.write_end()
+    print("saved chrome trace to %s" % file_name)
+
+
+def chrome_trace_record(trace_ev):
+    """
+    Convert a trace event into a trace event record (see
+    :func:`~.trace_sinks.trace_event_record`) with the hierarchy name of
+    the receiving part as additional field. The receiving part is None
+    except for ``<MSG`` events.
+    """
+    receiver = None
+    if trace_ev.action == "<MSG":
+        receiver = trace_ev.sub_obj.parent_obj.hierarchy_name()
+    return trace_event_record(trace_ev) + (receiver,)
+
+
+class ChromeTraceSink(TraceSink):
+    """
+    Trace sink that writes a Chrome Trace Event file while the simulation
+    runs.
+
+    :param sim: Simulator instance
+    :param str file_name: output file name (including .json)
+    :param bool include_timers: include timer events as instant events
+    :param kwargs: further arguments for :class:`~.trace_sinks.TraceSink`
+    """
+
+    _make_record = staticmethod(chrome_trace_record)
+
+    def __init__(self, sim, file_name, include_timers=False, **kwargs):
+        self._include_timers = include_timers
+        self._chrome_writer = None
+        super().__init__(sim, file_name, **kwargs)
+
+    def _open(self, file_name):
+        file = create_dirs_and_open_output_file(file_name)
+        self._chrome_writer = ChromeTraceWriter(file, self._include_timers)
+        return file
+
+    def _write_batch(self, file, batch):
+        self._chrome_writer.write_records(batch)
+
+    def _write_end(self, file):
+        self._chrome_writer.write_end()
+
+
+class ChromeTraceWriter:
+    """
+    Write trace event records with the receiving part (see
+    :func:`chrome_trace_record`) as Chrome Trace Events to *file*.
+
+    :param file: file opened for writing
+    :param bool include_timers: include timer events as instant events
+    """
+
+    def __init__(self, file, include_timers=False):
+        self._file = file
+        self._include_timers = include_timers
+        self._encode = json.JSONEncoder(default=str).encode
+        # part name -> thread id
+        self._tids = {}
+        # thread id -> name of open state slice
+        self._open_slices = {}
+        self._last_ts = 0.0
+        self._num_flows = 0
+        self._file.write('{"displayTimeUnit": "ns", "traceEvents": [\n')
+        self._first = True
+
+    def _tid(self, part, events):
+        """ return thread id of part, add track to *events* if new """
+        if part is None:
+            part = "Global"
+        tid = self._tids.get(part)
+        if tid is None:
+            tid = self._tids[part] = len(self._tids) + 1
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_name",
+                    "pid": _PID,
+                    "tid": tid,
+                    "args": {"name": part},
+                }
+            )
+            events.append(
+                {
+                    "ph": "M",
+                    "name": "thread_sort_index",
+                    "pid": _PID,
+                    "tid": tid,
+                    "args": {"sort_index": tid},
+                }
+            )
+        return tid
+
+    @staticmethod
+    def _element_name(sub_obj):
+        """ return hierarchy name of *sub_obj* without the type """
+        return (
+            sub_obj[: sub_obj.rfind("(")] if sub_obj.endswith(")") else sub_obj
+        )
+
+    def write_records(self, records):
+        """ write list of trace event records """
+        events = []
+        for (
+            time,
+            action,
+            part,
+            sub_obj,
+            kind,
+            value,
+            extra,
+            request_time,
+            exec_time,
+            flight_time,
+            is_lost,
+            receiver,
+        ) in records:
+            ts = time * 1e6
+            self._last_ts = ts
+            if kind == KIND_MSG:
+                if action == "<MSG":
+                    self._message(
+                        events,
+                        part,
+                        receiver,
+                        sub_obj,
+                        value,
+                        request_time,
+                        exec_time,
+                        flight_time,
+                        is_lost,
+                    )
+            elif kind == KIND_STATE:
+                self._state(events, ts, self._tid(part, events), value, extra)
+            elif action == "VC":
+                self._var_change(events, ts, part, sub_obj, value)
+            elif action in ("ANN", "ASSFAIL"):
+                events.append(
+                    {
+                        "ph": "i",
+                        "s": "t",
+                        "name": (
+                            value if action == "ANN" else "ASSFAIL: %s" % value
+                        ),
+                        "cat": action,
+                        "pid": _PID,
+                        "tid": self._tid(part, events),
+                        "ts": ts,
+                    }
+                )
+            elif kind == KIND_TIMER:
+                if self._include_timers:
+                    events.append(
+                        {
+                            "ph": "i",
+                            "s": "t",
+                            "name": "%s %s"
+                            % (action, self._element_name(sub_obj or "")),
+                            "cat": "timer",
+                            "pid": _PID,
+                            "tid": self._tid(part, events),
+                            "ts": ts,
+                        }
+                    )
+        self._write(events)
+
+    def _message(
+        self,
+        events,
+        part,
+        receiver,
+        sub_obj,
+        text,
+        request_time,
+        exec_time,
+        flight_time,
+        is_lost,
+    ):
+        # pylint: disable=too-many-arguments
+        in_port = self._element_name(sub_obj)
+        snd_tid = self._tid(part, events)
+        rcv_tid = self._tid(receiver, events)
+        begin = (exec_time - flight_time) * 1e6
+        end = exec_time * 1e6
+        args = {
+            "to": in_port,
+            "request_time": request_time,
+            "flight_time": flight_time,
+        }
+        if is_lost:
+            args["lost"] = True
+        events.append(
+            {
+                "ph": "X",
+                "name": text,
+                "cat": "msg",
+                "pid": _PID,
+                "tid": snd_tid,
+                "ts": begin,
+                "dur": 0,
+                "args": args,
+            }
+        )
+        if is_lost:
+            return
+        events.append(
+            {
+                "ph": "X",
+                "name": text,
+                "cat": "msg",
+                "pid": _PID,
+                "tid": rcv_tid,
+                "ts": end,
+                "dur": 0,
+                "args": args,
+            }
+        )
+        flow_id = self._num_flows
+        self._num_flows += 1
+        events.append(
+            {
+                "ph": "s",
+                "id": flow_id,
+                "name": "msg",
+                "cat": "msg",
+                "pid": _PID,
+                "tid": snd_tid,
+                "ts": begin,
+            }
+        )
+        events.append(
+            {
+                "ph": "f",
+                "bp": "e",
+                "id": flow_id,
+                "name": "msg",
+                "cat": "msg",
+                "pid": _PID,
+                "tid": rcv_tid,
+                "ts": end,
+            }
+        )
+
+    def _state(self, events, ts, tid, text, appearance):
+        # pylint: disable=too-many-arguments
+        if tid in self._open_slices:
+            events.append({"ph": "E", "pid": _PID, "tid": tid, "ts": ts})
+            del self._open_slices[tid]
+        if text:
+            event = {
+                "ph": "B",
+                "name": text,
+                "cat": "state",
+                "pid": _PID,
+                "tid": tid,
+                "ts": ts,
+            }
+            if appearance:
+                event["args"] = appearance
+            events.append(event)
+            self._open_slices[tid] = text
+
+    def _var_change(self, events, ts, part, sub_obj, value):
+        # pylint: disable=too-many-arguments
+        name = self._element_name(sub_obj or "")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            events.append(
+                {
+                    "ph": "i",
+                    "s": "t",
+                    "name": "%s=%s" % (name, value),
+                    "cat": "VC",
+                    "pid": _PID,
+                    "tid": self._tid(part, events),
+                    "ts": ts,
+                }
+            )
+        else:
+            events.append(
+                {
+                    "ph": "C",
+                    "name": name,
+                    "pid": _PID,
+                    "ts": ts,
+                    "args": {"value": number},
+                }
+            )
+
+    def _write(self, events):
+        if not events:
+            return
+        encode = self._encode
+        text = ",\n".join(encode(event) for event in events)
+        if not self._first:
+            text = ",\n" + text
+        self._first = False
+        self._file.write(text)
+
+    def write_end(self):
+        """ end the open state slices and write the end of the file """
+        self._write(
+            [
+                {"ph": "E", "pid": _PID, "tid": tid, "ts": self._last_ts}
+                for tid in self._open_slices
+            ]
+        )
+        self._open_slices = {}
+        self._file.write("\n]}\n")
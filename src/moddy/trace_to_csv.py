@@ -12,6 +12,29 @@ import csv
 from .sim_base import time_unit_to_factor
 from .utils import create_dirs_and_open_output_file
 
+# arguments for csv.writer
+CSV_FORMAT = dict(
+    delimiter=";",
+    quotechar='"',
+    doublequote=True,
+    skipinitialspace=True,
+    lineterminator="\n",
+    quoting=csv.QUOTE_MINIMAL,
+)
+
+# comment row
+CSV_HEADER = [
+    "#time",
+    "Action",
+    "Object",
+    "Port/Tmr",
+    "Value",
+    "requestTime",
+    "startTime",
+    "endTime",
+    "flightTime",
+]
+
 
 def gen_trace_table(sim, file_name, **kwargs):
     """
@@ -50,31 +73,12 @@ class TraceToCsv:
         """ save the trace file """
         trace_file = create_dirs_and_open_output_file(file_name)
 
-        csv.register_dialect(
-            "mydialect",
-            delimiter=";",
-            quotechar='"',
-            doublequote=True,
-            skipinitialspace=True,
-            lineterminator="\n",
-            quoting=csv.QUOTE_MINIMAL,
-        )
+        csv.register_dialect("mydialect", **CSV_FORMAT)
 
         writer = csv.writer(trace_file, dialect="mydialect")
 
         # Write Comment row
-        row = [
-            "#time",
-            "Action",
-            "Object",
-            "Port/Tmr",
-            "Value",
-            "requestTime",
-            "startTime",
-            "endTime",
-            "flightTime",
-        ]
-        writer.writerow(row)
+        writer.writerow(CSV_HEADER)
 
         for trace_ev in self._ev_list:
             row = [self._time_fmt(trace_ev.trace_time), trace_ev.action]
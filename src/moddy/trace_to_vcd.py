@@ -0,0 +1,237 @@
+"""
+:mod:`trace_to_vcd` -- Export watched variables and states to VCD
+=================================================================
+
+.. module:: trace_to_vcd
+   :synopsis: Export watched variables and state indicators to VCD
+.. moduleauthor:: Klaus Popp <klauspopp@gmx.de>
+
+Writes the changes of watched variables (``VC`` events) and state
+indicators (``STA`` events) as signals of a Value Change Dump file, which
+can be viewed with waveform viewers such as GTKWave or Surfer.
+
+    * each part is a scope. The scopes are nested like the parts
+    * each watched variable is a signal in the scope of its part, \
+        named like the variable, e.g. ``obj.a``
+    * the state indicator of a part is the signal ``state`` in the scope \
+        of the part
+    * characters other than letters, digits, ``_`` and ``$`` in scope \
+        and signal names (and ``.`` in signal names) are replaced by \
+        ``_``, e.g. the scope of part ``node[0]`` is ``node_0_``
+    * variables whose values are all numbers are ``real`` signals, \
+        with ``x`` while the value is empty. Other variables and the state \
+        indicators are ``string`` signals, where blanks are replaced by \
+        ``_`` and an empty value is shown as ``-``
+
+The header of a VCD file declares all signals, but the signals are known
+only after the last event. So the value changes are written to a
+temporary file, which is appended to the header at the end. Neither the
+trace nor the changes need to be in memory: :func:`gen_vcd` reads the
+recorded events, or those of a binary trace file, and
+:class:`VcdTraceSink` writes the changes while the simulation runs.
+"""
+import re
+import shutil
+import tempfile
+
+from .sim_base import time_unit_to_factor
+from .trace_sinks import KIND_STATE, TraceSink, trace_event_record
+from .utils import create_dirs_and_open_output_file
+from .version import VERSION
+
+# first character and number of characters of VCD identifiers
+_ID_FIRST = 33
+_ID_NUM = 126 - 33 + 1
+
+# characters that are not allowed in scope and signal names
+_ILLEGAL_SCOPE_CHARS = re.compile(r"[^\w$]")
+_ILLEGAL_VAR_CHARS = re.compile(r"[^\w$.]")
+
+
+def gen_vcd(sim, file_name, time_unit="ns"):
+    """
+    Moddy high level function to create a VCD file.
+
+    :param sim: Simulator instance, or an object with the same trace \
+        interface, e.g. :class:`~.trace_file.BinaryTraceReader`
+    :param file_name: output filename (including .vcd)
+    :param time_unit: time resolution of the file \
+        ('s', 'ms', 'us', 'ns')
+    """
+    file = create_dirs_and_open_output_file(file_name)
+    with file:
+        writer = VcdWriter(file, time_unit)
+        batch = []
+        for trace_ev in sim.tracing.traced_events():
+            if trace_ev.action in ("VC", "STA"):
+                batch.append(trace_event_record(trace_ev))
+                if len(batch) >= 1000:
+                    writer.write_records(batch)
+                    batch = []
+        writer.write_records(batch)
+        writer.write_end()
+    print("saved vcd to %s" % file_name)
+
+
+class VcdTraceSink(TraceSink):
+    """
+    Trace sink that writes the watched variables and state indicators to
+    a VCD file while the simulation runs.
+
+    :param sim: Simulator instance
+    :param str file_name: output file name (including .vcd)
+    :param time_unit: time resolution of the file ('s', 'ms', 'us', 'ns')
+    :param kwargs: further arguments for :class:`~.trace_sinks.TraceSink`
+    """
+
+    def __init__(self, sim, file_name, time_unit="ns", **kwargs):
+        self._time_unit = time_unit
+        self._vcd_writer = None
+        super().__init__(sim, file_name, **kwargs)
+
+    def _open(self, file_name):
+        file = create_dirs_and_open_output_file(file_name)
+        self._vcd_writer = VcdWriter(file, self._time_unit)
+        return file
+
+    def _write_batch(self, file, batch):
+        self._vcd_writer.write_records(batch)
+
+    def _write_end(self, file):
+        self._vcd_writer.write_end()
+
+
+class VcdWriter:
+    """
+    Write the ``VC`` and ``STA`` events of trace event records (see
+    :func:`~.trace_sinks.trace_event_record`) as VCD to *file*. Other
+    events are ignored.
+
+    :param file: file opened for writing
+    :param time_unit: time resolution of the file ('s', 'ms', 'us', 'ns')
+    """
+
+    def __init__(self, file, time_unit="ns"):
+        self._file = file
+        self._time_unit = time_unit.lower()
+        self._time_factor = time_unit_to_factor(time_unit)
+        # value changes without the header
+        self._changes = tempfile.TemporaryFile(
+            "w+", encoding="utf-8", newline="\n"
+        )
+        # (part name, variable name) -> VCD identifier
+        self._ids = {}
+        # VCD identifiers of variables with values other than numbers
+        self._string_ids = set()
+        self._state_ids = set()
+        # VCD identifier -> last value
+        self._values = {}
+        self._last_time = None
+
+    def _id(self, part, var_name):
+        """ return the VCD identifier of variable *var_name* of *part* """
+        name = (part, var_name)
+        ident = self._ids.get(name)
+        if ident is None:
+            num = len(self._ids)
+            ident = ""
+            while True:
+                ident += chr(_ID_FIRST + num % _ID_NUM)
+                num //= _ID_NUM
+                if not num:
+                    break
+            self._ids[name] = ident
+        return ident
+
+    @staticmethod
+    def _string(text):
+        """ return *text* as VCD string value """
+        return "_".join(text.split()) or "-"
+
+    def write_records(self, records):
+        """ write the changes of a list of trace event records """
+        lines = []
+        for time, action, part, sub_obj, kind, value, *_ in records:
+            if kind == KIND_STATE:
+                ident = self._id(part or "Global", "state")
+                self._state_ids.add(ident)
+                value = "s" + self._string(value)
+            elif action == "VC":
+                # variable name relative to the part, e.g. "obj.a"
+                var_name = sub_obj[: sub_obj.rfind("(")]
+                if part and var_name.startswith(part + "."):
+                    prefix_len = len(part) + 1
+                    var_name = var_name[prefix_len:]
+                ident = self._id(part, var_name)
+                if ident not in self._string_ids and value:
+                    try:
+                        float(value)
+                    except ValueError:
+                        self._string_ids.add(ident)
+                # type is decided in write_end
+                value = "?" + self._string(value)
+            else:
+                continue
+            if self._values.get(ident) == value:
+                continue
+            self._values[ident] = value
+            vcd_time = round(time / self._time_factor)
+            if vcd_time != self._last_time:
+                lines.append("#%d" % vcd_time)
+                self._last_time = vcd_time
+            lines.append(value + " " + ident)
+        if lines:
+            lines.append("")
+            self._changes.write("\n".join(lines))
+
+    def _write_header(self):
+        file = self._file
+        file.write("$version Moddy %s $end\n" % VERSION)
+        file.write("$timescale 1%s $end\n" % self._time_unit)
+        # scope tree: name -> (sub scopes, [(var name, identifier)])
+        top = ({}, [])
+        for (part, var_name), ident in self._ids.items():
+            scope = top
+            for scope_name in part.split(".") if part else ():
+                scope_name = _ILLEGAL_SCOPE_CHARS.sub("_", scope_name)
+                scope = scope[0].setdefault(scope_name, ({}, []))
+            scope[1].append((_ILLEGAL_VAR_CHARS.sub("_", var_name), ident))
+
+        def write_scope(scope):
+            for var_name, ident in scope[1]:
+                if ident in self._state_ids or ident in self._string_ids:
+                    file.write(
+                        "$var string 1 %s %s $end\n" % (ident, var_name)
+                    )
+                else:
+                    file.write("$var real 64 %s %s $end\n" % (ident, var_name))
+            for scope_name, sub_scope in scope[0].items():
+                file.write("$scope module %s $end\n" % scope_name)
+                write_scope(sub_scope)
+                file.write("$upscope $end\n")
+
+        write_scope(top)
+        file.write("$enddefinitions $end\n")
+
+    def write_end(self):
+        """ write the header and the changes to the file """
+        self._write_header()
+        changes = self._changes
+        changes.seek(0)
+        string_ids = self._string_ids
+        if len(self._state_ids) == len(self._ids):
+            # no watched variables
+            shutil.copyfileobj(changes, self._file)
+        else:
+            write = self._file.write
+            for line in changes:
+                if line[0] == "?":
+                    value, ident = line[1:].split(" ")
+                    if ident[:-1] in string_ids:
+                        line = "s" + line[1:]
+                    elif value == "-":
+                        line = "x" + ident
+                    else:
+                        line = "r" + line[1:]
+                write(line)
+        changes.close()
@@ -57,6 +57,12 @@ class TestTraceSearch(unittest.TestCase):
         rv = ts.find_ann("Bob", "*Fine", 15)
         self.assertEqual(rv[0], 34)
         self.assertEqual(rv[1].trans_val, "got message Fine")
+        # case-sensitive
+        self.assertIsNone(ts.find_ann("Bob", "*fine", 15))
+
+        # any part
+        rv = ts.find_event(None, 0, ts.tv_str_match, ("ANN", "*Fine"))
+        self.assertEqual(rv[0], 34)
 
     def test_find_sta(self):
         ts = self.ts
@@ -90,6 +96,56 @@ class TestTraceSearch(unittest.TestCase):
         rv = ts.find_ass_fail("Joe", None, 0)
         self.assertEqual(rv, None)
 
+    def test_find_all(self):
+        ts = self.ts
+
+        anns = list(ts.find_all("ANN", "Bob"))
+        self.assertEqual([idx for idx, _ in anns], [16, 34])
+        self.assertEqual(ts.count("ANN", "Bob"), 2)
+        self.assertEqual(ts.count("ANN", "Bob", "*Fine"), 1)
+        self.assertEqual(ts.count("ANN"), ts.count("ANN", "Bob") + 2)
+        self.assertEqual(ts.count("NOSUCHACTION"), 0)
+
+        # same results as the linear search
+        for action, find_func in (
+            ("<MSG", ts.find_rcv_msg),
+            (">MSG", ts.find_snd_msg),
+            ("STA", ts.find_sta),
+        ):
+            for part in ("Bob", "Joe"):
+                found = [idx for idx, _ in ts.find_all(action, part)]
+                linear = []
+                rv = find_func(part, None, 0)
+                while rv is not None:
+                    linear.append(rv[0])
+                    rv = find_func(part, None)
+                self.assertEqual(found, linear)
+                self.assertGreater(len(found), 0)
+
+        # time range
+        all_msgs = list(ts.find_all("<MSG"))
+        msgs = list(ts.find_all("<MSG", t_from=3.0, t_to=8.0))
+        self.assertEqual(
+            msgs, [m for m in all_msgs if 3.0 <= m[1].trace_time <= 8.0]
+        )
+        self.assertEqual(ts.count("<MSG", t_from=3.0, t_to=8.0), len(msgs))
+        self.assertLess(len(msgs), len(all_msgs))
+        idx = ts.index_of_time(3.0)
+        self.assertGreaterEqual(ts.traced_events[idx].trace_time, 3.0)
+        self.assertLess(ts.traced_events[idx - 1].trace_time, 3.0)
+
+        with self.assertRaises(ValueError):
+            ts.count("ANN", "Nobody")
+
+    def test_index_update(self):
+        ts = self.ts
+        self.assertEqual(ts.count("ANN", "Bob"), 2)
+        bob = self.simu.parts_mgr.find_part_by_name("Bob")
+        self.simu.tracing.annotation(bob, "late")
+        self.assertEqual(ts.count("ANN", "Bob"), 3)
+        idx, _ = ts.find_ann("Bob", "late", 0)
+        self.assertEqual(idx, len(ts.traced_events) - 1)
+
     @staticmethod
     def bob_prog(self: moddy.VSimpleProg):
         # bob starts talking
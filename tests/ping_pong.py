@@ -0,0 +1,59 @@
+"""
+@author: klauspopp@gmx.de
+
+Ping pong model used by the trace tests
+"""
+
+import moddy
+
+
+class PingPong(moddy.SimPart):
+    """
+    Part that returns each message received on its IO port *port*.
+    The part named "Ping" sends the first message at time 1.
+
+    Subclasses add trace events for a received message in :meth:`got_msg`.
+
+    :param delay: function that returns the flight time of the returned \
+        message from the number of received messages
+    """
+
+    def __init__(self, sim, obj_name, delay=lambda _: 1):
+        super().__init__(
+            sim=sim, obj_name=obj_name, elems={"io": "port", "tmr": "tmr"}
+        )
+        self.delay = delay
+        self.received = 0
+
+    def start_sim(self):
+        if self.obj_name() == "Ping":
+            self.tmr.start(1)
+
+    def tmr_expired(self, _):
+        self.port.send("ping", 1)
+
+    def port_recv(self, _, msg):
+        self.received += 1
+        self.got_msg()
+        self.port.send(msg, self.delay(self.received))
+
+    def got_msg(self):
+        """ called for each received message before it is returned """
+
+
+def ping_pong_model(part_class=PingPong, pong_delay=None):
+    """
+    Create a simulator with the parts "Ping" and "Pong" of *part_class*
+    and bind their ports
+
+    :param pong_delay: *delay* of "Pong", default that of *part_class*
+    :return: the simulator
+    """
+    simu = moddy.Sim()
+    part_class(simu, "Ping")
+    if pong_delay is None:
+        part_class(simu, "Pong")
+    else:
+        part_class(simu, "Pong", pong_delay)
+    simu.smart_bind([["Ping.port", "Pong.port"]])
+    return simu
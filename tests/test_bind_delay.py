@@ -0,0 +1,79 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import unittest
+import moddy
+
+from tests.utils import searchInMsg, searchAnn, searchTrc
+
+
+class TestBindDelay(unittest.TestCase):
+    class Producer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim, obj_name=obj_name, elems={"out": "port", "tmr": "tmr"}
+            )
+
+        def start_sim(self):
+            self.tmr.start(1)
+
+        def tmr_expired(self, _):
+            self.port.send("hello", 2)
+            self.port.send("world", 2)
+
+    class Consumer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(sim=sim, obj_name=obj_name, elems={"in": "port"})
+            self.port.set_msg_started_func(self.port_recv_start)
+
+        def port_recv(self, _, msg):
+            self.annotation("got " + msg)
+
+        def port_recv_start(self, _, msg, out_port, flight_time):
+            self.annotation("start " + msg)
+
+    def test_bind_delay(self):
+        simu = moddy.Sim()
+        prod = self.Producer(simu, "Prod")
+        cons1 = self.Consumer(simu, "Cons1")
+        cons2 = self.Consumer(simu, "Cons2")
+
+        simu.smart_bind([["Prod.port", "Cons1.port"]])
+        simu.smart_bind([["Prod.port", "Cons2.port"]], delay=0.5)
+
+        self.assertEqual(prod.port.bind_delay(cons1.port), 0)
+        self.assertEqual(prod.port.bind_delay(cons2.port), 0.5)
+
+        simu.run(stop_time=100)
+        trc = simu.tracing.traced_events()
+
+        # undelayed binding
+        self.assertEqual(searchAnn(trc, 1.0, cons1), "start hello")
+        self.assertEqual(searchInMsg(trc, 3.0, cons1.port), "hello")
+        self.assertEqual(searchInMsg(trc, 5.0, cons1.port), "world")
+
+        # delayed binding. Second message is not delayed further, because
+        # the output port is not blocked by the propagation delay
+        self.assertEqual(searchAnn(trc, 1.5, cons2), "start hello")
+        self.assertEqual(searchInMsg(trc, 3.5, cons2.port), "hello")
+        self.assertEqual(
+            {searchAnn(trc, 3.5, cons2, n) for n in (1, 2)},
+            {"got hello", "start world"},
+        )
+        self.assertEqual(searchInMsg(trc, 5.5, cons2.port), "world")
+        self.assertEqual(searchAnn(trc, 5.5, cons2), "got world")
+
+        # no intermediate trace events
+        self.assertEqual(len([te for te in trc if te.action == "<MSG"]), 4)
+        self.assertIsNone(searchTrc(trc, 3.0, cons2.port, "<MSG"))
+
+    def test_negative_delay(self):
+        simu = moddy.Sim()
+        prod = self.Producer(simu, "Prod")
+        cons = self.Consumer(simu, "Cons")
+        with self.assertRaises(ValueError):
+            prod.port.bind(cons.port, delay=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
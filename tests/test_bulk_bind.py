@@ -0,0 +1,106 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import re
+import unittest
+import moddy
+
+
+class TestBulkBind(unittest.TestCase):
+    class Node(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                elems={"in": "in_port", "out": "out_port", "io": "net"},
+            )
+
+        def in_port_recv(self, port, msg):
+            pass
+
+        def net_recv(self, port, msg):
+            pass
+
+    def setUp(self):
+        self.simu = moddy.Sim()
+        self.nodes = [self.Node(self.simu, "N%d" % idx) for idx in range(4)]
+
+    def peers(self, out_port):
+        return [port.parent_obj for port in out_port.in_ports()]
+
+    def test_bind_glob(self):
+        num = self.simu.bind_pattern("N0.out_port", "N[123].in_port")
+        self.assertEqual(num, 1)
+        self.assertListEqual(self.peers(self.nodes[0].out_port), self.nodes[1:])
+
+    def test_bind_glob_io_ports(self):
+        self.simu.bind_pattern("N[01].net", "N[01].net")
+        self.assertListEqual(
+            self.peers(self.nodes[0].net.out_port()), [self.nodes[1]]
+        )
+        self.assertListEqual(
+            self.peers(self.nodes[1].net.out_port()), [self.nodes[0]]
+        )
+
+    def test_bind_regex_ring(self):
+        def next_node(match, port):
+            self.assertIsInstance(port, moddy.sim_ports.SimOutputPort)
+            return "N%d.in_port" % ((int(match.group(1)) + 1) % 4)
+
+        num = self.simu.bind_pattern(
+            re.compile(r"N(\d+)\.out_port"), next_node, delay=1
+        )
+        self.assertEqual(num, 4)
+        for idx, node in enumerate(self.nodes):
+            self.assertListEqual(
+                self.peers(node.out_port), [self.nodes[(idx + 1) % 4]]
+            )
+            self.assertEqual(
+                node.out_port.bind_delay(self.nodes[(idx + 1) % 4].in_port),
+                1,
+            )
+
+    def test_bind_regex_whole_name(self):
+        # the pattern matches only a prefix of "N1.out_port"
+        num = self.simu.bind_pattern(re.compile(r"N1\.out"), "N0.in_port")
+        self.assertEqual(num, 0)
+        self.assertListEqual(self.peers(self.nodes[1].out_port), [])
+
+        self.simu.bind_pattern(
+            "N1.out_port", re.compile(r"N[02]\.in"), delay=1
+        )
+        self.assertListEqual(self.peers(self.nodes[1].out_port), [])
+
+    def test_bind_matrix(self):
+        self.simu.bind_matrix(
+            ["N0", "N1", "N2"],
+            "net",
+            "net",
+            [[0, 1, 1], [1, 0, 0], [0, 0, 0]],
+        )
+        self.assertListEqual(
+            self.peers(self.nodes[0].net.out_port()), self.nodes[1:3]
+        )
+        self.assertListEqual(
+            self.peers(self.nodes[1].net.out_port()), [self.nodes[0]]
+        )
+        self.assertListEqual(self.peers(self.nodes[2].net.out_port()), [])
+
+        with self.assertRaises(ValueError):
+            self.simu.bind_matrix(["N0"], "xx", "net", [[1]])
+
+    def test_bind_edges(self):
+        self.simu.bind_edges(
+            self.nodes, "out_port", "in_port", [(3, 0), (3, 1), (0, 2)]
+        )
+        self.assertListEqual(
+            self.peers(self.nodes[3].out_port), self.nodes[0:2]
+        )
+        self.assertListEqual(
+            self.peers(self.nodes[0].out_port), [self.nodes[2]]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import moddy
+
+
+class TestCausality(unittest.TestCase):
+    class Sensor(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                elems={"out": "out_port", "tmr": "tmr"},
+            )
+
+        def start_sim(self):
+            self.tmr.start(10)
+
+        def tmr_expired(self, _):
+            self.out_port.send("sample", 1)
+            self.tmr.start(10)
+
+    class Gateway(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                elems={"in": "in_port", "out": "out_port", "tmr": "proc_tmr"},
+            )
+            self.msg = None
+
+        def in_port_recv(self, _, msg):
+            self.msg = msg
+            self.proc_tmr.start(1)
+
+        def proc_tmr_expired(self, _):
+            self.out_port.send(self.msg, 1)
+
+    class Ecu(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                elems={"in": "in_port", "out": ["out_port", "log_port"]},
+            )
+
+        def in_port_recv(self, _, msg):
+            self.log_port.send(msg, 0.5)
+            self.out_port.send(msg, 2)
+
+    class Sink(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim, obj_name=obj_name, elems={"in": "in_port"}
+            )
+
+        def in_port_recv(self, _, msg):
+            self.causal_probe(self.obj_name() + "_done")
+
+    def run_model(self, **kwargs):
+        simu = moddy.Sim()
+        self.Sensor(simu, "Sensor")
+        self.Gateway(simu, "Gateway")
+        self.Ecu(simu, "Ecu")
+        self.Sink(simu, "Actuator")
+        self.Sink(simu, "Logger")
+        simu.smart_bind(
+            [
+                ["Sensor.out_port", "Gateway.in_port"],
+                ["Gateway.out_port", "Ecu.in_port"],
+                ["Ecu.out_port", "Actuator.in_port"],
+                ["Ecu.log_port", "Logger.in_port"],
+            ]
+        )
+        causality = simu.enable_causality(**kwargs)
+        causality.add_source("Sensor.out_port", "sensor")
+        causality.add_probe("Actuator.in_port")
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            simu.run(100, enable_trace_printing=False)
+        return simu, out.getvalue()
+
+    def test_latency(self):
+        simu, out = self.run_model()
+        causality = simu.causality
+        # samples at 10, 20, ... 100. The last doesn't arrive before stop
+        self.assertEqual(causality.num_chains(), 10)
+        probes = causality.probes()
+        self.assertEqual(
+            sorted(probes),
+            ["Actuator.in_port", "Actuator_done", "Logger_done"],
+        )
+        hist = probes["Actuator.in_port"].latency
+        self.assertEqual(hist.count, 9)
+        # 1 + 1 (gateway processing) + 1 + 2
+        self.assertEqual(hist.min, 5)
+        self.assertEqual(hist.max, 5)
+        self.assertEqual(probes["Actuator_done"].latency.count, 9)
+        self.assertEqual(probes["Logger_done"].latency.max, 3.5)
+
+        chain = causality.chains()[0]
+        self.assertEqual(chain.name, "sensor")
+        self.assertEqual(chain.start_time, 10)
+        self.assertEqual(chain.latency, 5)
+        self.assertEqual(probes["Actuator.in_port"].worst_latency, 5)
+
+        path = causality.critical_path(chain)
+        self.assertEqual(
+            [(hop.out_port, hop.in_port) for hop in path[1:]],
+            [
+                (
+                    simu.parts_mgr.find_port_by_name(out_name),
+                    simu.parts_mgr.find_port_by_name(in_name),
+                )
+                for out_name, in_name in (
+                    ("Sensor.out_port", "Gateway.in_port"),
+                    ("Gateway.out_port", "Ecu.in_port"),
+                    ("Ecu.out_port", "Actuator.in_port"),
+                )
+            ],
+        )
+        self.assertEqual([hop.time for hop in path], [10, 11, 13, 15])
+
+        lines = out.splitlines()
+        idx = lines.index("SIM: Causal chain latencies")
+        self.assertTrue(lines[idx + 2].startswith("SIM: Actuator.in_port"))
+
+    def test_critical_paths_export(self):
+        simu, _ = self.run_model(max_chains=3)
+        paths = simu.causality.critical_paths()
+        # chain 9 started at 100 has no critical path
+        self.assertEqual(len(simu.causality.chains()), 3)
+        self.assertEqual([path["chain"] for path in paths], [7, 8])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "out", "paths.json")
+            simu.causality.save_critical_paths(file_name)
+            with open(file_name) as file:
+                self.assertEqual(json.load(file), paths)
+        path = paths[0]["path"]
+        self.assertEqual(path[0]["from"], "Sensor.out_port")
+        self.assertEqual(path[-1]["to"], "Actuator.in_port")
+        self.assertEqual(path[-1]["time"] - paths[0]["start_time"], 5)
+
+    def test_no_timers(self):
+        simu, _ = self.run_model(through_timers=False, print_summary=False)
+        # the chains end at the gateway
+        self.assertEqual(sorted(simu.causality.probes()), ["Actuator.in_port"])
+        self.assertEqual(
+            simu.causality.probes()["Actuator.in_port"].latency.count, 0
+        )
+
+    def test_endless_chain(self):
+        class Player(moddy.SimPart):
+            def __init__(self, sim, obj_name):
+                super().__init__(
+                    sim=sim, obj_name=obj_name, elems={"io": "port"}
+                )
+
+            def start_sim(self):
+                if self.obj_name() == "Ping":
+                    self.start_causal_chain("rally")
+                    self.port.send("ball", 1)
+
+            def port_recv(self, _, msg):
+                self.causal_probe("hit")
+                self.port.send(msg, 1)
+
+        simu = moddy.Sim()
+        Player(simu, "Ping")
+        Player(simu, "Pong")
+        simu.smart_bind([["Ping.port", "Pong.port"]])
+        causality = simu.enable_causality(print_summary=False, max_path_len=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            simu.run(100.5, enable_trace_printing=False)
+
+        self.assertEqual(causality.num_chains(), 1)
+        chain = causality.chains()[0]
+        self.assertEqual(chain.latency, 100)
+        self.assertEqual(chain.end_hops, 100)
+        # only the last hops are kept
+        path = causality.critical_path(chain)
+        self.assertEqual([hop.time for hop in path], [96, 97, 98, 99, 100])
+        self.assertEqual(len(causality.current.path), 5)
+        self.assertEqual(causality.critical_paths()[0]["hops"], 100)
+
+    def test_disabled(self):
+        simu = moddy.Sim()
+        self.Sensor(simu, "Sensor")
+        self.Sink(simu, "Actuator")
+        simu.smart_bind([["Sensor.out_port", "Actuator.in_port"]])
+        with contextlib.redirect_stdout(io.StringIO()):
+            simu.run(100, enable_trace_printing=False)
+        self.assertIsNone(simu.causality)
@@ -0,0 +1,58 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import os
+import subprocess
+import sys
+import unittest
+import moddy
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_heavy_modules_not_imported(self):
+        modules = [
+            "moddy.vthread",
+            "moddy.vt_sched_rtos",
+            "moddy.interactive_sequence_diagram",
+            "moddy.trace_to_csv",
+            "moddy.trace_sinks",
+            "moddy.trace_file",
+            "moddy.trace_printer",
+            "moddy.trace_fingerprint",
+            "moddy.trace_diff",
+            "moddy.trace_to_chrome",
+            "moddy.trace_to_vcd",
+            "moddy.dot_structure",
+            "moddy.dot_fsm",
+            "csv",
+            "subprocess",
+        ]
+        code = (
+            "import sys, moddy; "
+            "print(' '.join(m for m in %r if m in sys.modules))" % modules
+        )
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(sys.path)
+        eager = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            env=env,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout.split()
+        self.assertEqual(eager, [])
+
+    def test_lazy_attributes(self):
+        from moddy.vthread import VThread
+        from moddy.trace_to_csv import gen_trace_table
+
+        self.assertIs(moddy.VThread, VThread)
+        self.assertIs(moddy.gen_trace_table, gen_trace_table)
+        self.assertIn("gen_fsm_graph", dir(moddy))
+        self.assertIn("VSimpleProg", moddy.__all__)
+        with self.assertRaises(AttributeError):
+            moddy.NoSuchThing  # pylint: disable=pointless-statement
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import unittest
+import moddy
+from moddy.lib.pdu import Pdu
+
+
+class Frame:
+    """ message with a byte length that counts its deserializations """
+
+    num_unpickled = 0
+
+    def __init__(self, byte_len):
+        self._byte_len = byte_len
+
+    def byte_len(self):
+        return self._byte_len
+
+    def __setstate__(self, state):
+        Frame.num_unpickled += 1
+        self.__dict__.update(state)
+
+
+class TestLossModels(unittest.TestCase):
+    @staticmethod
+    def decisions(model, num, fire_event=None):
+        return [model.is_lost(fire_event) for _ in range(num)]
+
+    def test_pattern(self):
+        model = moddy.PatternLossModel("..x")
+        self.assertEqual(self.decisions(model, 6), [False, False, True] * 2)
+        model = moddy.PatternLossModel([True, False], repeat=False)
+        self.assertEqual(self.decisions(model, 4), [True, False, False, False])
+
+    def test_periodic(self):
+        model = moddy.PeriodicLossModel(period=4, burst=2, offset=1)
+        self.assertEqual(
+            self.decisions(model, 8), [False, True, True, False] * 2
+        )
+        with self.assertRaises(ValueError):
+            moddy.PeriodicLossModel(period=4, burst=5)
+
+    def test_bernoulli(self):
+        model1 = moddy.BernoulliLossModel(frame_error_rate=0.1, seed=42)
+        model2 = moddy.BernoulliLossModel(
+            frame_error_rate=0.1, seed=42, block_size=7
+        )
+        dec1 = self.decisions(model1, 10000)
+        # same seed, same decisions, independent of block size
+        self.assertEqual(dec1, self.decisions(model2, 10000))
+        self.assertAlmostEqual(sum(dec1) / 10000, 0.1, delta=0.02)
+
+        with self.assertRaises(ValueError):
+            moddy.BernoulliLossModel()
+        with self.assertRaises(ValueError):
+            moddy.BernoulliLossModel(frame_error_rate=1.5)
+        with self.assertRaises(ValueError):
+            moddy.BernoulliLossModel(bit_error_rate=-0.1)
+
+    def test_gilbert_elliott(self):
+        model = moddy.GilbertElliottLossModel(p=0.01, r=0.25, seed=1)
+        dec = self.decisions(model, 100000)
+        # stationary loss rate is p/(p+r)
+        self.assertAlmostEqual(sum(dec) / 100000, 0.01 / 0.26, delta=0.01)
+        # losses come in bursts
+        bursts = sum(
+            1 for idx in range(1, len(dec)) if dec[idx] and not dec[idx - 1]
+        )
+        self.assertLess(bursts, sum(dec) / 2)
+
+        for kwargs in ({"p": 2}, {"r": -1}, {"loss_bad": 1.1}):
+            args = {"p": 0.1, "r": 0.1}
+            args.update(kwargs)
+            with self.assertRaises(ValueError):
+                moddy.GilbertElliottLossModel(**args)
+
+    def test_abstract_base(self):
+        from moddy.sim_loss_models import LossModel
+
+        with self.assertRaises(TypeError):
+            LossModel()
+
+    def test_bit_error_rate_on_port(self):
+        class Producer(moddy.SimPart):
+            def __init__(self, sim):
+                super().__init__(sim=sim, obj_name="Prod", elems={"out": "p"})
+
+            def start_sim(self):
+                for _ in range(100):
+                    self.p.send(Pdu("Big", {}, 1000), 1)
+                    self.p.send(Pdu("Small", {}, 0), 1)
+
+        class Consumer(moddy.SimPart):
+            def __init__(self, sim):
+                super().__init__(sim=sim, obj_name="Cons", elems={"in": "p"})
+                self.received = {"Big": 0, "Small": 0}
+
+            def p_recv(self, _, msg):
+                self.received[msg.pdu_type] += 1
+
+        simu = moddy.Sim()
+        prod = Producer(simu)
+        cons = Consumer(simu)
+        prod.p.bind(cons.p)
+        prod.p.set_loss_model(
+            moddy.BernoulliLossModel(bit_error_rate=1e-4, seed=3)
+        )
+        simu.run(1000, enable_trace_printing=False)
+
+        # 8000 bits -> 55% loss probability, 0 bits -> no loss
+        self.assertEqual(cons.received["Small"], 100)
+        self.assertLess(cons.received["Big"], 70)
+        self.assertGreater(cons.received["Big"], 20)
+
+        lost = [
+            te
+            for te in simu.tracing.traced_events()
+            if te.action == "<MSG" and te.trans_val.is_lost
+        ]
+        self.assertEqual(len(lost), 100 - cons.received["Big"])
+
+        # no message without event
+        self.assertFalse(prod.p.is_lost_message())
+
+    def test_bit_error_rate_without_deserializing(self):
+        simu = moddy.Sim()
+        prod = moddy.SimPart(simu, "Prod", elems={"out": "p"})
+        received = []
+        cons = moddy.SimPart(simu, "Cons")
+        cons_p = cons.new_input_port("p", lambda _, msg: received.append(msg))
+        prod.p.bind(cons_p)
+        prod.p.set_loss_model(
+            moddy.BernoulliLossModel(bit_error_rate=1e-4, seed=3)
+        )
+        Frame.num_unpickled = 0
+        for _ in range(50):
+            prod.p.send(Frame(1000), 1)
+        simu.run(100, enable_trace_printing=False)
+        self.assertGreater(len(received), 0)
+        self.assertLess(len(received), 50)
+        # only the delivered messages are deserialized
+        self.assertEqual(Frame.num_unpickled, len(received))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import moddy
+
+try:
+    import yaml  # noqa: F401
+
+    HAVE_YAML = True
+except ImportError:
+    HAVE_YAML = False
+
+try:
+    import tomllib  # noqa: F401
+
+    HAVE_TOML = True
+except ImportError:
+    try:
+        import tomli  # noqa: F401
+
+        HAVE_TOML = True
+    except ImportError:
+        HAVE_TOML = False
+
+
+class Producer(moddy.SimPart):
+    def __init__(self, sim, obj_name, parent_obj=None, interval=1):
+        super().__init__(sim=sim, obj_name=obj_name, parent_obj=parent_obj)
+        self.interval = interval
+
+    def start_sim(self):
+        self.tmr.start(self.interval)
+
+    def tmr_expired(self, _):
+        self.port.send("msg", 1)
+
+
+class Consumer(moddy.SimPart):
+    def __init__(self, sim, obj_name, parent_obj=None):
+        super().__init__(sim=sim, obj_name=obj_name, parent_obj=parent_obj)
+        self.received = []
+
+    def port_recv(self, _, msg):
+        self.received.append((self.time(), msg))
+
+
+MODEL = {
+    "parts": [
+        {
+            "name": "Prod",
+            "class": __name__ + ".Producer",
+            "params": {"interval": 2},
+            "elems": {"out": "port", "tmr": "tmr"},
+        },
+        {
+            "name": "Cons",
+            "class": __name__ + ".Consumer",
+            "count": 3,
+            "elems": {"in": ["port"]},
+            "subparts": [{"name": "Sub"}],
+        },
+    ],
+    "bindings": [
+        ["Prod.port", "Cons[0].port"],
+        {"ports": ["Prod.port", "Cons[1].port"], "delay": 0.5},
+        {"out": "Prod.port", "in": r"Cons\[2\]\.port", "regex": True},
+    ],
+}
+
+MODEL_YAML = """
+parts:
+  - name: Prod
+    class: %(module)s.Producer
+    params: {interval: 2}
+    elems: {out: port, tmr: tmr}
+  - name: Cons
+    class: %(module)s.Consumer
+    count: 3
+    elems: {in: [port]}
+    subparts:
+      - {name: Sub}
+bindings:
+  - [Prod.port, "Cons[0].port"]
+  - {ports: [Prod.port, "Cons[1].port"], delay: 0.5}
+  - {out: Prod.port, in: 'Cons\\[2\\]\\.port', regex: true}
+""" % {
+    "module": __name__
+}
+
+MODEL_TOML = """
+bindings = [
+  ["Prod.port", "Cons[0].port"],
+  {ports = ["Prod.port", "Cons[1].port"], delay = 0.5},
+  {out = "Prod.port", in = 'Cons\\[2\\]\\.port', regex = true},
+]
+
+[[parts]]
+name = "Prod"
+class = "%(module)s.Producer"
+params = {interval = 2}
+elems = {out = "port", tmr = "tmr"}
+
+[[parts]]
+name = "Cons"
+class = "%(module)s.Consumer"
+count = 3
+elems = {in = ["port"]}
+subparts = [{name = "Sub"}]
+""" % {
+    "module": __name__
+}
+
+
+class TestModelDesc(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, file_name, content):
+        path = os.path.join(self.tmp_dir, file_name)
+        with open(path, "w") as file:
+            file.write(content)
+        return path
+
+    def check_model(self, simu, parts):
+        self.assertEqual(
+            sorted(parts),
+            [
+                "Cons[0]",
+                "Cons[0].Sub",
+                "Cons[1]",
+                "Cons[1].Sub",
+                "Cons[2]",
+                "Cons[2].Sub",
+                "Prod",
+            ],
+        )
+        self.assertEqual(parts["Prod"].interval, 2)
+        simu.run(4, enable_trace_printing=False)
+        self.assertEqual(parts["Cons[0]"].received, [(3, "msg")])
+        self.assertEqual(parts["Cons[1]"].received, [(3.5, "msg")])
+        self.assertEqual(parts["Cons[2]"].received, [(3, "msg")])
+
+    def test_formats(self):
+        for file_name, content, have_parser in (
+            ("model.json", json.dumps(MODEL), True),
+            ("model.yaml", MODEL_YAML, HAVE_YAML),
+            ("model.toml", MODEL_TOML, HAVE_TOML),
+        ):
+            with self.subTest(file_name):
+                if not have_parser:
+                    self.skipTest("no parser for %s installed" % file_name)
+                simu = moddy.Sim()
+                parts = moddy.load_model(
+                    simu, self.write(file_name, content), use_cache=False
+                )
+                self.check_model(simu, parts)
+
+    def test_cache(self):
+        path = self.write("model.json", json.dumps(MODEL))
+        cache_dir = os.path.join(self.tmp_dir, "cache")
+        moddy.compile_model_file(path, cache_dir)
+        cache_files = os.listdir(cache_dir)
+        self.assertEqual(len(cache_files), 1)
+
+        # replace cached model to see that it is used
+        with open(os.path.join(cache_dir, cache_files[0]), "wb") as file:
+            pickle.dump(moddy.compile_model({"parts": []}), file)
+        self.assertEqual(moddy.compile_model_file(path, cache_dir).parts, ())
+
+        # corrupt cache is replaced
+        num_parts = len(moddy.compile_model_file(path, use_cache=False).parts)
+        for content in (b"garbage", pickle.dumps(("not", "a", "model"))):
+            with open(os.path.join(cache_dir, cache_files[0]), "wb") as file:
+                file.write(content)
+            self.assertEqual(
+                len(moddy.compile_model_file(path, cache_dir).parts),
+                num_parts,
+            )
+            self.assertEqual(os.listdir(cache_dir), cache_files)
+
+        # cache of a class that no longer exists
+        with open(os.path.join(cache_dir, cache_files[0]), "wb") as file:
+            file.write(
+                pickle.dumps(moddy.compile_model({"parts": []})).replace(
+                    b"sim_model_desc", b"sim_model_xxxx"
+                )
+            )
+        self.assertEqual(
+            len(moddy.compile_model_file(path, cache_dir).parts), num_parts
+        )
+
+        # changed description gets a new cache entry
+        path = self.write("model.json", json.dumps(MODEL, indent=1))
+        simu = moddy.Sim()
+        self.check_model(simu, moddy.load_model(simu, path, cache_dir))
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+    def test_validation(self):
+        for desc in (
+            {"parts": [{"class": "moddy.SimPart"}]},
+            {"parts": [{"name": "A"}, {"name": "A"}]},
+            {"parts": [{"name": "A", "count": -1}]},
+            {"parts": [{"name": "A", "elems": {"in": 1}}]},
+            {"parts": [{"name": "A", "colour": "red"}]},
+            {"bindings": [["A.port"]]},
+            {"bindings": [{"ports": ["A.p", "B.p"], "delay": -1}]},
+            {"bindings": [{"out": "A.p", "in": "(", "regex": True}]},
+            {"parts": [], "extra": 1},
+        ):
+            with self.subTest(desc):
+                with self.assertRaises(ValueError):
+                    moddy.compile_model(desc)
+
+
+if __name__ == "__main__":
+    unittest.main()
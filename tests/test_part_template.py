@@ -0,0 +1,116 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import unittest
+import moddy
+
+
+class TestPartTemplate(unittest.TestCase):
+    class Node(moddy.SimPart):
+        def __init__(self, sim, obj_name, parent_obj=None, delay=1):
+            super().__init__(sim=sim, obj_name=obj_name, parent_obj=parent_obj)
+            self.delay = delay
+            self.received = []
+
+        def start_sim(self):
+            self.tmr.start(self.delay)
+
+        def tmr_expired(self, _):
+            self.out_port.send(self.obj_name(), 1)
+
+        def in_port_recv(self, _, msg):
+            self.received.append(msg)
+
+    ELEMS = {"in": "in_port", "out": ["out_port"], "tmr": "tmr"}
+
+    def test_instantiate_many(self):
+        simu = moddy.Sim()
+        template = moddy.SimPartTemplate(self.Node, self.ELEMS, delay=2)
+        nodes = template.instantiate_many(simu, "node", 3)
+
+        self.assertEqual(
+            [node.obj_name() for node in nodes],
+            ["node[0]", "node[1]", "node[2]"],
+        )
+        for node in nodes:
+            self.assertEqual(node.delay, 2)
+            self.assertEqual(len(node.ports()), 2)
+            self.assertEqual(node._list_timers, [node.tmr])
+            self.assertIs(node.port_by_name("in_port"), node.in_port)
+
+        self.assertIs(
+            simu.parts_mgr.find_port_by_name("node[1].out_port"),
+            nodes[1].out_port,
+        )
+        for idx, node in enumerate(nodes):
+            node.out_port.bind(nodes[(idx + 1) % 3].in_port)
+
+        simu.run(10, enable_trace_printing=False)
+        self.assertEqual(nodes[0].received, ["node[2]"])
+        self.assertEqual(nodes[1].received, ["node[0]"])
+
+    def test_sub_parts(self):
+        simu = moddy.Sim()
+        top = moddy.SimPart(simu, "Top")
+        template = moddy.SimPartTemplate(self.Node, self.ELEMS)
+        template.instantiate_many(simu, "n", 2, top, name_fmt="%s%d")
+        self.assertEqual(
+            [part.hierarchy_name() for part in simu.parts_mgr.walk_parts()],
+            ["Top", "Top.n0", "Top.n1"],
+        )
+
+    def test_create_elements_fallback(self):
+        simu = moddy.Sim()
+        template = moddy.SimPartTemplate(
+            moddy.VThread, {"QueuingIn": "q_in", "out": "out_port"}
+        )
+        thread = template.instantiate(simu, "Thread")
+        self.assertEqual(thread.q_in.obj_name(), "q_in")
+        self.assertEqual(thread.out_port.obj_name(), "out_port")
+
+    def test_callbacks(self):
+        received = []
+
+        class Recorder:
+            def __call__(self, _, msg):
+                received.append(("object", msg))
+
+        class Node(moddy.SimPart):
+            obj_recv = Recorder()
+
+            def __init__(self, sim, obj_name, parent_obj=None):
+                super().__init__(sim, obj_name, parent_obj)
+                self.inst_recv = lambda _, msg: received.append(
+                    ("instance", msg)
+                )
+
+            @staticmethod
+            def static_recv(_, msg):
+                received.append(("static", msg))
+
+        simu = moddy.Sim()
+        template = moddy.SimPartTemplate(
+            Node, {"in": ["obj", "inst", "static"]}
+        )
+        node = template.instantiate(simu, "node")
+        sender = moddy.SimPart(simu, "sender", elems={"out": "out_port"})
+        for port in (node.obj, node.inst, node.static):
+            sender.out_port.bind(port)
+        sender.out_port.send("x", 1)
+        simu.run(2, enable_trace_printing=False)
+        self.assertEqual(
+            sorted(received),
+            [("instance", "x"), ("object", "x"), ("static", "x")],
+        )
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            moddy.SimPartTemplate(self.Node, {"in": "a", "out": "a"})
+
+        template = moddy.SimPartTemplate(self.Node, {"in": "no_callback"})
+        with self.assertRaises(AttributeError):
+            template.instantiate(moddy.Sim(), "node")
+
+
+if __name__ == "__main__":
+    unittest.main()
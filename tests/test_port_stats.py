@@ -0,0 +1,136 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import contextlib
+import io
+import unittest
+import moddy
+from moddy.sim_port_stats import LogHistogram
+
+
+class Msg:
+    # number of deserialized messages
+    num_unpickled = 0
+
+    def __init__(self, num):
+        self.num = num
+
+    def __setstate__(self, state):
+        Msg.num_unpickled += 1
+        self.__dict__.update(state)
+
+    def byte_len(self):
+        return 100
+
+    def __str__(self):
+        return "msg%d" % self.num
+
+
+class TestPortStats(unittest.TestCase):
+    class Producer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim, obj_name=obj_name, elems={"out": "net_port"}
+            )
+
+        def start_sim(self):
+            self.net_port.send_many([Msg(0), Msg(1), Msg(2)], 1)
+
+    class Consumer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim, obj_name=obj_name, elems={"in": "net_port"}
+            )
+            self.received = []
+
+        def net_port_recv(self, _, msg):
+            self.received.append(msg.num)
+
+    def run_model(self, lost_seq=None, **stats_args):
+        simu = moddy.Sim()
+        prod = self.Producer(simu, "Prod")
+        self.Consumer(simu, "Cons")
+        simu.smart_bind([["Prod.net_port", "Cons.net_port"]], delay=0.5)
+        if lost_seq is not None:
+            prod.net_port.inject_lost_message_error_by_sequence(lost_seq)
+        simu.enable_port_stats(**stats_args)
+        Msg.num_unpickled = 0
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            simu.run(10, enable_trace_printing=False)
+        return simu, out.getvalue()
+
+    def test_stats(self):
+        simu, out = self.run_model()
+        stats = simu.port_stats()["Prod.net_port"]
+        self.assertEqual(list(simu.port_stats()), ["Prod.net_port"])
+        self.assertEqual(stats.num_msgs, 3)
+        self.assertEqual(stats.num_lost, 0)
+        self.assertEqual(stats.num_bytes, 300)
+        # the byte length is taken without deserializing the messages
+        self.assertEqual(Msg.num_unpickled, 3)
+        self.assertEqual(stats.elapsed(), 10)
+        self.assertAlmostEqual(stats.msgs_per_second(), 0.3)
+        self.assertAlmostEqual(stats.bytes_per_second(), 30)
+        self.assertAlmostEqual(stats.utilization(), 0.3)
+
+        self.assertEqual(stats.queueing_delay.count, 3)
+        self.assertEqual(stats.queueing_delay.min, 0)
+        self.assertEqual(stats.queueing_delay.max, 2)
+        self.assertAlmostEqual(stats.queueing_delay.mean(), 1)
+        self.assertAlmostEqual(stats.flight_time.mean(), 1)
+        # including bind delay
+        self.assertEqual(stats.end_to_end.min, 1.5)
+        self.assertEqual(stats.end_to_end.max, 3.5)
+        self.assertAlmostEqual(stats.end_to_end.mean(), 2.5)
+
+        summary = stats.summary()
+        self.assertEqual(summary["msgs"], 3)
+        self.assertEqual(summary["end_to_end"]["max"], 3.5)
+
+        # summary table at stop
+        lines = out.splitlines()
+        idx = lines.index("SIM: Port statistics")
+        self.assertTrue(lines[idx + 2].startswith("SIM: Prod.net_port"))
+        self.assertIn("30.0", lines[idx + 2])
+
+    def test_lost(self):
+        simu, _ = self.run_model(lost_seq=1)
+        stats = simu.port_stats()["Prod.net_port"]
+        self.assertEqual(stats.num_msgs, 3)
+        self.assertEqual(stats.num_lost, 1)
+        self.assertEqual(stats.end_to_end.count, 2)
+        self.assertEqual(stats.flight_time.count, 3)
+
+    def test_pattern(self):
+        simu, out = self.run_model(pattern="Cons.*", print_summary=False)
+        self.assertEqual(simu.port_stats(), {})
+        self.assertNotIn("Port statistics", out)
+
+        port = simu.parts_mgr.find_port_by_name("Prod.net_port")
+        self.assertIsNone(port.stats())
+        stats = port.enable_stats()
+        self.assertIs(port.stats(), stats)
+        self.assertIsNone(port.enable_stats(False))
+        self.assertIsNone(port.stats())
+
+    def test_histogram(self):
+        hist = LogHistogram(bins_per_decade=10)
+        self.assertIsNone(hist.mean())
+        self.assertIsNone(hist.quantile(0.5))
+        for value in range(1, 1001):
+            hist.add(value / 1000)
+        hist.add(0)
+        self.assertEqual(hist.count, 1001)
+        self.assertEqual(hist.min, 0)
+        self.assertEqual(hist.max, 1)
+        self.assertEqual(hist.bins()[0], (0.0, 0.0, 1))
+        self.assertEqual(sum(count for _, _, count in hist.bins()), 1001)
+        # relative error below the bin width (factor 10**0.1)
+        for fraction in (0.1, 0.5, 0.9, 0.99):
+            self.assertAlmostEqual(
+                hist.quantile(fraction) / fraction, 1, delta=0.26
+            )
+        self.assertEqual(hist.quantile(1.0), 1)
+        self.assertEqual(hist.quantile(0), 0)
@@ -0,0 +1,70 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import unittest
+from fractions import Fraction
+import moddy
+
+
+class TestSendMany(unittest.TestCase):
+    class Producer(moddy.SimPart):
+        def __init__(self, sim, obj_name, use_send_many):
+            super().__init__(
+                sim=sim, obj_name=obj_name, elems={"out": "port", "tmr": "tmr"}
+            )
+            self.use_send_many = use_send_many
+
+        def start_sim(self):
+            self.tmr.start(1)
+
+        def tmr_expired(self, _):
+            msgs = ["a", "b", "c", "d"]
+            flight_times = [1, 2, 1, 3]
+            if self.use_send_many:
+                self.port.send_many(msgs, flight_times)
+            else:
+                for msg, flight_time in zip(msgs, flight_times):
+                    self.port.send(msg, flight_time)
+
+    class Consumer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(sim=sim, obj_name=obj_name, elems={"in": "port"})
+
+        def port_recv(self, _, msg):
+            self.annotation(msg)
+
+    @classmethod
+    def run_model(cls, use_send_many):
+        simu = moddy.Sim()
+        prod = cls.Producer(simu, "Prod", use_send_many)
+        cls.Consumer(simu, "Cons")
+        simu.smart_bind([["Prod.port", "Cons.port"]])
+        prod.port.inject_lost_message_error_by_sequence(2)
+        simu.run(stop_time=100, enable_trace_printing=False)
+        return [
+            "%s %s %s" % (te.trace_time, te.action, te)
+            for te in simu.tracing.traced_events()
+        ]
+
+    def test_send_many_same_as_send(self):
+        self.assertEqual(self.run_model(False), self.run_model(True))
+
+    def test_send_many_flight_time_mismatch(self):
+        simu = moddy.Sim()
+        prod = self.Producer(simu, "Prod", True)
+        with self.assertRaises(ValueError):
+            prod.port.send_many(["a", "b"], [1])
+
+    def test_send_many_real_flight_time(self):
+        # any real number is a single flight time, e.g. numpy scalars
+        simu = moddy.Sim()
+        prod = self.Producer(simu, "Prod", True)
+        prod.port.send_many(["a", "b"], Fraction(1, 2))
+        self.assertEqual(
+            [event.flight_time for event in prod.port.pending_msg()],
+            [Fraction(1, 2)] * 2,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import moddy
+from moddy.trace_diff import diff_traces
+from tests.ping_pong import PingPong, ping_pong_model
+
+
+class StatePingPong(PingPong):
+    def got_msg(self):
+        self.set_state_indicator(str(self.received))
+
+
+class TestTraceDiff(unittest.TestCase):
+    def run_model(self, pong_delay=lambda _: 1, bin_file=None):
+        simu = ping_pong_model(StatePingPong, pong_delay)
+        if bin_file is not None:
+            moddy.BinaryTraceSink(simu, bin_file)
+        simu.run(100, enable_trace_printing=False)
+        return simu
+
+    def test_equal(self):
+        simu = self.run_model()
+        diff = diff_traces(simu, self.run_model())
+        self.assertTrue(diff.equal())
+        self.assertEqual(diff.divergences, [])
+        self.assertEqual(diff.num_events_a, len(simu.tracing.traced_events()))
+        self.assertEqual(diff.num_events_b, diff.num_events_a)
+        self.assertEqual(diff.action_counts(), {})
+
+    def test_reorder_same_time(self):
+        events = list(self.run_model().tracing.traced_events())
+        # reverse the events of each time stamp
+        reordered = []
+        group = []
+        for te in events:
+            if group and group[0].trace_time != te.trace_time:
+                reordered += reversed(group)
+                group = []
+            group.append(te)
+        reordered += reversed(group)
+        self.assertNotEqual(reordered, events)
+        self.assertTrue(diff_traces(events, reordered).equal())
+
+    def test_divergence(self):
+        ref = self.run_model()
+        simu = self.run_model(lambda count: 1.5 if count == 20 else 1)
+        diff = diff_traces(ref, simu, max_divergences=2, context=2)
+        self.assertFalse(diff.equal())
+        self.assertEqual(len(diff.divergences), 2)
+        self.assertGreater(diff.num_divergences, 2)
+        self.assertEqual(
+            sum(sum(counts) for counts in diff.action_counts().values()),
+            diff.num_divergences,
+        )
+
+        # the message sent at 40s takes longer
+        div = diff.divergences[0]
+        self.assertEqual(div.kind, "changed")
+        self.assertEqual(div.action(), ">MSG")
+        self.assertEqual(div.index_a, div.index_b)
+        self.assertEqual(div.event_a.time, 40.0)
+        self.assertEqual(div.event_a.times[2], 41.0)
+        self.assertEqual(div.event_b.times[2], 41.5)
+        self.assertEqual(
+            [idx for idx, _ in div.before],
+            [div.index_a - 2, div.index_a - 1],
+        )
+        self.assertEqual(
+            [idx for idx, _ in div.after],
+            [div.index_a + 1, div.index_a + 2],
+        )
+        self.assertEqual(div.before[1][1].action, "STA")
+
+        # the message arrives 0.5s later
+        div = diff.divergences[1]
+        self.assertEqual(div.kind, "only_a")
+        self.assertEqual(div.event_a.action, "<MSG")
+        self.assertEqual(div.event_a.time, 41.0)
+
+        report = diff.report()
+        self.assertIn("changed at A#%d" % diff.divergences[0].index_a, report)
+        self.assertIn("<MSG", report)
+
+    def test_shorter_trace(self):
+        events = list(self.run_model().tracing.traced_events())
+        diff = diff_traces(events, events[:-5])
+        self.assertEqual(diff.num_divergences, 5)
+        self.assertTrue(all(div.kind == "only_a" for div in diff.divergences))
+        diff = diff_traces(events[:-5], events, context=0)
+        self.assertEqual(
+            [div.index_b for div in diff.divergences],
+            list(range(len(events) - 5, len(events))),
+        )
+        self.assertEqual(diff.divergences[0].before, [])
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bin_file = os.path.join(tmp_dir, "trace.bin")
+            csv_file = os.path.join(tmp_dir, "trace.csv")
+            simu = self.run_model(bin_file=bin_file)
+            with contextlib.redirect_stdout(io.StringIO()):
+                moddy.gen_trace_table(simu, csv_file, time_unit="ms")
+
+            self.assertTrue(diff_traces(simu, bin_file).equal())
+            self.assertTrue(
+                diff_traces(csv_file, simu, time_unit="ms").equal()
+            )
+            self.assertTrue(
+                diff_traces(bin_file, csv_file, time_unit="ms").equal()
+            )
+
+            other = self.run_model(lambda count: 1.5 if count == 20 else 1)
+            diff = diff_traces(csv_file, other, time_unit="ms")
+            self.assertEqual(diff.divergences[0].kind, "changed")
+            self.assertEqual(diff.divergences[0].event_a.time, 40.0)
@@ -0,0 +1,217 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import os
+import tempfile
+import unittest
+import moddy
+from moddy.lib.trace_search import TraceSearch
+from moddy.trace_file import BinaryTraceReader
+from moddy.trace_sinks import BinaryTraceSink
+
+try:
+    import numpy  # noqa: F401
+
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+
+class TestTraceFile(unittest.TestCase):
+    class Node(moddy.SimPart):
+        def __init__(self, sim, obj_name, parent_obj=None):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                parent_obj=parent_obj,
+                elems={"in": "in_port", "out": "out_port", "tmr": "tmr"},
+            )
+            self.count = 0
+            self.new_var_watcher("count", "%d")
+
+        def start_sim(self):
+            if self.obj_name() == "node0":
+                self.out_port.send("token", 1)
+
+        def in_port_recv(self, port, msg):
+            self.count += 1
+            self.set_state_indicator(
+                "busy" if self.count % 2 else "", {"boxFillColor": "blue"}
+            )
+            self.tmr.restart(1.5)
+            self.out_port.send(msg, 1)
+
+        def tmr_expired(self, timer):
+            self.annotation("timeout")
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+        simu = moddy.Sim()
+        top = moddy.SimPart(simu, "Top")
+        for idx in range(3):
+            self.Node(simu, "node%d" % idx, top)
+        simu.smart_bind(
+            [
+                ["Top.node0.out_port", "Top.node1.in_port"],
+                ["Top.node1.out_port", "Top.node2.in_port"],
+                ["Top.node2.out_port", "Top.node0.in_port"],
+            ]
+        )
+        simu.tracing.set_display_time_unit("ms")
+        self.file_name = os.path.join(self.tmp_dir, "trace.bin")
+        BinaryTraceSink(simu, self.file_name, batch_size=16)
+        simu.run(50, enable_trace_printing=False)
+        self.simu = simu
+        self.events = list(simu.tracing.traced_events())
+        self.reader = BinaryTraceReader(self.file_name)
+        self.reader.set_display_time_unit("ms")
+        self.addCleanup(self.reader.close)
+
+    def test_events(self):
+        reader = self.reader
+        self.assertEqual(len(reader), len(self.events))
+        self.assertGreater(len(reader._chunk_offsets), 5)
+        for read_ev, ev in zip(reader, self.events):
+            self.assertEqual(read_ev.trace_time, ev.trace_time)
+            self.assertEqual(repr(read_ev), repr(ev))
+        self.assertEqual(repr(reader[-1]), repr(self.events[-1]))
+        self.assertEqual(
+            [repr(ev) for ev in reader[10:20]],
+            [repr(ev) for ev in self.events[10:20]],
+        )
+        with self.assertRaises(IndexError):
+            reader[len(reader)]  # pylint: disable=pointless-statement
+
+        msg_ev = next(ev for ev in reader if ev.action == "<MSG")
+        self.assertEqual(
+            msg_ev.sub_obj.parent_obj.hierarchy_name(), "Top.node1"
+        )
+        self.assertEqual(msg_ev.trans_val.port.obj_name(), "out_port")
+        self.assertEqual(msg_ev.trans_val.msg_text(), "token")
+
+    def test_time_queries(self):
+        reader = self.reader
+        for t_from, t_to in (
+            (0, 50),
+            (10, 20),
+            (10.5, 10.5),
+            (12, 12),
+            (60, 70),
+        ):
+            expected = [
+                repr(ev)
+                for ev in self.events
+                if t_from <= ev.trace_time <= t_to
+            ]
+            self.assertEqual(
+                [repr(ev) for ev in reader.events_between(t_from, t_to)],
+                expected,
+            )
+        self.assertEqual(reader.index_of_time(0), 0)
+        self.assertEqual(reader.index_of_time(1000), len(reader))
+        idx = reader.index_of_time(20)
+        self.assertGreaterEqual(reader[idx].trace_time, 20)
+        self.assertLess(reader[idx - 1].trace_time, 20)
+
+    def test_definitions_on_demand(self):
+        reader = self.reader
+        num_chunks = len(reader._chunk_offsets)
+        self.assertGreater(num_chunks, 10)
+        events = list(reader.events_between(48, 50))
+        self.assertEqual(
+            [repr(ev) for ev in events],
+            [repr(ev) for ev in self.events if 48 <= ev.trace_time <= 50],
+        )
+        # only the tables of the chunks that define the needed strings and
+        # elements are read
+        self.assertLess(len(reader._strings_loaded), num_chunks // 2)
+        self.assertLess(len(reader._elements_loaded), num_chunks // 2)
+
+    def test_filtered_iteration(self):
+        events = list(
+            self.reader.iter_events(
+                t_from=5, action=["T-EXP", "ANN"], part="*node2"
+            )
+        )
+        expected = [
+            ev
+            for ev in self.events
+            if ev.trace_time >= 5
+            and ev.action in ("T-EXP", "ANN")
+            and ev.part.hierarchy_name() == "Top.node2"
+        ]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(
+            [repr(ev) for ev in events], [repr(ev) for ev in expected]
+        )
+
+    def test_exporters(self):
+        for name, sim in (("live", self.simu), ("file", self.reader)):
+            moddy.gen_trace_table(
+                sim, os.path.join(self.tmp_dir, name + ".csv"), time_unit="ms"
+            )
+            moddy.gen_interactive_sequence_diagram(
+                sim,
+                os.path.join(self.tmp_dir, name + ".html"),
+                show_var_list=["Top.node0.count"],
+                time_per_div=1.0,
+                pix_per_div=30,
+            )
+        for ext in ("csv", "html"):
+            with open(os.path.join(self.tmp_dir, "live." + ext)) as file:
+                expected = file.read()
+            with open(os.path.join(self.tmp_dir, "file." + ext)) as file:
+                self.assertEqual(file.read(), expected)
+
+    def test_trace_search(self):
+        for sim in (self.simu, self.reader):
+            search = TraceSearch(sim)
+            idx, trace_ev = search.find_rcv_msg("Top.node2", "tok*")
+            self.assertEqual(trace_ev.sub_obj.obj_name(), "in_port")
+            idx2, _ = search.find_ann("Top.node0", "timeout")
+            self.assertGreater(idx2, idx)
+        self.assertEqual(
+            self.reader.find_port_by_name("Top.node1.in_port").type_str,
+            "InPort",
+        )
+        with self.assertRaises(ValueError):
+            self.reader.find_part_by_name("Top.node9")
+
+    def test_crashed_file(self):
+        last_chunk_offset = self.reader._chunk_offsets[-1]
+        self.reader.close()
+        with open(self.file_name, "r+b") as file:
+            file.truncate(last_chunk_offset + 40)
+        with BinaryTraceReader(self.file_name) as reader:
+            reader.set_display_time_unit("ms")
+            self.assertLess(len(reader), len(self.events))
+            self.assertEqual(
+                [repr(ev) for ev in reader],
+                [repr(ev) for ev in self.events[: len(reader)]],
+            )
+
+    @unittest.skipUnless(HAVE_NUMPY, "NumPy not installed")
+    def test_numpy(self):
+        reader = self.reader
+        records = reader.numpy_records()
+        self.assertEqual(len(records), len(self.events))
+        self.assertEqual(
+            list(records["time"]), [ev.trace_time for ev in self.events]
+        )
+        window = reader.numpy_records(10, 12)
+        self.assertEqual(
+            [reader.string(num) for num in window["action"]],
+            [ev.action for ev in reader.events_between(10, 12)],
+        )
+        # records within one chunk are a view on the file
+        single = reader.numpy_records(0, 0)
+        self.assertFalse(single.flags.writeable)
+        del records, window, single
+
+
+if __name__ == "__main__":
+    unittest.main()
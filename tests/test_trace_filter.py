@@ -0,0 +1,108 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import unittest
+import moddy
+from moddy.sim_ports import SimTimer
+
+
+class TestTraceFilter(unittest.TestCase):
+    class Producer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim, obj_name=obj_name, elems={"out": "port", "tmr": "tmr"}
+            )
+            self.count = 0
+            self.new_var_watcher("count", "%d")
+
+        def start_sim(self):
+            self.tmr.start(1)
+
+        def tmr_expired(self, _):
+            self.count += 1
+            self.port.send("msg%d" % self.count, 1)
+            if self.count < 3:
+                self.tmr.start(2)
+            else:
+                self.assertion_failed("done")
+
+    class Consumer(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(sim=sim, obj_name=obj_name, elems={"in": "port"})
+
+        def port_recv(self, _, msg):
+            self.annotation(msg)
+
+    def setUp(self):
+        self.simu = moddy.Sim()
+        self.prod = self.Producer(self.simu, "Prod")
+        self.cons1 = self.Consumer(self.simu, "Cons1")
+        self.cons2 = self.Consumer(self.simu, "Cons2")
+        self.simu.smart_bind([["Prod.port", "Cons1.port", "Cons2.port"]])
+
+    def run_sim(self):
+        self.simu.run(
+            20, enable_trace_printing=False, stop_on_assertion_failure=False
+        )
+        return [
+            (te.action, te.sub_obj.hierarchy_name())
+            for te in self.simu.tracing.traced_events()
+        ]
+
+    def test_no_filter(self):
+        trc = self.run_sim()
+        self.assertEqual(trc.count(("<MSG", "Cons2.port")), 3)
+        self.assertGreaterEqual(trc.count(("VC", "Prod.count")), 4)
+
+    def test_exclude(self):
+        self.simu.tracing.exclude_trace_events(action="VC")
+        self.simu.tracing.exclude_trace_events(part="Cons2")
+        trc = self.run_sim()
+        self.assertEqual(trc.count(("VC", "Prod.count")), 0)
+        self.assertEqual([ev for ev in trc if ev[1].startswith("Cons2")], [])
+        # events shown on other parts remain
+        self.assertEqual(trc.count(("<MSG", "Cons1.port")), 3)
+        self.assertEqual(trc.count(("ANN", "Cons1")), 3)
+        self.assertEqual(trc.count((">MSG", "Prod.port")), 3)
+
+    def test_include(self):
+        self.simu.tracing.include_trace_events(elem_class=SimTimer)
+        self.simu.tracing.include_trace_events(part="Cons*", action="<MSG")
+        self.simu.tracing.exclude_trace_events(part="Cons2")
+        trc = self.run_sim()
+        self.assertEqual(
+            set(trc),
+            {
+                ("T-START", "Prod.tmr"),
+                ("T-EXP", "Prod.tmr"),
+                ("<MSG", "Cons1.port"),
+                ("ASSFAIL", "Prod"),  # always recorded
+            },
+        )
+
+    def test_change_during_run(self):
+        tracing = self.simu.tracing
+        tracing.exclude_trace_events(action="ANN")
+        self.prod.tmr_expired_orig = self.prod.tmr.elapsed_func
+
+        def tmr_expired(timer):
+            if self.prod.count == 1:
+                tracing.clear_trace_filters()
+            self.prod.tmr_expired_orig(timer)
+
+        self.prod.tmr.elapsed_func = tmr_expired
+        trc = self.run_sim()
+        # msg1 annotation at 2 is excluded
+        self.assertEqual(trc.count(("ANN", "Cons1")), 2)
+
+    def test_is_traced(self):
+        tracing = self.simu.tracing
+        tracing.exclude_trace_events(part="Prod", action=["T-EXP", "VC"])
+        self.assertFalse(tracing.is_traced(self.prod, self.prod.tmr, "T-EXP"))
+        self.assertTrue(tracing.is_traced(self.prod, self.prod.tmr, "T-START"))
+        self.assertTrue(tracing.is_traced(self.prod, self.cons1.port, "<MSG"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import os
+import tempfile
+import unittest
+import moddy
+from moddy.trace_fingerprint import TraceFingerprint
+from tests.ping_pong import PingPong, ping_pong_model
+
+
+class StatePingPong(PingPong):
+    def got_msg(self):
+        self.set_state_indicator(str(self.received))
+
+
+class TestTraceFingerprint(unittest.TestCase):
+    def run_model(self, pong_delay=lambda _: 1, **fp_args):
+        simu = ping_pong_model(StatePingPong, pong_delay)
+        simu.tracing.enable_fingerprint(**fp_args)
+        simu.run(100, enable_trace_printing=False)
+        return simu
+
+    def test_equal_runs(self):
+        simu = self.run_model(checkpoint_interval=10)
+        fp = simu.tracing.fingerprint()
+        self.assertGreater(fp.num_events(), 100)
+        self.assertEqual(len(fp.checkpoints()), fp.num_events() // 10)
+        self.assertEqual(fp.checkpoints()[0][0], 10)
+
+        fp2 = self.run_model(checkpoint_interval=10).tracing.fingerprint()
+        self.assertEqual(fp, fp2)
+        self.assertIsNone(fp.compare(fp2))
+
+        # same fingerprint from the recorded events
+        fp3 = TraceFingerprint(checkpoint_interval=10)
+        fp3.update_events(simu.tracing.traced_events())
+        self.assertEqual(fp3.hexdigest(), fp.hexdigest())
+        self.assertEqual(fp3.checkpoints(), fp.checkpoints())
+
+    def test_field_boundaries(self):
+        # same texts, but split differently into element name and value
+        digests = []
+        for part_name, text in (("P", "Q(Part)\tb"), ("P(Part)\tQ", "b")):
+            simu = moddy.Sim()
+            part = moddy.SimPart(simu, part_name)
+            simu.tracing.enable_fingerprint()
+            simu.tracing.annotation(part, text)
+            digests.append(simu.tracing.fingerprint().hexdigest())
+        self.assertNotEqual(digests[0], digests[1])
+
+    def test_divergence(self):
+        fp = self.run_model(checkpoint_interval=10).tracing.fingerprint()
+        simu = self.run_model(
+            lambda count: 1.5 if count == 20 else 1, checkpoint_interval=10
+        )
+        fp2 = simu.tracing.fingerprint()
+        self.assertNotEqual(fp, fp2)
+
+        # first event that differs
+        ref = list(self.run_model().tracing.traced_events())
+        events = list(simu.tracing.traced_events())
+        diff_idx = next(
+            idx
+            for idx, (te, te2) in enumerate(zip(ref, events))
+            if repr(te) != repr(te2)
+        )
+        first, last = fp.compare(fp2)
+        self.assertEqual(last - first, 10)
+        self.assertTrue(first <= diff_idx < last)
+        self.assertEqual(fp2.compare(fp), (first, last))
+
+        # time resolution
+        fp3 = self.run_model(
+            lambda _: 1 + 1e-13, checkpoint_interval=10
+        ).tracing.fingerprint()
+        self.assertEqual(fp, fp3)
+        fp3 = self.run_model(
+            lambda _: 1 + 1e-8, checkpoint_interval=10
+        ).tracing.fingerprint()
+        self.assertNotEqual(fp, fp3)
+        fp4 = self.run_model(
+            lambda _: 1 + 1e-8, checkpoint_interval=10, time_resolution=1e-6
+        ).tracing.fingerprint()
+        fp5 = self.run_model(
+            checkpoint_interval=10, time_resolution=1e-6
+        ).tracing.fingerprint()
+        self.assertEqual(fp4, fp5)
+        self.assertRaises(ValueError, fp.compare, fp5)
+
+    def test_shorter_run(self):
+        fp = self.run_model(checkpoint_interval=10).tracing.fingerprint()
+        fp2 = TraceFingerprint(checkpoint_interval=10)
+        fp2.update_events(list(self.run_model().tracing.traced_events())[:45])
+        self.assertEqual(fp.compare(fp2), (40, 50))
+
+    def test_save_load(self):
+        fp = self.run_model(checkpoint_interval=10).tracing.fingerprint()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "fp.json")
+            fp.save(file_name)
+            loaded = TraceFingerprint.load(file_name)
+        self.assertEqual(loaded, fp)
+        self.assertEqual(loaded.checkpoints(), fp.checkpoints())
+        self.assertIsNone(loaded.compare(fp))
+
+    def test_binary_trace(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, "trace.bin")
+            simu = ping_pong_model(StatePingPong)
+            simu.tracing.enable_fingerprint()
+            moddy.BinaryTraceSink(simu, file_name)
+            simu.run(100, enable_trace_printing=False)
+
+            with moddy.BinaryTraceReader(file_name) as reader:
+                fp = TraceFingerprint()
+                fp.update_events(reader)
+            self.assertEqual(fp, simu.tracing.fingerprint())
+
+    def test_bad_args(self):
+        self.assertRaises(ValueError, TraceFingerprint, 0)
+        self.assertRaises(ValueError, TraceFingerprint, 10, "nohash")
@@ -0,0 +1,106 @@
+"""
+@author: klauspopp@gmx.de
+"""
+import unittest
+import moddy
+from tests.ping_pong import PingPong, ping_pong_model
+
+
+class WatchedPingPong(PingPong):
+    def __init__(self, sim, obj_name):
+        super().__init__(sim, obj_name)
+        self.new_var_watcher("received", "%d")
+
+    def got_msg(self):
+        self.set_state_indicator("got %d" % self.received)
+        if self.received == 5:
+            self.assertion_failed("fifth message")
+
+
+class TestTraceInactive(unittest.TestCase):
+    def run_model(self, recording, consumer=None):
+        simu = ping_pong_model(WatchedPingPong)
+        ping = simu.parts_mgr.find_part_by_name("Ping")
+        simu.tracing.enable_trace_recording(recording)
+        if consumer is not None:
+            simu.tracing.subscribe(consumer)
+        simu.run(
+            10.5, enable_trace_printing=False, stop_on_assertion_failure=False
+        )
+        return simu, ping
+
+    def test_recording_disabled(self):
+        simu, ping = self.run_model(True)
+        traced = len(simu.tracing.traced_events())
+        self.assertGreater(traced, 0)
+
+        simu, ping_off = self.run_model(False)
+        self.assertFalse(simu.tracing.active)
+        self.assertEqual(len(simu.tracing.traced_events()), 0)
+        # model behaves the same
+        self.assertEqual(ping_off.received, ping.received)
+        # assertion failures are still counted
+        self.assertEqual(simu.tracing.assertion_failures(), 1)
+
+    def test_subscriber(self):
+        events = []
+        simu, _ = self.run_model(False, events.append)
+        self.assertTrue(simu.tracing.active)
+        self.assertEqual(len(simu.tracing.traced_events()), 0)
+        recorded, _ = self.run_model(True)
+        self.assertEqual(
+            [(te.trace_time, te.action) for te in events],
+            [
+                (te.trace_time, te.action)
+                for te in recorded.tracing.traced_events()
+            ],
+        )
+
+        simu.tracing.unsubscribe(events.append)
+        self.assertFalse(simu.tracing.active)
+
+    def test_activate_during_simulation(self):
+        class Toggle(moddy.SimPart):
+            def __init__(self, sim, obj_name, consumer):
+                super().__init__(
+                    sim=sim, obj_name=obj_name, elems={"tmr": "tmr"}
+                )
+                self.consumer = consumer
+                self.value = None
+                self.new_var_watcher("value", "%d")
+
+            def start_sim(self):
+                self.tmr.start(1)
+
+            def tmr_expired(self, _):
+                # None when tracing is activated
+                self.value = None if self.time() == 3 else self.time()
+                if self.time() == 3 and self.consumer is not None:
+                    self._sim.tracing.subscribe(self.consumer)
+                self.tmr.start(1)
+
+        def var_changes(events, from_time):
+            return [
+                (te.trace_time, te.trans_val)
+                for te in events
+                if te.action == "VC" and te.trace_time >= from_time
+            ]
+
+        events = []
+        simu = moddy.Sim()
+        Toggle(simu, "Toggle", events.append)
+        simu.tracing.enable_trace_recording(False)
+        simu.run(6.5, enable_trace_printing=False)
+
+        recorded = moddy.Sim()
+        Toggle(recorded, "Toggle", None)
+        recorded.run(6.5, enable_trace_printing=False)
+        self.assertEqual(
+            var_changes(events, 3),
+            var_changes(recorded.tracing.traced_events(), 3),
+        )
+        self.assertEqual(len(var_changes(events, 3)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
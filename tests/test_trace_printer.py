@@ -0,0 +1,85 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import contextlib
+import io
+import unittest
+import moddy
+from tests.ping_pong import ping_pong_model
+
+
+class TestTracePrinter(unittest.TestCase):
+    def run_model(self, **printer_args):
+        """run model, return printed lines"""
+        simu = ping_pong_model()
+        simu.tracing.set_trace_printer(**printer_args)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            simu.run(100)
+        # without the line with the elapsed real time
+        return [
+            line
+            for line in out.getvalue().splitlines()
+            if "Simulator stopped" not in line
+        ]
+
+    @staticmethod
+    def trace_lines(lines):
+        return [line for line in lines if line.startswith("TRC:")]
+
+    def test_buffered(self):
+        expected = self.run_model(buffered=False)
+        self.assertGreater(len(self.trace_lines(expected)), 100)
+        # trace lines are written before the simulator's messages
+        self.assertEqual(self.run_model(), expected)
+        self.assertEqual(self.run_model(buffer_lines=7), expected)
+
+        file = io.StringIO()
+        lines = self.run_model(file=file)
+        self.assertEqual(self.trace_lines(lines), [])
+        self.assertEqual(
+            file.getvalue().splitlines(), self.trace_lines(expected)
+        )
+
+    def test_every_nth(self):
+        expected = self.trace_lines(self.run_model(buffered=False))
+        lines = self.trace_lines(self.run_model(every_nth=10))
+        self.assertEqual(lines, expected[::10])
+
+    def test_rate_limit(self):
+        expected = self.trace_lines(self.run_model(buffered=False))
+        # the real time does not advance, so no tokens are refilled
+        lines = self.trace_lines(
+            self.run_model(max_rate=5, clock=lambda: 0.0)
+        )
+        # burst of 5 events, then the count of skipped events
+        self.assertEqual(
+            lines,
+            expected[:5]
+            + [
+                "TRC: (%d events not printed due to rate limit)"
+                % (len(expected) - 5)
+            ],
+        )
+
+        # one token per event
+        now = [0.0]
+
+        def clock():
+            now[0] += 0.2
+            return now[0]
+
+        lines = self.trace_lines(self.run_model(max_rate=5, clock=clock))
+        self.assertEqual(lines, expected)
+
+    def test_illegal_args(self):
+        simu = moddy.Sim()
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_printer(every_nth=0)
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_printer(max_rate=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
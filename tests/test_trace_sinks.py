@@ -0,0 +1,144 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import json
+import os
+import tempfile
+import unittest
+import moddy
+from moddy.trace_sinks import (
+    JsonLinesTraceSink,
+    CsvTraceSink,
+    BinaryTraceSink,
+    TraceSink,
+    trace_event_record,
+)
+from moddy.trace_file import BinaryTraceReader
+from tests.ping_pong import PingPong, ping_pong_model
+
+
+def read_binary_trace(file_name):
+    with BinaryTraceReader(file_name) as reader:
+        return list(reader.records())
+
+
+class AnnotatingPingPong(PingPong):
+    def __init__(self, sim, obj_name):
+        super().__init__(sim, obj_name)
+        self.new_var_watcher("received", "%d")
+
+    def got_msg(self):
+        self.set_state_indicator(
+            "got %d" % self.received, {"boxStrokeColor": "red"}
+        )
+        self.annotation('a;b "quoted"')
+
+
+class TestTraceSinks(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def make_model(self):
+        return ping_pong_model(AnnotatingPingPong)
+
+    def test_sinks(self):
+        simu = self.make_model()
+        sinks = [
+            JsonLinesTraceSink(simu, self.path("trace.jsonl"), batch_size=7),
+            CsvTraceSink(simu, self.path("sub/trace.csv"), time_unit="ms"),
+            BinaryTraceSink(simu, self.path("trace.bin"), batch_size=5),
+        ]
+        simu.run(10.5, enable_trace_printing=False)
+        # sinks are closed and unsubscribed when the simulator stops
+        for sink in sinks:
+            self.assertNotIn(sink, simu.tracing._subscribers)
+
+        events = list(simu.tracing.traced_events())
+        records = [trace_event_record(ev) for ev in events]
+        self.assertGreater(len(events), 20)
+
+        with open(self.path("trace.jsonl")) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(len(lines), len(events))
+        for line, rec in zip(lines, records):
+            self.assertEqual(line["time"], rec[0])
+            self.assertEqual(line["action"], rec[1])
+            self.assertEqual(line["sub_obj"], rec[3])
+        msg = next(line for line in lines if line["action"] == "<MSG")
+        self.assertEqual(msg["value"], "ping")
+        self.assertEqual(msg["end_time"] - msg["begin_time"], 1)
+        sta = next(line for line in lines if line["action"] == "STA")
+        self.assertEqual(sta["appearance"], {"boxStrokeColor": "red"})
+
+        # csv sink writes the same table as gen_trace_table
+        moddy.gen_trace_table(simu, self.path("ref.csv"), time_unit="ms")
+        with open(self.path("ref.csv")) as file:
+            expected = file.read()
+        with open(self.path("sub/trace.csv")) as file:
+            self.assertEqual(file.read(), expected)
+
+        self.assertEqual(
+            list(read_binary_trace(self.path("trace.bin"))), records
+        )
+
+    def test_crashed_binary(self):
+        simu = self.make_model()
+        simu.tracing.enable_trace_recording(False)
+        BinaryTraceSink(simu, self.path("trace.bin"), batch_size=4)
+        simu.run(10.5, enable_trace_printing=False)
+        num_events = len(list(read_binary_trace(self.path("trace.bin"))))
+        self.assertGreater(num_events, 4)
+
+        # cut index and last chunk, as if the simulation crashed while
+        # writing the chunk
+        with BinaryTraceReader(self.path("trace.bin")) as reader:
+            last_chunk_offset = reader._chunk_offsets[-1]
+        with open(self.path("trace.bin"), "r+b") as file:
+            file.truncate(last_chunk_offset + 10)
+        cut_events = len(list(read_binary_trace(self.path("trace.bin"))))
+        self.assertLess(cut_events, num_events)
+        self.assertGreater(cut_events, 0)
+
+        with open(self.path("other.bin"), "wb") as file:
+            file.write(b"something else")
+        with self.assertRaises(ValueError):
+            list(read_binary_trace(self.path("other.bin")))
+
+    def test_flush_and_errors(self):
+        simu = self.make_model()
+        sink = JsonLinesTraceSink(simu, self.path("trace.jsonl"))
+        simu.tracing.annotation(None, "before run")
+        sink.flush()
+        with open(self.path("trace.jsonl")) as file:
+            self.assertEqual(json.loads(file.read())["value"], "before run")
+        sink.close()
+        sink.close()  # no effect
+
+        class FailingSink(TraceSink):
+            def _write_batch(self, file, batch):
+                raise OSError("disk full")
+
+        simu = self.make_model()
+        FailingSink(simu, self.path("fail.txt"), batch_size=1)
+        with self.assertRaises(RuntimeError):
+            simu.run(10.5, enable_trace_printing=False)
+
+        with self.assertRaises(ValueError):
+            JsonLinesTraceSink(simu, self.path("x.jsonl"), batch_size=0)
+
+        class IncompleteSink(TraceSink):
+            def _write_end(self, file):
+                pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSink(simu, self.path("incomplete.txt"))
+        self.assertFalse(os.path.exists(self.path("incomplete.txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
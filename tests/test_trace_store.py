@@ -0,0 +1,202 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import moddy
+from moddy.lib.trace_search import TraceSearch
+
+try:
+    import numpy  # noqa: F401
+
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+
+class TestTraceStore(unittest.TestCase):
+    class Node(moddy.SimPart):
+        def __init__(self, sim, obj_name):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                elems={"in": "in_port", "out": "out_port", "tmr": "tmr"},
+            )
+            self.count = 0
+            self.new_var_watcher("count", "%d")
+
+        def start_sim(self):
+            if self.obj_name() == "Node0":
+                self.out_port.send("token0", 1)
+
+        def in_port_recv(self, _, msg):
+            self.count += 1
+            self.tmr.restart(0.5)
+            self.annotation("got %s" % msg)
+            self.set_state_indicator("S%d" % (self.count % 3))
+            self.out_port.send("token%d" % self.count, 1)
+
+        def tmr_expired(self, _):
+            pass
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_model(self, **buffer_args):
+        simu = moddy.Sim()
+        for idx in range(3):
+            self.Node(simu, "Node%d" % idx)
+        simu.smart_bind(
+            [
+                ["Node%d.out_port" % idx, "Node%d.in_port" % ((idx + 1) % 3)]
+                for idx in range(3)
+            ]
+        )
+        if buffer_args:
+            simu.tracing.set_trace_buffer(**buffer_args)
+        simu.run(100, enable_trace_printing=False)
+        return simu
+
+    @staticmethod
+    def trace_strings(trace):
+        return ["%s %s %s" % (te.trace_time, te.action, te) for te in trace]
+
+    def test_spill(self):
+        full = self.run_model()
+        spill_dir = os.path.join(self.tmp_dir, "spill")
+        spilled = self.run_model(
+            max_events=100, spill_dir=spill_dir, segment_size=30
+        )
+        trc = spilled.tracing.traced_events()
+        self.assertGreater(trc.num_spilled(), 0)
+        self.assertEqual(len(os.listdir(spill_dir)), len(trc.segment_files()))
+
+        full_strings = self.trace_strings(full.tracing.traced_events())
+        self.assertEqual(self.trace_strings(trc), full_strings)
+        self.assertEqual(len(trc), len(full_strings))
+        # random access
+        for idx in (0, 31, 200, -1):
+            self.assertEqual(
+                self.trace_strings([trc[idx]])[0], full_strings[idx]
+            )
+
+        # TraceSearch finds the same events
+        found = []
+        for simu in (full, spilled):
+            search = TraceSearch(simu)
+            idx, trace_ev = search.find_rcv_msg("Node1", "token20")
+            self.assertEqual(trace_ev.sub_obj.parent_obj.obj_name(), "Node1")
+            found.append((idx, trace_ev.trace_time))
+        self.assertEqual(found[0], found[1])
+        self.assertLess(found[0][0], trc.num_spilled())
+
+        # trace tables and sequence diagrams are equal
+        for gen_func, ext in (
+            (moddy.gen_trace_table, "csv"),
+            (moddy.gen_interactive_sequence_diagram, "html"),
+        ):
+            outputs = []
+            for simu in (full, spilled):
+                file_name = os.path.join(
+                    self.tmp_dir, "%d.%s" % (len(outputs), ext)
+                )
+                gen_func(simu, file_name)
+                with open(file_name) as file:
+                    outputs.append(file.read())
+            self.assertEqual(outputs[0], outputs[1])
+
+        # a second buffer in the same directory doesn't overwrite segments
+        other = self.run_model(
+            max_events=100, spill_dir=spill_dir, segment_size=30
+        )
+        other_trc = other.tracing.traced_events()
+        self.assertFalse(
+            set(trc.segment_files()) & set(other_trc.segment_files())
+        )
+        self.assertEqual(self.trace_strings(trc), full_strings)
+        other_trc.clear()
+
+        trc.clear()
+        self.assertEqual(os.listdir(spill_dir), [])
+
+    def test_drop(self):
+        full = self.run_model()
+        simu = self.run_model(max_events=50)
+        trc = simu.tracing.traced_events()
+        self.assertEqual(len(trc), 50)
+        self.assertEqual(
+            trc.num_dropped(), len(full.tracing.traced_events()) - 50
+        )
+        self.assertEqual(
+            self.trace_strings(trc),
+            self.trace_strings(full.tracing.traced_events())[-50:],
+        )
+
+    def test_columnar(self):
+        full = self.run_model()
+        simu = self.run_model(columnar=True)
+        store = simu.tracing.traced_events()
+        full_trc = full.tracing.traced_events()
+        full_strings = self.trace_strings(full_trc)
+        self.assertEqual(self.trace_strings(store), full_strings)
+        self.assertEqual(self.trace_strings([store[-3]]), full_strings[-3:-2])
+
+        columns = store.columns()
+        self.assertEqual(
+            list(columns["time"]), [te.trace_time for te in full_trc]
+        )
+        actions = store.action_names()
+        self.assertEqual(
+            [actions[code] for code in columns["action"]],
+            [te.action for te in full_trc],
+        )
+        node1 = simu.parts_mgr.find_part_by_name("Node1")
+        self.assertIs(store.element(store.element_id(node1)), node1)
+        ann_code = store.action_code("ANN")
+        texts = {
+            store.value(columns["value"][idx])
+            for idx in range(len(store))
+            if columns["action"][idx] == ann_code
+        }
+        self.assertIn("got token5", texts)
+        # equal values are stored once
+        self.assertLess(len(store._values), len(store))
+        self.assertEqual(store.nbytes(), len(store) * 21)
+
+    @unittest.skipUnless(HAVE_NUMPY, "NumPy not installed")
+    def test_columnar_numpy(self):
+        simu = self.run_model(columnar=True)
+        store = simu.tracing.traced_events()
+        columns = store.numpy_columns()
+        self.assertEqual(len(columns["time"]), len(store))
+        self.assertEqual(list(columns["time"]), list(store.columns()["time"]))
+        tmr_exp = columns["action"] == store.action_code("T-EXP")
+        self.assertEqual(
+            int(tmr_exp.sum()),
+            sum(1 for te in store if te.action == "T-EXP"),
+        )
+
+    def test_illegal_args(self):
+        simu = moddy.Sim()
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_buffer(spill_dir=self.tmp_dir)
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_buffer(max_events=10, segment_size=11)
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_buffer(max_events=10, columnar=True)
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_buffer(
+                spill_dir=self.tmp_dir, columnar=True
+            )
+        with self.assertRaises(ValueError):
+            simu.tracing.set_trace_buffer(segment_size=10, columnar=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
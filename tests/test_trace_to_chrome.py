@@ -0,0 +1,144 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import json
+import os
+import tempfile
+import unittest
+import moddy
+from moddy.trace_file import BinaryTraceReader
+from moddy.trace_sinks import BinaryTraceSink
+from tests.ping_pong import PingPong, ping_pong_model
+
+
+class ModePingPong(PingPong):
+    def __init__(self, sim, obj_name):
+        super().__init__(sim, obj_name)
+        self.mode = "idle"
+        self.new_var_watcher("received", "%d")
+        self.new_var_watcher("mode", "%s")
+
+    def got_msg(self):
+        self.mode = "busy" if self.received % 2 else "idle"
+        self.set_state_indicator(
+            "got %d" % self.received, {"boxStrokeColor": "red"}
+        )
+        self.annotation("recv")
+
+
+class TestTraceToChrome(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def make_model(self):
+        return ping_pong_model(ModePingPong)
+
+    @staticmethod
+    def load(file_name):
+        with open(file_name) as file:
+            return json.load(file)["traceEvents"]
+
+    def check_trace(self, events):
+        tracks = {
+            ev["args"]["name"]: ev["tid"]
+            for ev in events
+            if ev["ph"] == "M" and ev["name"] == "thread_name"
+        }
+        self.assertEqual(sorted(tracks), ["Ping", "Pong"])
+
+        # state slices are balanced per track and nested in time order
+        for tid in tracks.values():
+            slices = [ev for ev in events if ev["ph"] in "BE"]
+            slices = [ev for ev in slices if ev["tid"] == tid]
+            self.assertGreater(len(slices), 2)
+            self.assertEqual(
+                [ev["ph"] for ev in slices], ["B", "E"] * (len(slices) // 2)
+            )
+            times = [ev["ts"] for ev in slices]
+            self.assertEqual(times, sorted(times))
+        first = next(ev for ev in events if ev["ph"] == "B")
+        self.assertEqual(first["name"], "got 1")
+        self.assertEqual(first["tid"], tracks["Pong"])
+        self.assertEqual(first["ts"], 2e6)
+        self.assertEqual(first["args"], {"boxStrokeColor": "red"})
+
+        # messages are flows from sender to receiver track
+        starts = {ev["id"]: ev for ev in events if ev["ph"] == "s"}
+        ends = {ev["id"]: ev for ev in events if ev["ph"] == "f"}
+        self.assertEqual(sorted(starts), sorted(ends))
+        self.assertGreater(len(starts), 5)
+        start, end = starts[0], ends[0]
+        self.assertEqual(start["tid"], tracks["Ping"])
+        self.assertEqual(end["tid"], tracks["Pong"])
+        self.assertEqual(start["ts"], 1e6)
+        self.assertEqual(end["ts"], 2e6)
+        self.assertEqual(end["bp"], "e")
+        msg = next(ev for ev in events if ev["ph"] == "X")
+        self.assertEqual(msg["name"], "ping")
+        self.assertEqual(msg["args"]["to"], "Pong.port_in")
+
+        # numeric variables are counters, others instants
+        counters = [ev for ev in events if ev["ph"] == "C"]
+        self.assertEqual(
+            {ev["name"] for ev in counters}, {"Ping.received", "Pong.received"}
+        )
+        self.assertEqual(counters[-1]["args"]["value"], 5)
+        instants = {ev["name"] for ev in events if ev["ph"] == "i"}
+        self.assertIn("recv", instants)
+        self.assertIn("Ping.mode=busy", instants)
+
+    def test_gen_chrome_trace(self):
+        simu = self.make_model()
+        simu.run(10.5, enable_trace_printing=False)
+        moddy.gen_chrome_trace(simu, self.path("out/trace.json"))
+        events = self.load(self.path("out/trace.json"))
+        self.check_trace(events)
+        self.assertFalse(any(ev.get("cat") == "timer" for ev in events))
+
+        moddy.gen_chrome_trace(
+            simu, self.path("timers.json"), include_timers=True
+        )
+        events = self.load(self.path("timers.json"))
+        self.assertIn(
+            "T-START Ping.tmr",
+            {ev["name"] for ev in events if ev.get("cat") == "timer"},
+        )
+
+    def test_receiver_part(self):
+        simu = moddy.Sim()
+        top = moddy.SimPart(simu, "Top")
+        rx = moddy.SimPart(simu, "Rx", parent_obj=top)
+        # the receiver is not the port name without the last component
+        in_port = rx.new_input_port("cmd.in", lambda port, msg: None)
+        tx = moddy.SimPart(simu, "Tx", elems={"out": "out_port"})
+        tx.out_port.bind(in_port)
+        tx.out_port.send("cmd", 1)
+        simu.run(2, enable_trace_printing=False)
+        moddy.gen_chrome_trace(simu, self.path("trace.json"))
+        events = self.load(self.path("trace.json"))
+        tracks = {
+            ev["tid"]: ev["args"]["name"]
+            for ev in events
+            if ev["ph"] == "M" and ev["name"] == "thread_name"
+        }
+        end = next(ev for ev in events if ev["ph"] == "f")
+        self.assertEqual(tracks[end["tid"]], "Top.Rx")
+
+    def test_sink(self):
+        simu = self.make_model()
+        simu.tracing.enable_trace_recording(False)
+        moddy.ChromeTraceSink(simu, self.path("trace.json"), batch_size=3)
+        BinaryTraceSink(simu, self.path("trace.bin"))
+        simu.run(10.5, enable_trace_printing=False)
+        events = self.load(self.path("trace.json"))
+        self.check_trace(events)
+
+        # from a binary trace file
+        with BinaryTraceReader(self.path("trace.bin")) as reader:
+            moddy.gen_chrome_trace(reader, self.path("from_bin.json"))
+        self.assertEqual(self.load(self.path("from_bin.json")), events)
@@ -0,0 +1,193 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+import os
+import tempfile
+import unittest
+import moddy
+from moddy.trace_file import BinaryTraceReader
+from moddy.trace_sinks import BinaryTraceSink
+
+
+def parse_vcd(file_name):
+    """
+    return (header lines, {signal name: (type, [(time, value), ...])})
+    """
+    with open(file_name) as file:
+        lines = file.read().splitlines()
+    end = lines.index("$enddefinitions $end")
+    header = lines[:end]
+    signals = {}
+    scopes = []
+    names = {}
+    for line in header:
+        words = line.split()
+        if words[0] == "$scope":
+            scopes.append(words[2])
+        elif words[0] == "$upscope":
+            scopes.pop()
+        elif words[0] == "$var":
+            name = ".".join(scopes + [words[4]])
+            names[words[3]] = name
+            signals[name] = (words[1], [])
+    time = None
+    del lines[: end + 1]
+    for line in lines:
+        if line.startswith("#"):
+            time = int(line[1:])
+        elif " " in line:
+            value, ident = line.split(" ")
+            signals[names[ident]][1].append((time, value))
+        else:
+            # scalar value change
+            signals[names[line[1:]]][1].append((time, line[0]))
+    return header, signals
+
+
+class TestTraceToVcd(unittest.TestCase):
+    class Counter(moddy.SimPart):
+        def __init__(self, sim, obj_name, parent_obj=None):
+            super().__init__(
+                sim=sim,
+                obj_name=obj_name,
+                parent_obj=parent_obj,
+                elems={"tmr": "tmr"},
+            )
+            self.count = 0
+            self.level = None
+            self.mode = "idle"
+            self.new_var_watcher("count", "%d")
+            self.new_var_watcher("level", "%.1f")
+            self.new_var_watcher("mode", "%s")
+
+        def start_sim(self):
+            self.tmr.start(1)
+
+        def tmr_expired(self, _):
+            self.count += 1
+            self.level = self.count / 2
+            self.mode = "fast run" if self.count % 2 else ""
+            self.set_state_indicator("step %d" % self.count)
+            self.tmr.start(1)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def make_model(self):
+        simu = moddy.Sim()
+        top = self.Counter(simu, "Top")
+        self.Counter(simu, "Sub", parent_obj=top)
+        return simu
+
+    def check_vcd(self, file_name):
+        header, signals = parse_vcd(file_name)
+        self.assertIn("$timescale 1ms $end", header)
+        self.assertEqual(
+            sorted(signals),
+            [
+                "Top.Sub.count",
+                "Top.Sub.level",
+                "Top.Sub.mode",
+                "Top.Sub.state",
+                "Top.count",
+                "Top.level",
+                "Top.mode",
+                "Top.state",
+            ],
+        )
+        sig_type, changes = signals["Top.count"]
+        self.assertEqual(sig_type, "real")
+        self.assertEqual(changes[:3], [(0, "r0"), (1000, "r1"), (2000, "r2")])
+        self.assertEqual(changes[-1], (3000, "r3"))
+
+        # None is empty
+        sig_type, changes = signals["Top.level"]
+        self.assertEqual(sig_type, "real")
+        self.assertEqual(changes[:2], [(0, "x"), (1000, "r0.5")])
+
+        sig_type, changes = signals["Top.Sub.mode"]
+        self.assertEqual(sig_type, "string")
+        self.assertEqual(
+            changes,
+            [
+                (0, "sidle"),
+                (1000, "sfast_run"),
+                (2000, "s-"),
+                (3000, "sfast_run"),
+            ],
+        )
+
+        sig_type, changes = signals["Top.state"]
+        self.assertEqual(sig_type, "string")
+        self.assertEqual(changes[0], (1000, "sstep_1"))
+
+    def test_gen_vcd(self):
+        simu = self.make_model()
+        simu.run(3.5, enable_trace_printing=False)
+        moddy.gen_vcd(simu, self.path("out/trace.vcd"), time_unit="ms")
+        self.check_vcd(self.path("out/trace.vcd"))
+
+    def test_sink(self):
+        simu = self.make_model()
+        simu.tracing.enable_trace_recording(False)
+        moddy.VcdTraceSink(
+            simu, self.path("trace.vcd"), time_unit="ms", batch_size=3
+        )
+        BinaryTraceSink(simu, self.path("trace.bin"))
+        simu.run(3.5, enable_trace_printing=False)
+        self.check_vcd(self.path("trace.vcd"))
+
+        # from a binary trace file
+        with BinaryTraceReader(self.path("trace.bin")) as reader:
+            moddy.gen_vcd(reader, self.path("from_bin.vcd"), time_unit="ms")
+        with open(self.path("trace.vcd")) as file, open(
+            self.path("from_bin.vcd")
+        ) as from_bin:
+            self.assertEqual(file.read(), from_bin.read())
+
+    def test_names(self):
+        class Obj:
+            def __init__(self):
+                self.a = 1
+
+        simu = moddy.Sim()
+        top = moddy.SimPart(simu, "Top")
+        node = moddy.SimPart(simu, "node[0]", parent_obj=top)
+        node.obj = Obj()
+        node.new_var_watcher("obj.a", "%d")
+        simu.run(1, enable_trace_printing=False)
+        moddy.gen_vcd(simu, self.path("trace.vcd"))
+        header, signals = parse_vcd(self.path("trace.vcd"))
+        self.assertIn("$scope module node_0_ $end", header)
+        self.assertEqual(
+            signals, {"Top.node_0_.obj.a": ("real", [(0, "r1")])}
+        )
+
+    def test_states_only(self):
+        class Blinker(moddy.SimPart):
+            def __init__(self, sim, obj_name):
+                super().__init__(
+                    sim=sim, obj_name=obj_name, elems={"tmr": "tmr"}
+                )
+
+            def start_sim(self):
+                self.tmr.start(1)
+
+            def tmr_expired(self, _):
+                self.set_state_indicator("on" if self.time() < 2 else "")
+                self.tmr.start(1)
+
+        simu = moddy.Sim()
+        Blinker(simu, "Led")
+        simu.run(2.5, enable_trace_printing=False)
+        moddy.gen_vcd(simu, self.path("trace.vcd"))
+        _, signals = parse_vcd(self.path("trace.vcd"))
+        self.assertEqual(
+            signals,
+            {"Led.state": ("string", [(10**9, "son"), (2 * 10**9, "s-")])},
+        )
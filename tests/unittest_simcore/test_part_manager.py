@@ -4,6 +4,7 @@
 
 
 import unittest
+from moddy import Sim
 from moddy.sim_part import SimPart
 from moddy.sim_parts_mgr import SimPartsManager
 from moddy.sim_ports import SimOutputPort
@@ -37,6 +38,60 @@ class TestPartsManager(unittest.TestCase):
             [self.part1, self.subpart1_1, self.subpart1_1_1, self.part2],
         )
 
+    def test_walk_parts_after_change(self):
+        part_mgr = self.part_mgr
+        self.assertEqual(len(list(part_mgr.walk_parts())), 4)
+
+        subpart2_1 = SimPart(sim=None, obj_name="P2_1", parent_obj=self.part2)
+        self.assertListEqual(
+            list(part_mgr.walk_parts()),
+            [
+                self.part1,
+                self.subpart1_1,
+                self.subpart1_1_1,
+                self.part2,
+                subpart2_1,
+            ],
+        )
+        out1 = subpart2_1.new_output_port("Out1")
+        self.assertListEqual(list(part_mgr.walk_ports()), [out1])
+
+    def test_walk_after_change_below_registered_subpart(self):
+        # P3 and its sub part exist before P3 is registered
+        part_mgr = self.part_mgr
+        part3 = SimPart(sim=None, obj_name="P3", parent_obj=None)
+        subpart3_1 = SimPart(sim=None, obj_name="P3_1", parent_obj=part3)
+        io1 = subpart3_1.new_io_port("IO1", msg_received_func=None)
+        part_mgr.add_top_level_part(part3)
+        self.assertListEqual(
+            list(part_mgr.walk_parts())[-2:], [part3, subpart3_1]
+        )
+        self.assertListEqual(
+            list(part_mgr.walk_ports()), [io1.in_port(), io1.out_port()]
+        )
+
+        subpart3_1_1 = SimPart(
+            sim=None, obj_name="P3_1_1", parent_obj=subpart3_1
+        )
+        out1 = subpart3_1.new_output_port("Out1")
+        self.assertListEqual(
+            list(part_mgr.walk_parts())[-3:],
+            [part3, subpart3_1, subpart3_1_1],
+        )
+        self.assertListEqual(
+            list(part_mgr.walk_ports()), [io1.in_port(), io1.out_port(), out1]
+        )
+        self.assertIs(part_mgr.generations, io1.in_port()._generations)
+
+    def test_walk_deep_hierarchy(self):
+        part_mgr = self.part_mgr
+        part = self.part2
+        for depth in range(3000):
+            part = SimPart(sim=None, obj_name="D%d" % depth, parent_obj=part)
+        parts = list(part_mgr.walk_parts())
+        self.assertEqual(len(parts), 3004)
+        self.assertEqual(parts[-1], part)
+
     def test_find_part_by_name(self):
         part_mgr = self.part_mgr
 
@@ -57,6 +112,15 @@ class TestPartsManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             part_mgr.find_part_by_name("P1.P2_1")
 
+        self.assertEqual(
+            part_mgr.find_part_by_name("P1_1.P1_1_1", self.part1),
+            self.subpart1_1_1,
+        )
+
+        # parts created after registering the top level part are found
+        subpart1_2 = SimPart(sim=None, obj_name="P1_2", parent_obj=self.part1)
+        self.assertEqual(part_mgr.find_part_by_name("P1.P1_2"), subpart1_2)
+
     def test_walk_ports(self):
         part_mgr = self.part_mgr
 
@@ -90,9 +154,35 @@ class TestPartsManager(unittest.TestCase):
             part_mgr.find_port_by_name("P2.IO1_in"), io1.in_port()
         )
 
+        self.assertEqual(
+            part_mgr.find_port_by_name("P2.IO1_out"), io1.out_port()
+        )
+
         with self.assertRaises(ValueError):
             part_mgr.find_port_by_name("P1.In2")
 
+        with self.assertRaises(ValueError):
+            part_mgr.find_port_by_name("P3.In1")
+
+        with self.assertRaises(ValueError):
+            part_mgr.find_port_by_name("P1")
+
+
+class TestPartsManagerPerSimulator(unittest.TestCase):
+    def test_walk_cache_per_simulator(self):
+        sim1 = Sim()
+        sim2 = Sim()
+        top1 = SimPart(sim1, "Top1")
+        top2 = SimPart(sim2, "Top2")
+        self.assertEqual(list(sim2.parts_mgr.walk_parts()), [top2])
+        generation = sim2.parts_mgr.generations.structure
+        # changes in one simulator keep the caches of the others
+        SimPart(sim1, "Sub1", top1).new_output_port("Out")
+        self.assertEqual(sim2.parts_mgr.generations.structure, generation)
+        self.assertEqual(len(list(sim1.parts_mgr.walk_parts())), 2)
+        sub2 = SimPart(sim2, "Sub2", top2)
+        self.assertEqual(list(sim2.parts_mgr.walk_parts()), [top2, sub2])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+"""
+@author: klauspopp@gmx.de
+"""
+
+
+import unittest
+from moddy import Sim
+from moddy.sim_base import ElemList, add_elem_to_list
+from moddy.sim_part import SimPart
+
+
+class TestSimBaseElement(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        # use sim=None to avoid Sim instantiation
+        self.part1 = SimPart(sim=None, obj_name="P1", parent_obj=None)
+        self.part2 = SimPart(sim=None, obj_name="P2", parent_obj=None)
+        self.subpart = SimPart(sim=None, obj_name="Sub", parent_obj=self.part1)
+        self.port = self.subpart.new_output_port("Out")
+
+    def test_hierarchy_name(self):
+        self.assertEqual(self.port.hierarchy_name(), "P1.Sub.Out")
+        self.assertEqual(
+            self.port.hierarchy_name_with_type(), "P1.Sub.Out(OutPort)"
+        )
+        # cached names are reused
+        self.assertIs(self.port.hierarchy_name(), self.port.hierarchy_name())
+        self.assertEqual(str(self.port), "P1.Sub.Out")
+        self.assertEqual(repr(self.port), "P1.Sub.Out(OutPort)")
+
+    def test_hierarchy_name_parent_change(self):
+        self.assertEqual(self.port.hierarchy_name(), "P1.Sub.Out")
+        self.subpart.parent_obj = self.part2
+        self.assertEqual(self.port.hierarchy_name(), "P2.Sub.Out")
+        self.assertEqual(
+            self.port.hierarchy_name_with_type(), "P2.Sub.Out(OutPort)"
+        )
+        self.subpart.parent_obj = None
+        self.assertEqual(self.subpart.hierarchy_name(), "Sub")
+        self.assertEqual(self.port.hierarchy_name(), "Sub.Out")
+
+    def test_hierarchy_name_per_simulator(self):
+        sim1 = Sim()
+        sim2 = Sim()
+        top1 = SimPart(sim1, "Top1")
+        top2 = SimPart(sim2, "Top2")
+        port = SimPart(sim2, "Sub", top2).new_output_port("Out")
+        self.assertEqual(port.hierarchy_name(), "Top2.Sub.Out")
+        # changes in one simulator keep the caches of the others
+        SimPart(sim1, "Sub1", top1).parent_obj = None
+        self.assertEqual(
+            port._hierarchy_name_gen, sim2.parts_mgr.generations.hierarchy
+        )
+        self.assertEqual(port.hierarchy_name(), "Top2.Sub.Out")
+
+
+class TestElemList(unittest.TestCase):
+    def test_add_elem_to_list(self):
+        lst = ElemList()
+        add_elem_to_list(lst, "a", "lst")
+        add_elem_to_list(lst, "b", "lst")
+        with self.assertRaises(RuntimeError):
+            add_elem_to_list(lst, "a", "lst")
+        self.assertListEqual(lst, ["a", "b"])
+
+    def test_membership_follows_list(self):
+        lst = ElemList(["a", "b", "c"])
+        lst.remove("a")
+        self.assertNotIn("a", lst)
+        self.assertEqual(lst.pop(), "c")
+        self.assertNotIn("c", lst)
+        lst += ["d", "d"]
+        lst.remove("d")
+        self.assertIn("d", lst)
+        del lst[0]
+        self.assertNotIn("b", lst)
+        lst.clear()
+        self.assertNotIn("d", lst)
+        self.assertNotIn([], lst)
+
+
+if __name__ == "__main__":
+    unittest.main()